@@ -0,0 +1,89 @@
+
+
+import math
+import time
+import numpy as np
+from scipy import stats
+from stat_runs import Stat_runs
+
+
+class Adaptive_runs(object):
+    '''
+    Adaptive runs keep simulating runs until the standard error of the mean of chosen measures is small enough.
+    A target gives the largest standard error over runs of a measure in the last month, for example {'gini_i': 0.002}, see Stat_runs.
+    Since the standard error falls with the square root of the number of runs, the runs still needed are estimated after each round.
+    Rounds simulate at least one run per worker and stop once all targets are met or the budget of runs or seconds is used.
+    Run i draws from the i-th seed spawned from the seed, so the runs equal those of a fixed number of runs with the same seed.
+    '''
+
+    def __init__(self, run_pool: object, stat_runs: list, targets: dict, min_runs: int = 2, max_runs: int = 1000,
+                 max_seconds: float = math.inf, seed: int = 15532):
+        unknown = [measure for measure in targets if measure not in Stat_runs.final_measures]
+        if unknown: raise KeyError(f"unknown measures {unknown}, choose from {list(Stat_runs.final_measures)}")
+
+        self.run_pool = run_pool                # simulates the runs of each round
+        self.stat_runs = stat_runs              # stat_runs objects the runs are added to, one per government with branches
+        self.targets = targets                  # largest standard error of each measure
+        self.min_runs = max(2, min_runs)        # number of runs of the first round, the standard error needs two runs
+        self.max_runs = max_runs                # budget of runs
+        self.max_seconds = max_seconds          # budget of wall time in seconds, checked between rounds
+        self.seed = seed                        # seed the seeds of the runs are spawned from
+        self.num_runs = 0                       # number of runs simulated so far
+        self.print_hashes = '######## ######## ########'        # pretty command line printing
+
+    ######## ######## ######## METHODS ######## ######## ########
+
+    # return the largest standard error of each measure over the stat_runs objects
+    # measures that aren't recorded, such as tax without government, are left out
+    def achieved(self) -> dict:
+        achieved = {}
+        for measure in self.targets:
+            errors = [stats.sem(values) for values in (stat_runs.final_values(measure) for stat_runs in self.stat_runs) if len(values) > 1]
+            if errors: achieved[measure] = max(errors)
+        return achieved
+
+    # return whether the standard error of every measure is at most its target
+    def met(self) -> bool:
+        achieved = self.achieved()
+        return all(achieved[measure] <= target for measure, target in self.targets.items() if measure in achieved)
+
+    # return the number of runs of the next round
+    # the runs needed are estimated from the standard error of each measure, rounded up to a multiple of the number of workers
+    # a round doesn't exceed the budget of runs or the time left at the wall time per run so far
+    def round_size(self, seconds: float) -> int:
+        achieved = self.achieved()
+        needed = max([math.ceil(self.num_runs * (achieved[measure] / target)**2) - self.num_runs
+                      for measure, target in self.targets.items() if measure in achieved] + [1])
+        workers = self.run_pool.workers
+        size = math.ceil(needed / workers) * workers
+        affordable = math.floor((self.max_seconds - seconds) / (seconds / self.num_runs)) if self.max_seconds < math.inf else size
+        return max(1, min(size, self.max_runs - self.num_runs, affordable))
+
+    # simulate rounds of runs until the targets are met or the budget is used, return the achieved standard error of each measure
+    # add_runs is called with the indices, statistics and wall time of each batch of runs once it finishes, see Run_pool.simulate
+    def simulate(self, add_runs: callable) -> dict:
+        seed_seq = np.random.SeedSequence(self.seed)
+        start = time.perf_counter()
+        size = min(self.min_runs, self.max_runs)
+        while True:
+            for run_ids, run_stats, seconds in self.run_pool.simulate(seed_seq.spawn(size), self.num_runs):
+                add_runs(run_ids, run_stats, seconds)
+            self.num_runs += size
+            seconds = time.perf_counter() - start
+            achieved = self.achieved()
+            print(f"{self.print_hashes:<30} {'RUNS:':>15} {self.num_runs:>10} "
+                  + " ".join(f"{measure}: {achieved.get(measure, math.nan):.5f}/{target}" for measure, target in self.targets.items()))
+            if self.met() or self.num_runs >= self.max_runs or seconds >= self.max_seconds: break
+            size = self.round_size(seconds)
+        self.report(achieved, seconds)
+        return achieved
+
+    # print the achieved standard error and the mean of each measure
+    def report(self, achieved: dict, seconds: float):
+        print(f"\n{self.print_hashes:<30} {'PRECISION':>15} {self.num_runs:>10} runs {seconds:>10.1f}s\n")
+        for measure, target in self.targets.items():
+            means = [f"{np.mean(stat_runs.final_values(measure)):.5f} ({stat_runs.gov_type})" for stat_runs in self.stat_runs
+                     if len(stat_runs.final_values(measure)) > 0]
+            sem = achieved.get(measure, math.nan)
+            status = 'met' if sem <= target else 'not met'
+            print(f"{self.print_hashes:<30} {measure + ':':>15} {f'sem {sem:.5f}':>16} {f'target {target}':>16} {status:>8}   mean {', '.join(means)}")
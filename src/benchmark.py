@@ -0,0 +1,167 @@
+
+
+import sys
+import json
+import platform
+import argparse
+import itertools
+import numpy as np
+from pathlib import Path
+from simulation import Simulation
+from profiler import Profiler
+from run_pool import silenced
+
+# dimensions of the benchmark grid, each case gives a value of each dimension
+dimensions = ['num_hh', 'num_f', 'num_months']
+
+
+######## ######## ######## TIMING ######## ######## ########
+
+# simulate a run without plots and return its wall time in seconds and the seconds of each phase over all months, see Profiler
+def time_run(gov_type: str, num_f: int, num_hh: int, num_months: int, engine: str, seed: int) -> dict:
+    sim = Simulation(num_months, 1, gov_type, num_f, num_hh, {'plot_per_run': False}, engine, seed)
+    sim.profiler = Profiler()
+    with silenced(True):
+        sim.start_sim()
+    phases = {path: values['seconds'] for path, values in sim.profiler.report()['phases'].items()}
+    return {'seconds': sum(seconds for path, seconds in phases.items() if '/' not in path), 'phases': phases}
+
+# return the exponent of each dimension that varies between cases in a least squares fit of log seconds
+# seconds ~ num_hh^a * num_f^b * num_months^c, so an exponent of 1 is linear and 2 quadratic scaling
+def fit_exponents(cases: list, seconds: list) -> dict:
+    varied = [dim for dim in dimensions if len({case[dim] for case in cases}) > 1]
+    if not varied or len(cases) <= len(varied): return {}
+    x = np.column_stack([np.ones(len(cases))] + [np.log([case[dim] for case in cases]) for dim in varied])
+    coef = np.linalg.lstsq(x, np.log(np.maximum(seconds, 1e-9)), rcond=None)[0]
+    return {dim: float(exponent) for dim, exponent in zip(varied, coef[1:])}
+
+
+class Benchmark(object):
+    '''
+    The benchmark times runs of a fixed seed over a grid of numbers of households, firms and months for each government type.
+    Each case is simulated repeat times and the fastest repetition of each phase is kept, which is least disturbed by other processes.
+    The scaling exponent of the total and of each phase is fitted per government type, see fit_exponents.
+    Results are compared to a baseline written by an earlier benchmark, cases slower than the threshold are reported as regressions.
+    '''
+
+    def __init__(self, gov_types: list, num_hh: list, num_f: list, num_months: list, engine: str = 'object', repeat: int = 3,
+                 seed: int = 0):
+        self.cases = [{'gov_type': gov_type, 'num_hh': hh, 'num_f': f, 'num_months': months}
+                      for gov_type, hh, f, months in itertools.product(gov_types, num_hh, num_f, num_months)]    # cases of the grid
+        self.engine = engine                    # engine simulating the agents
+        self.repeat = max(1, repeat)            # number of repetitions of each case
+        self.seed = seed                        # seed of every run, so each case simulates the same economy
+        self.results = []                       # cases with their seconds and seconds per phase
+        self.print_hashes = '######## ######## ########'        # pretty command line printing
+
+    ######## ######## ######## METHODS ######## ######## ########
+
+    # return a key identifying a case between benchmarks
+    @staticmethod
+    def case_key(case: dict) -> tuple:
+        return (case['gov_type'],) + tuple(case[dim] for dim in dimensions)
+
+    # time each case of the grid, repetitions keep the fastest total and fastest time of each phase
+    # a short run before the first case compiles the loops of the compiled engine, so compiling isn't timed
+    def run(self):
+        time_run('none', 10, 50, 1, self.engine, self.seed)
+        for case in self.cases:
+            timings = [time_run(case['gov_type'], case['num_f'], case['num_hh'], case['num_months'], self.engine, self.seed)
+                       for _ in range(self.repeat)]
+            phases = {path: min(timing['phases'].get(path, np.inf) for timing in timings) for path in timings[0]['phases']}
+            self.results.append({**case, 'seconds': min(timing['seconds'] for timing in timings), 'phases': phases})
+            print(f"{self.print_hashes:<30} {case['gov_type']:>5} {case['num_hh']:>8} hh {case['num_f']:>6} f {case['num_months']:>6} months "
+                  f"{self.results[-1]['seconds']:>10.3f}s")
+
+    # return the fitted exponents of the total and each phase per government type
+    # phases are fitted when they are recorded in every case of the government type
+    def exponents(self) -> dict:
+        exponents = {}
+        for gov_type in dict.fromkeys(result['gov_type'] for result in self.results):
+            results = [result for result in self.results if result['gov_type'] == gov_type]
+            paths = [path for path in results[0]['phases'] if all(path in result['phases'] for result in results)]
+            exponents[gov_type] = {'total': fit_exponents(results, [result['seconds'] for result in results])}
+            for path in paths:
+                exponents[gov_type][path] = fit_exponents(results, [result['phases'][path] for result in results])
+        return exponents
+
+    # write the settings, results and exponents to a json file
+    def write(self, path: str):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        settings = {'engine': self.engine, 'repeat': self.repeat, 'seed': self.seed, 'python': platform.python_version(),
+                    'numpy': np.__version__, 'machine': platform.machine(), 'processor': platform.processor()}
+        with open(path, 'w') as f:
+            json.dump({'settings': settings, 'results': self.results, 'exponents': self.exponents()}, f, indent=1)
+
+    # return the cases and phases slower than in the baseline by more than their threshold as (case, phase, seconds, baseline seconds)
+    # phases are compared when they take at least min_seconds in the baseline, shorter phases are dominated by noise
+    # cases missing in the baseline aren't compared
+    def compare(self, baseline: dict, threshold: float = 0.2, phase_threshold: float = 0.5, min_seconds: float = 0.01) -> list:
+        if baseline['settings']['engine'] != self.engine:
+            raise ValueError(f"baseline was run with the {baseline['settings']['engine']} engine, not the {self.engine} engine")
+        base_results = {self.case_key(result): result for result in baseline['results']}
+        regressions = []
+        for result in self.results:
+            base = base_results.get(self.case_key(result))
+            if base is None: continue
+            if result['seconds'] > (1 + threshold) * base['seconds']:
+                regressions.append((result, 'total', result['seconds'], base['seconds']))
+            for path, seconds in result['phases'].items():
+                base_seconds = base['phases'].get(path, 0)
+                if base_seconds >= min_seconds and seconds > (1 + phase_threshold) * base_seconds:
+                    regressions.append((result, path, seconds, base_seconds))
+        return regressions
+
+    # print the fitted exponents of each government type
+    def report(self):
+        for gov_type, phases in self.exponents().items():
+            print(f"\n{self.print_hashes:<30} {'SCALING':>15} {gov_type:>10}\n")
+            for path, exponents in phases.items():
+                print(f"{self.print_hashes:<30} {path + ':':>25} " + " ".join(f"{dim} {exponent:>6.2f}" for dim, exponent in exponents.items()))
+
+######## ######## ######## MAIN ######## ######## ########
+
+def main():
+    '''
+    Benchmark the simulated economy over a grid of sizes, for example
+
+        python3 src/benchmark.py --out benchmarks/object.json --hh 250 500 1000 --f 25 50 --months 12 24
+        python3 src/benchmark.py --out benchmarks/new.json --baseline benchmarks/object.json --threshold 0.2
+
+    With a baseline the program exits with status 1 when a case or phase is slower than its threshold.
+    '''
+
+    parser = argparse.ArgumentParser(description='Benchmark the simulated economy over a grid of sizes and compare to a baseline.')
+    parser.add_argument("--out", type=str, required=True, help="json file the results and fitted scaling exponents are written to")
+    parser.add_argument("--gov", type=str, nargs='+', choices=['none', 'rep', 'dir'], default=['none', 'rep', 'dir'], help="government types benchmarked")
+    parser.add_argument("--hh", type=int, nargs='+', default=[250, 500, 1000], help="numbers of households benchmarked")
+    parser.add_argument("--f", type=int, nargs='+', default=[25, 50], help="numbers of firms benchmarked")
+    parser.add_argument("--months", type=int, nargs='+', default=[12, 24], help="numbers of months benchmarked")
+    parser.add_argument("--engine", type=str, choices=['object', 'vector', 'compiled'], default='object',
+                        help="select the engine simulating the economy, see main.py")
+    parser.add_argument("--repeat", type=int, default=3, help="number of repetitions of each case, the fastest is kept")
+    parser.add_argument("--seed", type=int, default=0, help="seed of every run")
+    parser.add_argument("--baseline", type=str, default=None, help="json file of an earlier benchmark to compare to")
+    parser.add_argument("--threshold", type=float, default=0.2, help="largest relative slowdown of the total time of a case")
+    parser.add_argument("--phase-threshold", type=float, default=0.5, help="largest relative slowdown of a phase of a case")
+    parser.add_argument("--min-seconds", type=float, default=0.01, help="shortest baseline time of a phase compared to the baseline")
+    args = parser.parse_args()
+
+    benchmark = Benchmark(args.gov, args.hh, args.f, args.months, args.engine, args.repeat, args.seed)
+    benchmark.run()
+    benchmark.write(args.out)
+    benchmark.report()
+    if not args.baseline: return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = benchmark.compare(baseline, args.threshold, args.phase_threshold, args.min_seconds)
+    print(f"\n{benchmark.print_hashes:<30} {'REGRESSIONS:':>15} {len(regressions):>10}\n")
+    for case, path, seconds, base_seconds in regressions:
+        print(f"{benchmark.print_hashes:<30} {case['gov_type']:>5} {case['num_hh']:>8} hh {case['num_f']:>6} f {case['num_months']:>6} months "
+              f"{path:>25} {seconds:>10.3f}s {base_seconds:>10.3f}s {seconds / base_seconds - 1:>+8.0%}")
+    if regressions: sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+
+
+import os
+import pickle
+from pathlib import Path
+
+
+# write a simulation, or replicas, with the state of all agents, its government, random generator and statistics to a checkpoint file
+# agents store their links to other agents by id, so the checkpoint is a flat binary pickle, see Simulation.__setstate__
+# the file is written under a temporary name and then renamed, so a process dying while writing keeps the previous checkpoint
+def save_checkpoint(sim: object, path: str):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(sim, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+# return the simulation, or replicas, written to a checkpoint file
+# the simulation continues exactly as it would have without being written, see Simulation.event_loop
+def load_checkpoint(path: str) -> object:
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+# return an independent copy of a simulation, or replicas, in the same state
+# the copy continues exactly like the original, see Simulation.fork
+def copy_sim(sim: object) -> object:
+    return pickle.loads(pickle.dumps(sim, protocol=pickle.HIGHEST_PROTOCOL))
@@ -0,0 +1,256 @@
+
+
+import numpy as np
+import kernels
+
+
+class Engine_compiled(object):
+    '''
+    The compiled engine stores firms and households as arrays like the vector engine
+    but lets households act one after another in compiled loops, see kernels.
+    Agents act in the order of the shuffled household list and draw the same blocks of random numbers from the simulation's generator,
+    so for a given seed results match the object engine exactly.
+    Loops over firms run in Python since there are few firms compared to households.
+    '''
+
+    def __init__(self, sim: object):
+        self.sim = sim                                          # engine belongs to a simulation
+
+        self.num_f: int = sim.f_param.num_firms                 # number of firms
+        self.num_hh: int = sim.hh_param.num_hh                  # number of households
+        self.num_v: int = sim.hh_param.num_vendors              # number of vendors per household
+
+        # firm arrays, index i holds the state of firm i
+        self.f_money = None                                     # current balance of firms
+        self.f_reserve = None                                   # money not paid out as profits
+        self.f_num_items = None                                 # number of items in stock for selling
+        self.f_item_price = None                                # price a single item is sold for
+        self.f_marginal_cost = None                             # price of producing one item
+        self.f_demand = None                                    # number of items asked for this month
+        self.f_wage = None                                      # money paid to each employee per month
+        self.f_hiring_status = None                             # ternary, where 1: hire, 0: no changes, -1: fire
+        self.f_hired = None                                     # hired or didn't hire a hh this month
+        self.f_month_hiring = None                              # month the firm last started looking for an employee
+        self.f_employees = None                                 # list of employee arrays, the first num_employees entries are employed
+        self.f_num_employees = None                             # number of employees
+        self.f_employee_tree = None                             # Fenwick tree over number of employees for drawing vendors
+
+        # household arrays, index i holds the state of household i
+        self.hh_order = None                                    # indices of households in order of the household list
+        self.hh_active = None                                   # indices of households that can still buy items this month
+        self.hh_money = None                                    # current balance of households
+        self.hh_income = None                                   # sum of wage and profit within a month
+        self.hh_res_wage = None                                 # reservation wage
+        self.hh_daily_demand = None                             # number of items a hh aims to buy each day
+        self.hh_employer = None                                 # index of employer firm, -1 when unemployed
+        self.hh_employee_pos = None                             # position of a hh in its employer's employee array
+        self.hh_vendors = None                                  # (num_hh, num_vendors) vendor firms in order of the vendor list
+        self.hh_blocked = None                                  # (num_hh, num_vendors) vendors unable to satisfy demand in order of blocking
+        self.hh_num_blocked = None                              # number of blocked vendors
+
+    ######## ######## ######## INITIALIZATION ######## ######## ########
+
+    # initialize firm and household arrays, see Simulation.init_firms and init_households
+    def init_agents(self):
+        f_param = self.sim.f_param
+        hh_param = self.sim.hh_param
+        num_f, num_hh = self.num_f, self.num_hh
+
+        if num_f <= self.num_v:
+            raise ValueError(f"at least {self.num_v + 1} firms are needed for households to choose {self.num_v} vendors")
+
+        self.f_money = np.full(num_f, f_param.init_money, dtype=float)
+        self.f_reserve = np.full(num_f, f_param.init_reserve, dtype=float)
+        self.f_num_items = np.full(num_f, f_param.init_items, dtype=float)
+        self.f_item_price = np.zeros(num_f)
+        self.f_marginal_cost = np.zeros(num_f)
+        self.f_demand = np.zeros(num_f)
+        self.f_wage = np.zeros(num_f)
+        self.f_hiring_status = np.zeros(num_f, dtype=np.int64)
+        self.f_hired = np.zeros(num_f, dtype=bool)
+        self.f_month_hiring = np.zeros(num_f, dtype=np.int64)
+        u = self.sim.rng.random((num_f, 2))
+        self.f_item_price[:] = f_param.init_avg_price + (u[:, 0] - 0.5) / 50
+        self.f_wage[:] = f_param.init_avg_wage + (u[:, 1] - 0.5) / 50
+
+        self.hh_order = np.arange(num_hh)
+        self.hh_active = np.zeros(0, dtype=np.int64)
+        self.hh_money = np.full(num_hh, hh_param.init_money, dtype=float)
+        self.hh_income = np.zeros(num_hh)
+        self.hh_res_wage = np.zeros(num_hh)
+        self.hh_daily_demand = np.zeros(num_hh)
+        self.hh_employer = np.zeros(num_hh, dtype=np.int64)
+        self.hh_employee_pos = np.zeros(num_hh, dtype=np.int64)
+        self.hh_vendors = np.zeros((num_hh, self.num_v), dtype=np.int64)
+        self.hh_blocked = np.zeros((num_hh, self.num_v), dtype=np.int64)
+        self.hh_num_blocked = np.zeros(num_hh, dtype=np.int64)
+        kernels.init_households(self.sim.rng.random((num_hh, 1 + self.num_v)), self.hh_employer, self.hh_vendors, num_f)
+
+        self.f_num_employees = np.bincount(self.hh_employer, minlength=num_f)
+        self.f_employee_tree = kernels.fenwick_build(self.f_num_employees)
+        self.f_employees = kernels.init_employees(self.hh_employer, num_f)
+        for employees in self.f_employees:
+            self.hh_employee_pos[employees] = np.arange(len(employees))
+
+    # return the state of the engine for a checkpoint, the employee arrays are stored as a plain list
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        if self.f_employees is not None: state['f_employees'] = list(self.f_employees)
+        return state
+
+    # restore the state of the engine from a checkpoint, compiled loops expect the employee arrays in a typed list
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        if self.f_employees is not None: self.f_employees = kernels.List(self.f_employees)
+
+    ######## ######## ######## MONTH PHASES ######## ######## ########
+
+    # actions of firms at the beginning of a month, see Firm.update_wage, update_hiring_status, update_price and reset
+    def act_bom_f(self):
+        f_param = self.sim.f_param
+        month = self.sim.current_month
+        u = self.sim.rng.random((self.num_f, 3)).tolist()
+        for f in range(self.num_f):
+            # update_wage
+            if self.f_month_hiring[f] == month - 1 and self.f_hired[f] == False:
+                self.f_wage[f] *= (1 + f_param.wage_adj_rate * u[f][0])
+            elif month - self.f_month_hiring[f] > f_param.lo_wage_months:
+                self.f_wage[f] *= (1 - f_param.wage_adj_rate * u[f][0])
+
+            # update_hiring_status
+            lo_num_items = f_param.inv_up * self.f_demand[f]
+            up_num_items = f_param.inv_lo * self.f_demand[f]
+            few_items = self.f_num_items[f] < lo_num_items
+            many_items = self.f_num_items[f] > up_num_items
+            if few_items:
+                self.f_hiring_status[f] = 1
+                self.f_month_hiring[f] = month
+            elif many_items:
+                self.f_hiring_status[f] = -1
+            else:
+                self.f_hiring_status[f] = 0
+
+            # update_price
+            self.f_marginal_cost[f] = (self.f_wage[f] / self.sim.days_in_month) / f_param.tech_lvl
+            up_item_price = f_param.price_up * self.f_marginal_cost[f]
+            chance = u[f][1] < f_param.price_adj_prob
+            if few_items and self.f_item_price[f] < up_item_price and chance:
+                self.f_item_price[f] *= (1 + f_param.price_adj_rate * u[f][2])
+            elif many_items and self.f_item_price[f] > up_item_price and chance:
+                self.f_item_price[f] *= (1 - f_param.price_adj_rate * u[f][2])
+
+        # reset
+        self.f_demand[:] = 0
+        self.f_hired[:] = False
+
+    # actions at the beginning of a month
+    def act_bom(self):
+        with self.sim.profile('act_bom_f'):
+            self.act_bom_f()
+        with self.sim.profile('act_bom_hh'):
+            self.act_bom_hh()
+
+    # actions of households at the beginning of a month, see Household.find_cheaper_vendor, find_stocked_vendor, do_jobsearch
+    def act_bom_hh(self):
+        hh_param = self.sim.hh_param
+
+        # hiring firms in order of wage and id, see Hiring_index
+        # wages and hiring status don't change while households search employers
+        hiring = np.flatnonzero(self.f_hiring_status == 1)
+        hiring = hiring[np.argsort(self.f_wage[hiring], kind='stable')]
+
+        # the household list is shuffled, then each hh draws its row of random numbers
+        self.hh_order = self.hh_order[self.sim.rng.permutation(self.num_hh)]
+        u = self.sim.rng.random((self.num_hh, self.sim.num_bom_draws()))
+        active = np.empty(self.num_hh, dtype=np.int64)
+        num_active = kernels.act_bom_hh(self.hh_order, u, active, self.hh_money, self.hh_income, self.hh_res_wage, self.hh_daily_demand,
+                                       self.hh_employer, self.hh_employee_pos, self.hh_vendors, self.hh_blocked, self.hh_num_blocked,
+                                       self.f_item_price, self.f_num_items, self.f_wage, self.f_hiring_status,
+                                       self.f_employees, self.f_num_employees, self.f_employee_tree, self.f_hired,
+                                       hiring, self.f_wage[hiring], hh_param.job_search == 'index',
+                                       hh_param.repl_vend_price_prob, hh_param.lower_vendor_price, hh_param.repl_vend_inv_prob,
+                                       hh_param.unemployed_ask_num, hh_param.rw_change_employed, hh_param.rw_change_unemployed,
+                                       hh_param.repl_employer_prob, hh_param.cost_decay, self.sim.days_in_month)
+        self.hh_active = active[:num_active]
+
+    # actions each day of the month, return the number of hhs buying items
+    # hhs buy goods before firms produce new ones since production is assumed to take a day
+    # with common draws the order and random numbers of all hhs are drawn and looked up by hh, see Simulation.act_day
+    def act_day(self) -> int:
+        num_active = len(self.hh_active)
+        with self.sim.profile('act_day_hh'):
+            self.act_day_hh()
+        with self.sim.profile('act_day_f'):
+            self.f_num_items += self.sim.f_param.tech_lvl * self.f_num_employees
+        return num_active
+
+    # hhs buy items in random order, hhs that can't buy anymore leave for the rest of the month
+    def act_day_hh(self):
+        num_active = len(self.hh_active)
+        if self.sim.hh_param.common_draws:
+            keys = self.sim.rng.random(self.num_hh)
+            self.hh_active = self.hh_active[np.argsort(keys[self.hh_active], kind='stable')]
+            u = self.sim.rng.random((self.num_hh, self.num_v))[self.hh_active]
+        else:
+            self.hh_active = self.hh_active[self.sim.rng.permutation(num_active)]
+            u = self.sim.rng.random((num_active, self.num_v))
+        num_left = kernels.act_day_hh(self.hh_active, u, self.hh_money, self.hh_daily_demand, self.hh_vendors, self.hh_blocked,
+                                      self.hh_num_blocked, self.f_money, self.f_item_price, self.f_num_items, self.f_demand, self.sim.hh_param.demand_sat)
+        self.hh_active = self.hh_active[:num_left]
+
+    # actions at the end of a month, see Firm.set_reserve, pay_profits, pay_wages, make_layoff_decision
+    def act_eom(self):
+        with self.sim.profile('pay_profits'):
+            kernels.pay_profits(self.hh_order, self.hh_money, self.hh_income, self.f_money, self.f_reserve,
+                                self.f_wage, self.f_num_employees, self.sim.f_param.buffer_rate, self.sim.f_param.batch_profits)
+        with self.sim.profile('pay_wages'):
+            self.pay_wages()
+        with self.sim.profile('layoffs'):
+            self.layoffs()
+
+    # firms pay their employees, see Firm.pay_wages and Household.update_res_wage
+    def pay_wages(self):
+        # pay employees the full wage, if insufficient money available then reduce wage
+        # each hh receives a single wage so firms can pay at once
+        short = (self.f_money < self.f_wage * self.f_num_employees) & (self.f_num_employees > 0)
+        self.f_wage[short] = self.f_money[short] / self.f_num_employees[short]
+        employed = np.flatnonzero(self.hh_employer >= 0)
+        wage = self.f_wage[self.hh_employer[employed]]
+        self.hh_money[employed] += wage
+        self.hh_income[employed] += wage
+        self.f_money -= self.f_wage * self.f_num_employees
+
+        # hhs get used to their wage and expect this as their new reservation wage
+        self.hh_res_wage[employed] = np.where(wage > self.hh_res_wage[employed], wage, self.hh_res_wage[employed])
+
+    # firms with too many items in stock fire a random employee from their list of employees, see Firm.make_layoff_decision
+    def layoffs(self):
+        u = self.sim.rng.random(self.num_f).tolist()
+        for f in range(self.num_f):
+            if self.f_hiring_status[f] != -1 or self.f_num_employees[f] < 1: continue
+            employee = self.f_employees[f][int(u[f] * self.f_num_employees[f])]
+            kernels.remove_employee(self.f_employees, self.f_num_employees, self.f_employee_tree, self.hh_employee_pos, f, employee)
+            self.hh_employer[employee] = -1
+            self.hh_res_wage[employee] *= self.sim.hh_param.rw_change_fired
+
+    ######## ######## ######## GOVERNMENT ######## ######## ########
+
+    # collect taxes from all households, return the sum of taxes
+    def collect_tax(self, tax_rate: float) -> float:
+        return kernels.collect_tax(self.hh_order, self.hh_money, self.hh_income, tax_rate)
+
+    # pay equal ubi to all households
+    def pay_ubi(self, ubi: float):
+        self.hh_money += ubi
+
+    ######## ######## ######## DATA ######## ######## ########
+
+    # return a household measure for all households in order of the household list
+    def hh_values(self, field: str) -> np.ndarray:
+        if field == 'employed': return self.hh_employer[self.hh_order] >= 0
+        if field == 'employer_id': return self.hh_employer[self.hh_order]
+        return getattr(self, 'hh_' + field)[self.hh_order]
+
+    # return a firm measure for all firms
+    def f_values(self, field: str) -> np.ndarray:
+        return getattr(self, 'f_' + field)
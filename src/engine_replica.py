@@ -0,0 +1,50 @@
+
+
+class Engine_replica(object):
+    '''
+    The engine of a single replica whose agents are stacked with those of other replicas in a vector engine, see Replicas.
+    Replicas advance the stacked engine for all replicas at once, so the month phases of a single replica leave agents as they are.
+    Taxes, ubi and measures act on the replica's part of the stacked arrays.
+    '''
+
+    def __init__(self, stack: object, replica: int):
+        self.stack = stack                      # vector engine holding the agents of all replicas
+        self.replica = replica                  # index of the replica in the stacked engine
+
+    ######## ######## ######## MONTH PHASES ######## ######## ########
+
+    # agents are initialized for all replicas by the stacked engine
+    def init_agents(self):
+        pass
+
+    # agents act for all replicas in the stacked engine
+    def act_bom(self):
+        pass
+
+    # return the number of hhs of the replica that bought items on the day the stacked engine simulated last
+    def act_day(self) -> int:
+        return int(self.stack.num_active[self.replica])
+
+    # agents act for all replicas in the stacked engine
+    def act_eom(self):
+        pass
+
+    ######## ######## ######## GOVERNMENT ######## ######## ########
+
+    # collect taxes from all households of the replica, return the sum of taxes
+    def collect_tax(self, tax_rate: float) -> float:
+        return self.stack.collect_tax(tax_rate, self.replica)
+
+    # pay equal ubi to all households of the replica
+    def pay_ubi(self, ubi: float):
+        self.stack.pay_ubi(ubi, self.replica)
+
+    ######## ######## ######## DATA ######## ######## ########
+
+    # return a household measure for all households of the replica
+    def hh_values(self, field: str):
+        return self.stack.hh_values(field, self.replica)
+
+    # return a firm measure for all firms of the replica
+    def f_values(self, field: str):
+        return self.stack.f_values(field, self.replica)
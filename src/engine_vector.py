@@ -0,0 +1,413 @@
+
+
+import numpy as np
+from market import Market
+
+
+class Engine_vector(object):
+    '''
+    The vector engine stores firms and households as arrays (struct of arrays) instead of Python objects.
+    Each phase of a month acts on all agents at once by means of NumPy array operations.
+    Agents follow the decision rules of the Firm and Household classes.
+    Since households search for vendors and employers simultaneously rather than one after another,
+    results agree with the object engine in distribution and not draw for draw.
+    Daily purchases follow the sequential order of the object engine, see Market.
+
+    The arrays can stack the agents of a number of replicas, independent simulations of the same size, see Replicas.
+    Replica r holds firms r*num_f to (r+1)*num_f-1 and households r*num_hh to (r+1)*num_hh-1,
+    firm indices stored by households are indices into the stacked firm arrays.
+    Each replica draws from the generator of its own simulation,
+    so a replica's results are those of the same simulation run on its own.
+    '''
+
+    def __init__(self, sim: object, replicas: list = None):
+        self.sim = sim                                          # engine belongs to a simulation
+        self.replicas = replicas or [sim]                       # simulations whose agents are stacked, sim is the first
+        self.rngs = [replica.rng for replica in self.replicas]  # random generator of each replica
+        self.market = Market()                                  # clears daily sales between households and firms
+
+        self.num_r: int = len(self.replicas)                    # number of replicas
+        self.num_f: int = sim.f_param.num_firms                 # number of firms per replica
+        self.num_hh: int = sim.hh_param.num_hh                  # number of households per replica
+        self.num_v: int = sim.hh_param.num_vendors              # number of vendors per household
+
+        # firm arrays, index i holds the state of firm i
+        self.f_money = None                                     # current balance of firms
+        self.f_reserve = None                                   # money not paid out as profits
+        self.f_num_items = None                                 # number of items in stock for selling
+        self.f_item_price = None                                # price a single item is sold for
+        self.f_marginal_cost = None                             # price of producing one item
+        self.f_demand = None                                    # number of items asked for this month
+        self.f_wage = None                                      # money paid to each employee per month
+        self.f_hiring_status = None                             # ternary, where 1: hire, 0: no changes, -1: fire
+        self.f_hired = None                                     # hired or didn't hire a hh this month
+        self.f_month_hiring = None                              # month the firm last started looking for an employee
+
+        # household arrays, index i holds the state of household i
+        self.hh_money = None                                    # current balance of households
+        self.hh_income = None                                   # sum of wage and profit within a month
+        self.hh_res_wage = None                                 # reservation wage
+        self.hh_daily_demand = None                             # number of items a hh aims to buy each day
+        self.hh_employer = None                                 # index of employer firm, -1 when unemployed
+        self.hh_vendors = None                                  # (num_hh, num_vendors) indices of vendor firms
+        self.hh_blocked = None                                  # (num_hh, num_vendors) vendor couldn't satisfy demand
+        self.hh_active = None                                   # indices of households that can still buy items this month
+        self.hh_f_offset = None                                 # index of the first firm of each household's replica
+        self.num_active = None                                  # number of households of each replica that bought items on the last day
+
+    ######## ######## ######## INITIALIZATION ######## ######## ########
+
+    # initialize firm and household arrays
+    def init_agents(self):
+        f_param = self.sim.f_param
+        hh_param = self.sim.hh_param
+        num_f, num_hh = self.num_f * self.num_r, self.num_hh * self.num_r
+
+        if self.num_f <= self.num_v:
+            raise ValueError(f"at least {self.num_v + 1} firms are needed for households to choose {self.num_v} vendors")
+
+        u = self.f_random(2)
+        self.f_money = np.full(num_f, f_param.init_money, dtype=float)
+        self.f_reserve = np.full(num_f, f_param.init_reserve, dtype=float)
+        self.f_num_items = np.full(num_f, f_param.init_items, dtype=float)
+        self.f_item_price = f_param.init_avg_price + (u[:, 0] - 0.5) / 50
+        self.f_marginal_cost = np.zeros(num_f)
+        self.f_demand = np.zeros(num_f)
+        self.f_wage = f_param.init_avg_wage + (u[:, 1] - 0.5) / 50
+        self.f_hiring_status = np.zeros(num_f, dtype=int)
+        self.f_hired = np.zeros(num_f, dtype=bool)
+        self.f_month_hiring = np.zeros(num_f, dtype=int)
+
+        # first, hhs are distributed such that each firm of their replica has one employee
+        # afterwards, hhs are randomly assigned to an employer
+        rows = np.arange(num_hh)
+        self.hh_f_offset = rows // self.num_hh * self.num_f
+        local = rows % self.num_hh
+        self.hh_employer = self.hh_f_offset + np.where(local < self.num_f, local, self.draw_local(rows, self.num_f))
+
+        self.hh_money = np.full(num_hh, hh_param.init_money, dtype=float)
+        self.hh_income = np.zeros(num_hh)
+        self.hh_res_wage = np.zeros(num_hh)
+        self.hh_daily_demand = np.zeros(num_hh)
+        self.hh_vendors = self.draw_distinct_firms(rows)
+        self.hh_blocked = np.zeros((num_hh, self.num_v), dtype=bool)
+        self.hh_active = np.zeros(0, dtype=int)
+        self.num_active = np.zeros(self.num_r, dtype=int)
+
+    # return for each row num_vendors firm indices of its replica without repetition within the row
+    def draw_distinct_firms(self, rows: np.ndarray) -> np.ndarray:
+        firms = self.draw_local(rows, self.num_f, self.num_v)
+        todo = np.arange(len(rows))
+        while True:
+            s = np.sort(firms[todo], axis=1)
+            todo = todo[(s[:, 1:] == s[:, :-1]).any(axis=1)]
+            if len(todo) == 0: return firms + self.hh_f_offset[rows, None]
+            firms[todo] = self.draw_local(rows[todo], self.num_f, self.num_v)
+
+    ######## ######## ######## RANDOM ######## ######## ########
+
+    # return uniform random numbers in [0, 1) of shape (len(rows), *shape) for the given household rows
+    # rows must be in ascending order, the numbers of a row are drawn from the generator of its replica
+    # with common draws numbers are drawn for all households and looked up by row, so a hh's numbers don't depend on other hhs
+    def hh_random(self, rows: np.ndarray, *shape) -> np.ndarray:
+        if self.sim.hh_param.common_draws: return np.concatenate([rng.random((self.num_hh,) + shape) for rng in self.rngs])[rows]
+        if self.num_r == 1: return self.rngs[0].random((len(rows),) + shape)
+        counts = np.bincount(rows // self.num_hh, minlength=self.num_r)
+        return np.concatenate([rng.random((n,) + shape) for rng, n in zip(self.rngs, counts)])
+
+    # return uniform random numbers in [0, 1) of shape (number of firms, *shape), drawn from the generator of each firm's replica
+    def f_random(self, *shape) -> np.ndarray:
+        return np.concatenate([rng.random((self.num_f,) + shape) for rng in self.rngs])
+
+    # return random integers in [0, high) of shape (len(rows), *shape) for the given household rows, see hh_random
+    def draw_local(self, rows: np.ndarray, high: int, *shape) -> np.ndarray:
+        return (self.hh_random(rows, *shape) * high).astype(int)
+
+    ######## ######## ######## HELPERS ######## ######## ########
+
+    # return the number of employees of each firm
+    def num_employees(self) -> np.ndarray:
+        return np.bincount(self.hh_employer[self.hh_employer >= 0], minlength=self.num_f * self.num_r)
+
+    # return for each row whether firm is among the row's vendors
+    def is_vendor(self, rows: np.ndarray, firm: np.ndarray) -> np.ndarray:
+        return (self.hh_vendors[rows] == firm[:, None]).any(axis=1)
+
+    # return for each row a firm drawn from the firms of its replica the hh doesn't buy from
+    # with weights=None every firm is equally likely, else proportional to weights
+    # rows which still draw a vendor after a number of attempts or whose replica has no weight are marked with -1
+    def draw_non_vendor(self, rows: np.ndarray, weights: np.ndarray = None, attempts: int = 20) -> np.ndarray:
+        new_firm = np.full(len(rows), -1)
+        offset = self.hh_f_offset[rows]
+        todo = np.arange(len(rows))
+        if weights is not None:
+            cum_weights = np.cumsum(weights)
+            replica_cum = np.concatenate(([0], cum_weights[self.num_f - 1::self.num_f]))
+            start, total = replica_cum[:-1][offset // self.num_f], np.diff(replica_cum)[offset // self.num_f]
+            todo = todo[total > 0]
+        for attempt in range(attempts):
+            if weights is None:
+                pick = offset[todo] + self.draw_local(rows[todo], self.num_f)
+            else:
+                target = start[todo] + self.hh_random(rows[todo]) * total[todo]
+                pick = np.minimum(np.searchsorted(cum_weights, target, side='right'), offset[todo] + self.num_f - 1)
+            ok = ~self.is_vendor(rows[todo], pick)
+            new_firm[todo[ok]] = pick[ok]
+            todo = todo[~ok]
+            if len(todo) == 0 and not self.sim.hh_param.common_draws: break
+        return new_firm
+
+    # return for each row whether buying items can still change the hh or its vendors this month, see Household.can_buy
+    def can_buy(self, rows: np.ndarray) -> np.ndarray:
+        affordable = (self.hh_money[rows, None] // self.f_item_price[self.hh_vendors[rows]] > 0).any(axis=1)
+        return (self.hh_daily_demand[rows] > 0) & (~self.hh_blocked[rows].all(axis=1) | affordable)
+
+    # return the slice of household arrays that holds the households of replica r
+    def hh_slice(self, r: int) -> slice:
+        return slice(r * self.num_hh, (r + 1) * self.num_hh)
+
+    # return the slice of firm arrays that holds the firms of replica r
+    def f_slice(self, r: int) -> slice:
+        return slice(r * self.num_f, (r + 1) * self.num_f)
+
+    ######## ######## ######## FIRM PHASES ######## ######## ########
+
+    # update wage, hiring status and price of all firms, see Firm.update_wage, update_hiring_status, update_price
+    def act_bom_f(self):
+        f_param = self.sim.f_param
+        month = self.sim.current_month
+        u = self.f_random(3)
+
+        # increase wage when an employee was searched for last month but none was found
+        # decrease wage after n months of full employment
+        rise = (self.f_month_hiring == month - 1) & ~self.f_hired
+        fall = ~rise & (month - self.f_month_hiring > f_param.lo_wage_months)
+        self.f_wage[rise] *= 1 + u[rise, 0] * f_param.wage_adj_rate
+        self.f_wage[fall] *= 1 - u[fall, 0] * f_param.wage_adj_rate
+
+        # employ more people when not enough items are produced
+        # fire people when too many items are in stock
+        lo_num_items = f_param.inv_up * self.f_demand
+        up_num_items = f_param.inv_lo * self.f_demand
+        few_items = self.f_num_items < lo_num_items
+        many_items = self.f_num_items > up_num_items
+        self.f_hiring_status = np.where(few_items, 1, np.where(many_items, -1, 0))
+        self.f_month_hiring[few_items] = month
+
+        # increase price when few items in stock and sold cheaply
+        # lower price when many items in stock and sold expensively
+        self.f_marginal_cost = (self.f_wage / self.sim.days_in_month) / f_param.tech_lvl
+        up_item_price = f_param.price_up * self.f_marginal_cost
+        chance = u[:, 1] < f_param.price_adj_prob
+        rise = few_items & (self.f_item_price < up_item_price) & chance
+        fall = ~rise & many_items & (self.f_item_price > up_item_price) & chance
+        self.f_item_price[rise] *= 1 + f_param.price_adj_rate * u[rise, 2]
+        self.f_item_price[fall] *= 1 - f_param.price_adj_rate * u[fall, 2]
+
+        # reset monthly demand and hiring
+        self.f_demand[:] = 0
+        self.f_hired[:] = False
+
+    # produce new items for firms' inventory
+    def act_day_f(self):
+        self.f_num_items += self.sim.f_param.tech_lvl * self.num_employees()
+
+    ######## ######## ######## HOUSEHOLD PHASES ######## ######## ########
+
+    # households try to replace a vendor with a cheaper one, see Household.find_cheaper_vendor
+    def find_cheaper_vendor(self, num_employees: np.ndarray):
+        hh_param = self.sim.hh_param
+        rows = np.flatnonzero(self.hh_random(np.arange(len(self.hh_money))) <= hh_param.repl_vend_price_prob)
+
+        # probability of choosing a new vendor is proportional to a firm's number of employees
+        slot = self.draw_local(rows, self.num_v)
+        new_firm = self.draw_non_vendor(rows, weights=num_employees)
+        found = new_firm >= 0
+        rows, slot, new_firm = rows[found], slot[found], new_firm[found]
+
+        old_price = self.f_item_price[self.hh_vendors[rows, slot]]
+        cheaper = self.f_item_price[new_firm] < old_price * (1 - hh_param.lower_vendor_price)
+        rows, slot = rows[cheaper], slot[cheaper]
+        self.hh_vendors[rows, slot] = new_firm[cheaper]
+        self.hh_blocked[rows, slot] = False
+
+    # households replace a vendor that had insufficient stock last month, see Household.find_stocked_vendor
+    def find_stocked_vendor(self):
+        chance = self.hh_random(np.arange(len(self.hh_money))) <= self.sim.hh_param.repl_vend_inv_prob
+        rows = np.flatnonzero(self.hh_blocked.any(axis=1) & chance)
+        if len(rows) == 0 and not self.sim.hh_param.common_draws: return
+
+        # probability is proportional to the least number of items in stock among blocked vendors
+        # when all blocked vendors have the same stock each is equally likely
+        blocked = self.hh_blocked[rows]
+        items = self.f_num_items[self.hh_vendors[rows]]
+        max_items = np.where(blocked, items, -np.inf).max(axis=1)
+        weights = np.where(blocked, max_items[:, None] - items, 0)
+        uniform = weights.sum(axis=1) <= 0
+        weights[uniform] = blocked[uniform]
+        cum_weights = np.cumsum(weights, axis=1)
+        target = self.hh_random(rows) * cum_weights[:, -1]
+        slot = (cum_weights <= target[:, None]).sum(axis=1)
+
+        # randomly choose among firms the hh doesn't buy from
+        new_firm = self.draw_non_vendor(rows)
+        found = new_firm >= 0
+        self.hh_vendors[rows[found], slot[found]] = new_firm[found]
+        self.hh_blocked[rows[found]] = False
+
+    # households search for an employer, see Household.do_jobsearch
+    def do_jobsearch(self, num_employees: np.ndarray):
+        hh_param = self.sim.hh_param
+        employer = self.hh_employer
+        employed_rows = np.flatnonzero(employer >= 0)
+
+        # unemployed hhs randomly approach a number of firms
+        # the first firm hiring and paying at least the reservation wage employs the hh
+        rows = np.flatnonzero(employer < 0)
+        ask = self.hh_f_offset[rows, None] + self.draw_local(rows, self.num_f, hh_param.unemployed_ask_num)
+        ok = (self.f_hiring_status[ask] == 1) & (self.f_wage[ask] >= self.hh_res_wage[rows, None])
+        found = ok.any(axis=1)
+        new_firm = ask[found, ok[found].argmax(axis=1)]
+        employer[rows[found]] = new_firm
+        self.f_hired[new_firm] = True
+        self.hh_res_wage[rows[~found]] *= hh_param.rw_change_unemployed
+
+        # employed hhs paid less than reservation wage search a better employer
+        # employed hhs paid reservation wage also sometimes look for better pay
+        rows = employed_rows
+        self.hh_res_wage[rows] *= hh_param.rw_change_employed
+        old_firm = employer[rows]
+        only_employee = num_employees[old_firm] <= 1
+        bad_pay = self.f_wage[old_firm] < self.hh_res_wage[rows]
+        chance = self.hh_random(rows) < hh_param.repl_employer_prob
+        search = ~only_employee & bad_pay | chance
+        rows, old_firm = rows[search], old_firm[search]
+
+        # choose among all firms of the replica except for the current employer
+        pot_firm = self.hh_f_offset[rows] + self.draw_local(rows, self.num_f - 1)
+        pot_firm += pot_firm >= old_firm
+        pays_enough = self.f_wage[pot_firm] > self.hh_res_wage[rows]
+        pays_better = self.f_wage[pot_firm] > self.f_wage[old_firm]
+        switch = (self.f_hiring_status[pot_firm] == 1) & pays_enough & pays_better
+        employer[rows[switch]] = pot_firm[switch]
+        self.f_hired[pot_firm[switch]] = True
+
+    # households determine quantity of items consumed each day, see Household.plan_demand
+    def plan_demand(self):
+        mean_price = self.f_item_price[self.hh_vendors].mean(axis=1)
+        no_decay_demand = np.maximum(self.hh_money // mean_price, 0)
+        monthly_demand = np.minimum(no_decay_demand ** self.sim.hh_param.cost_decay, no_decay_demand)
+        self.hh_daily_demand = monthly_demand // self.sim.days_in_month
+
+    # active households buy items from their vendors, see Household.buy_items and Market
+    # households are served in random order of priority within their replica, each hh visits its vendors in random order
+    # households that turned idle leave the active set
+    def act_day_hh(self):
+        rows = self.hh_active
+        priority = np.lexsort((self.hh_random(rows), rows // self.num_hh))
+        visit_u = self.hh_random(rows, self.num_v)
+        self.market.clear(rows[priority], visit_u[priority], self.hh_vendors, self.hh_daily_demand, self.hh_money, self.hh_blocked,
+                          self.f_num_items, self.f_item_price, self.f_money, self.f_demand, self.sim.hh_param.demand_sat)
+        self.hh_active = rows[self.can_buy(rows)]
+
+    ######## ######## ######## MONTH PHASES ######## ######## ########
+
+    # actions at the beginning of a month
+    def act_bom(self):
+        with self.sim.profile('act_bom_f'):
+            self.act_bom_f()
+        with self.sim.profile('act_bom_hh'):
+            self.hh_income[:] = 0
+            num_employees = self.num_employees()
+            self.find_cheaper_vendor(num_employees)
+            self.find_stocked_vendor()
+            self.do_jobsearch(num_employees)
+            self.plan_demand()
+            self.hh_active = np.flatnonzero(self.can_buy(np.arange(len(self.hh_money))))
+
+    # actions each day of the month, return the number of hhs buying items
+    def act_day(self) -> int:
+        self.num_active = np.bincount(self.hh_active // self.num_hh, minlength=self.num_r)
+        with self.sim.profile('act_day_hh'):
+            self.act_day_hh()
+        with self.sim.profile('act_day_f'):
+            self.act_day_f()
+        return int(self.num_active.sum())
+
+    # actions at the end of a month, see Firm.set_reserve, pay_profits, pay_wages, make_layoff_decision
+    def act_eom(self):
+        f_param = self.sim.f_param
+        employed = self.hh_employer >= 0
+        employer = self.hh_employer[employed]
+        num_employees = self.num_employees()
+        sum_wages = self.f_wage * num_employees
+
+        # profits are paid to all households of a replica at once or firm after firm, see Simulation.pay_profits
+        with self.sim.profile('pay_profits'):
+            self.f_reserve = np.maximum(0, np.minimum(f_param.buffer_rate * sum_wages, self.f_money))
+            profit = np.maximum(0, self.f_money - sum_wages - self.f_reserve)
+            if f_param.batch_profits: self.distribute_profit(profit.reshape(self.num_r, self.num_f).sum(axis=1))
+            else:
+                for f_profit in profit.reshape(self.num_r, self.num_f).T:
+                    self.distribute_profit(f_profit)
+            self.f_money -= profit
+
+        # pay employees the full wage, if insufficient money available then reduce wage
+        # hhs get used to their wage and expect this as their new reservation wage
+        with self.sim.profile('pay_wages'):
+            short = (self.f_money < sum_wages) & (num_employees > 0)
+            self.f_wage[short] = self.f_money[short] / num_employees[short]
+            self.hh_money[employed] += self.f_wage[employer]
+            self.hh_income[employed] += self.f_wage[employer]
+            self.f_money -= self.f_wage * num_employees
+            wage = self.f_wage[employer]
+            self.hh_res_wage[employed] = np.maximum(self.hh_res_wage[employed], wage)
+
+        # firms with too many items in stock fire a random employee
+        with self.sim.profile('layoffs'):
+            rows = np.flatnonzero(employed & (self.f_hiring_status[np.maximum(self.hh_employer, 0)] == -1))
+            rows = rows[np.lexsort((self.hh_random(rows), self.hh_employer[rows]))]
+            first = np.ones(len(rows), dtype=bool)
+            first[1:] = self.hh_employer[rows][1:] != self.hh_employer[rows][:-1]
+            fired = rows[first]
+            self.hh_employer[fired] = -1
+            self.hh_res_wage[fired] *= self.sim.hh_param.rw_change_fired
+
+    # pay the profit of each replica to the households of the replica, richer households receive higher profits
+    def distribute_profit(self, profit: np.ndarray):
+        money = self.hh_money.reshape(self.num_r, self.num_hh)
+        income = self.hh_income.reshape(self.num_r, self.num_hh)
+        sum_hh_money = np.where(money > 0, money, 0).sum(axis=1)
+        paid = np.flatnonzero((profit > 0) & (sum_hh_money > 0))
+        share = profit[paid, None] * (money[paid] / sum_hh_money[paid, None])
+        money[paid] += share
+        income[paid] += share
+
+    ######## ######## ######## GOVERNMENT ######## ######## ########
+
+    # collect taxes from all households of replica r, return the sum of taxes
+    # hhs pay a portion of their monthly income but not more than they have
+    def collect_tax(self, tax_rate: float, r: int = 0) -> float:
+        money = self.hh_money[self.hh_slice(r)]
+        tax = self.hh_income[self.hh_slice(r)] * tax_rate
+        tax = np.where(money - tax < 0, money, tax)
+        money -= tax
+        return tax.sum()
+
+    # pay equal ubi to all households of replica r
+    def pay_ubi(self, ubi: float, r: int = 0):
+        self.hh_money[self.hh_slice(r)] += ubi
+
+    ######## ######## ######## DATA ######## ######## ########
+
+    # return a household measure for all households of replica r
+    def hh_values(self, field: str, r: int = 0) -> np.ndarray:
+        employer = self.hh_employer[self.hh_slice(r)]
+        if field == 'employed': return employer >= 0
+        if field == 'employer_id': return np.where(employer >= 0, employer - r * self.num_f, -1)
+        return getattr(self, 'hh_' + field)[self.hh_slice(r)]
+
+    # return a firm measure for all firms of replica r
+    def f_values(self, field: str, r: int = 0) -> np.ndarray:
+        if field == 'num_employees': return self.num_employees()[self.f_slice(r)]
+        return getattr(self, 'f_' + field)[self.f_slice(r)]
@@ -0,0 +1,65 @@
+
+
+class Fenwick(object):
+    '''
+    A Fenwick tree (binary indexed tree) holds integer weights of a number of items.
+    Updating a weight and drawing an item with probability proportional to its weight take O(log n).
+    The simulation holds one over the number of employees of each firm to let households choose vendors.
+    '''
+
+    def __init__(self, weights: list):
+        self.n: int = len(weights)                      # number of items
+        self.weights: list = list(weights)              # weight of each item
+        self.total: int = sum(weights)                  # sum of all weights
+        self.tree: list = [0] + list(weights)           # tree[i] holds the sum of weights i-(i&-i) to i-1
+        for i in range(1, self.n + 1):
+            parent = i + (i & -i)
+            if parent <= self.n: self.tree[parent] += self.tree[i]
+        self.top: int = 1 << (self.n.bit_length() - 1) if self.n > 0 else 0    # largest power of two not above n
+
+    ######## ######## ######## METHODS ######## ######## ########
+
+    # add delta to the weight of item i
+    def add(self, i: int, delta: int):
+        self.weights[i] += delta
+        self.total += delta
+        i += 1
+        while i <= self.n:
+            self.tree[i] += delta
+            i += i & -i
+
+    # return the first item whose weight summed with the weights of all items before it, minus offset, exceeds x
+    # return n if there is none
+    def search(self, x: float, offset: int = 0) -> int:
+        pos, prefix = 0, -offset
+        step = self.top
+        while step > 0:
+            if pos + step <= self.n and prefix + self.tree[pos + step] <= x:
+                pos += step
+                prefix += self.tree[pos]
+            step >>= 1
+        return pos
+
+    # return an item drawn with probability proportional to its weight, items in exclude are never drawn
+    # u is uniform in [0, 1), the draw follows random.choices(items not excluded, their weights)
+    # return -1 when all items not excluded have zero weight
+    def draw(self, u: float, exclude: list) -> int:
+        exclude = sorted(exclude)
+        offset = 0
+        for i in exclude: offset += self.weights[i]
+        if self.total - offset <= 0: return -1
+
+        # skip the weight of excluded items that lie before the drawn item
+        x = u * (self.total - offset)
+        offset = 0
+        item = self.search(x)
+        for i in exclude:
+            if i > item: break
+            offset += self.weights[i]
+            item = self.search(x, offset)
+
+        # like random.choices fall back to the last item when rounding lets x reach the total
+        if item >= self.n:
+            item = self.n - 1
+            while item in exclude: item -= 1
+        return item
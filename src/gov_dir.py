@@ -22,7 +22,7 @@ class Gov_dir(object):
     # all households have equal weight
     # by averaging individual votes a final tax rate is calculated
     def vote_tax(self):
-        taf = self.sim.g_param['tax_adj_freq']           # tax adjustment frequency
+        taf = self.sim.g_param.tax_adj_freq              # tax adjustment frequency
         
         # only tax households once enough data is available
         if len(self.sim.stat.hh_stat['metric']['gini_i']) < taf:
@@ -38,34 +38,32 @@ class Gov_dir(object):
         m_gini = sum(g_list) / len(g_list)
 
         # sort households by income
-        hh_i_sort = sorted(self.sim.hh_list, key=lambda hh: hh.income)
+        i_sort = self.sim.order_stats.sorted('hh_income').tolist()
 
         # normalize how much income a hh has in relation to the sum of household incomes
         # transform this to the range of 4 to 0 for poorest and richest households
-        max_i = hh_i_sort[-1].income                    # income of richest hh
-        min_i = hh_i_sort[0].income                     # income of poorest hh
-        mY = self.sim.g_param['tax_gamma']              # maximum gamma value
-        gamma_list = [(hh.income - max_i) / (min_i - max_i) * mY for hh in hh_i_sort]   # list of hhs' gammas
+        max_i = i_sort[-1]                              # income of richest hh
+        min_i = i_sort[0]                               # income of poorest hh
+        mY = self.sim.g_param.tax_gamma                 # maximum gamma value
+        gamma_list = [(income - max_i) / (min_i - max_i) * mY for income in i_sort]   # list of hhs' gammas
 
         self.tax_rate = 0
-        num_hh = self.sim.hh_param['num_hh']            # number of households
+        num_hh = self.sim.hh_param.num_hh               # number of households
         for hh in range(num_hh):
             self.tax_rate += 1 - (1 + m_gini)**-gamma_list[hh]      # sum tax proposals
         self.tax_rate = self.tax_rate / num_hh          # avarage tax proposals
 
     # collect taxes from all households each month
     def collect_tax(self):
-        for hh in self.sim.hh_list:
-            self.money += hh.pay_tax(self.tax_rate)
+        self.money += self.sim.collect_tax(self.tax_rate)
 
     # ubi is equal for all hhs each month
     def calc_ubi(self):
-        self.ubi = self.money / self.sim.hh_param['num_hh']
+        self.ubi = self.money / self.sim.hh_param.num_hh
 
     # pay equal ubi to all households each month
     def pay_ubi(self):
-        for hh in self.sim.hh_list:
-            hh.receive_ubi(self.ubi)
+        self.sim.pay_ubi(self.ubi)
         self.money = 0
 
 ######## ######## ######## IMPORTS ######## ######## ########
@@ -15,24 +15,17 @@ class Gov_rep(object):
         self.money = 0                          # money available to government for redistribution
         self.tax_rate = 0                       # taxes are collected each month based on income and taxrate
         self.ubi = 0                            # ubi paid to each hh monthly
-        self.parties = [0] * self.sim.g_param['rep_num_parties']    # holds parliamentary composition in percentages per party
+        self.parties = [0] * self.sim.g_param.rep_num_parties       # holds parliamentary composition in percentages per party
                                                 # the left most party in the list represents the poorest households
 
     ######## ######## ######## METHODS ######## ######## ########
 
     # each term a new government is elected in the form of a parliamentary composition
     def assemble_parliament(self):
-        hh_i_sort = sorted(self.sim.hh_list, key=lambda hh: hh.income)   # sort households by income
-        num_p = self.sim.g_param['rep_num_parties']
-        
-        # integrate over households income
-        integral = [0]
-        for hh in hh_i_sort:
-            integral.append(hh.income + integral[-1])
+        num_p = self.sim.g_param.rep_num_parties
 
-        norm = [i / integral[-1] for i in integral]     # normalize integral
-        x = list(range(0, len(norm)))                   # list with number of points in integral
-        x = [i /(len(x)-1) for i in x]                  # normalize list
+        # integrate over households income sorted by income, normalized to the share of households and the share of income
+        x, norm = self.sim.order_stats.lorenz('hh_income')
 
         # Given (x, norm) income_dist(0.2) returns the % of income is received by the poorest 20% of households
         # Given (norm, x) income_dist(0.2) returns the % of households receiving the leftmost 20% of income
@@ -48,7 +41,7 @@ class Gov_rep(object):
     # for example, when the left most 20% of income is received by the poorest 60% of households their party has 60% weight
     # poor party votes for highest taxes, the rich party for the lowest taxes
     def vote_tax(self):
-        taf = self.sim.g_param['tax_adj_freq']           # tax adjustment frequency
+        taf = self.sim.g_param.tax_adj_freq              # tax adjustment frequency
 
         # only tax households once enough data is available
         if len(self.sim.stat.hh_stat['metric']['gini_i']) < taf:
@@ -61,7 +54,7 @@ class Gov_rep(object):
 
         # first government established after one year has passed
         # only elect a new government once a term has passed
-        if (self.sim.current_month - taf) % self.sim.g_param['rep_term_length'] == 0:
+        if (self.sim.current_month - taf) % self.sim.g_param.rep_term_length == 0:
             self.assemble_parliament()
 
         # mean gini index of the past tax_adj_freq months
@@ -70,25 +63,23 @@ class Gov_rep(object):
 
         # calculate tax
         self.tax_rate = 0
-        gamma = self.sim.g_param['tax_gamma']                           # maximum gamma value
-        gamma_step = gamma / (self.sim.g_param['rep_num_parties']-1)    # stepwise decrease of gamma per party
+        gamma = self.sim.g_param.tax_gamma                              # maximum gamma value
+        gamma_step = gamma / (self.sim.g_param.rep_num_parties-1)       # stepwise decrease of gamma per party
         for p in self.parties:
             self.tax_rate += (1 - (1 + m_gini)**-gamma) * p
             gamma -= gamma_step
 
     # collect taxes from all households each month
     def collect_tax(self):
-        for hh in self.sim.hh_list:
-            self.money += hh.pay_tax(self.tax_rate)
+        self.money += self.sim.collect_tax(self.tax_rate)
 
     # ubi is equal for all hhs each month
     def calc_ubi(self):
-        self.ubi = self.money / self.sim.hh_param['num_hh']
+        self.ubi = self.money / self.sim.hh_param.num_hh
 
     # pay equal ubi to all households each month
     def pay_ubi(self):
-        for hh in self.sim.hh_list:
-            hh.receive_ubi(self.ubi)
+        self.sim.pay_ubi(self.ubi)
         self.money = 0
 
 ######## ######## ######## IMPORTS ######## ######## ########
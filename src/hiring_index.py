@@ -0,0 +1,49 @@
+
+
+from bisect import bisect_left
+import math
+
+
+class Hiring_index(object):
+    '''
+    The hiring index lists all firms with hiring status 1 in order of their wage.
+    Firms update their entry when their wage or hiring status changes.
+    Households search employers among the firms paying at least what they ask for
+    instead of asking random firms, see Household.search_any_employer.
+    Firms update their entries before households search, so updates take O(1)
+    and the entries are sorted once when first searched after updates, O(F log F) per month.
+    '''
+
+    def __init__(self):
+        self.entries: list = []                 # (wage, firm id) of hiring firms in ascending order when not stale
+        self.entry: dict = {}                   # entry of each hiring firm by firm id
+        self.stale: bool = False                # entries changed since they were last sorted
+
+    ######## ######## ######## METHODS ######## ######## ########
+
+    # add, move or remove a firm after its wage or hiring status changed
+    def update(self, firm: object):
+        if firm.hiring_status == 1: self.entry[firm.id] = (firm.wage, firm.id)
+        else: self.entry.pop(firm.id, None)
+        self.stale = True
+
+    # return the entries of hiring firms in ascending order, sorting them after updates
+    def sorted_entries(self) -> list:
+        if self.stale:
+            self.entries = sorted(self.entry.values())
+            self.stale = False
+        return self.entries
+
+    # return the number of hiring firms paying at least wage
+    def count_from(self, wage: float) -> int:
+        entries = self.sorted_entries()
+        return len(entries) - bisect_left(entries, (wage, -1))
+
+    # return the number of hiring firms paying more than wage
+    def count_above(self, wage: float) -> int:
+        entries = self.sorted_entries()
+        return len(entries) - bisect_left(entries, (wage, math.inf))
+
+    # return the id of the i-th best paying hiring firm, starting at 0
+    def get(self, i: int) -> int:
+        return self.sorted_entries()[-1 - i][1]
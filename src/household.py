@@ -9,13 +9,15 @@ class Household(object):
     Based on the ability to satisfy item demand a household may change its preferred vendors.
     '''
 
-    def __init__(self, sim: object, employer: object):
+    # u holds one uniform random number in [0, 1) for each vendor chosen at the start
+    def __init__(self, sim: object, employer: object, u: list):
         self.sim: object = sim                                  # hh belongs to a simulation
-        self.money: float = sim.hh_param.get("init_money")      # current balance of hh
+        self.id: int = len(sim.hh_list)                         # stable number of the hh, its position in the initial hh list
+        self.money: float = sim.hh_param.init_money             # current balance of hh
         self.employer: object = employer                        # hh has one employer firm (type B connection)
         self.vendor_list: list = []                             # hh buys at up to ('num_vendors') n firms (type A connection)
-        for vendor in range(sim.hh_param.get("num_vendors")):
-            self.vendor_list.append(random.choice(self.get_non_vendor_firms()))
+        for vendor in range(sim.hh_param.num_vendors):
+            self.vendor_list.append(self.choose_non_vendor(u[vendor]))
         self.blocked_vendors: list = []                         # store firms unable to satisfy demand last month
         self.res_wage: float = 0                                # reservation wage, minimum wage hh works for
         self.daily_demand: int = 0                              # number of items a hh aims to buy each day
@@ -26,7 +28,7 @@ class Household(object):
     # set hh to have no employer
     def fired(self):
         self.employer = None
-        self.res_wage *= self.sim.hh_param.get("rw_change_fired")
+        self.res_wage *= self.sim.hh_param.rw_change_fired
 
     # increase hh balance by received wage
     def receive_wage(self, employer_money):
@@ -38,12 +40,14 @@ class Household(object):
         self.money += profit_money
         self.income += profit_money
 
-    # return list of vendors the hh doesn't buy from
-    def get_non_vendor_firms(self) -> [object]:
-        pot_vendor_list = self.sim.firm_list.copy()
-        for vendor in self.vendor_list:
-            pot_vendor_list.remove(vendor)
-        return pot_vendor_list
+    # return a random firm the hh doesn't buy from
+    # the i-th firm not among the vendors is found by skipping the vendors in order of the firm list
+    # u is a uniform random number in [0, 1) choosing i
+    def choose_non_vendor(self, u: float) -> object:
+        idx = int(u * (len(self.sim.firm_list) - len(self.vendor_list)))
+        for vendor_id in sorted(vendor.id for vendor in self.vendor_list):
+            if vendor_id <= idx: idx += 1
+        return self.sim.firm_list[idx]
 
     # return a list of all firms in the simulation except for the current employer
     def get_non_employer_firms(self) -> [object]:
@@ -56,49 +60,54 @@ class Household(object):
         return self.employer is not None
 
     # household tries to replace a vendor (firm it buys from) with a cheaper one
-    def find_cheaper_vendor(self):
+    # u holds three uniform random numbers in [0, 1), see Simulation.act_bom
+    def find_cheaper_vendor(self, u: list):
         # abort this method by chance
-        if random.uniform(0, 1) > self.sim.hh_param.get("repl_vend_price_prob"): return
+        if u[0] > self.sim.hh_param.repl_vend_price_prob: return
 
         # randomly select a firm the household buys from
-        old_firm = random.choice(self.vendor_list)
+        old_firm = self.vendor_list[int(u[1] * len(self.vendor_list))]
 
-        # list of vendors the hh doesn't buy
-        pot_vendor_list = self.get_non_vendor_firms()
-
-        # probability of choosing a new vendor is proportional to a firm’s number of employees
-        #   weight of a firm is: firm's number of employees / total number of households 
-        weight_list = []
-        for vendor in pot_vendor_list:
-            weight_list.append(len(vendor.list_employees) / self.sim.hh_param.get("num_hh"))
+        # probability of choosing a new vendor among the firms the hh doesn't buy from
+        # is proportional to a firm’s number of employees
+        # abort when none of these firms has employees
+        vendor_ids = [vendor.id for vendor in self.vendor_list]
+        new_firm_id = self.sim.employee_index.draw(u[2], vendor_ids)
+        if new_firm_id < 0: return
+        new_firm = self.sim.firm_list[new_firm_id]
 
         # replace old firm if the new one's price is lower
         # if the new firm was initially blacklisted then unlist it
-        new_firm = random.choices(pot_vendor_list, weight_list)[0]
-        if new_firm.item_price < old_firm.item_price * (1 - self.sim.hh_param.get("lower_vendor_price")):
+        if new_firm.item_price < old_firm.item_price * (1 - self.sim.hh_param.lower_vendor_price):
             if old_firm in self.blocked_vendors: self.blocked_vendors.remove(old_firm)
             if new_firm in self.blocked_vendors: self.blocked_vendors.remove(new_firm)
             self.vendor_list.remove(old_firm)
             self.vendor_list.append(new_firm)
 
     # household tries to replace a vendor when it had insufficient stock last month
-    def find_stocked_vendor(self):
+    # u holds three uniform random numbers in [0, 1), see Simulation.act_bom
+    def find_stocked_vendor(self, u: list):
         # abort method when no vendor had low stock or by chance
-        if not self.blocked_vendors or random.uniform(0, 1) > self.sim.hh_param.get("repl_vend_inv_prob"):
+        if not self.blocked_vendors or u[0] > self.sim.hh_param.repl_vend_inv_prob:
             return
         
         # randomly select a firm from those that weren't able to satisfy demands
         # probability should be proportional to the extent of the restriction in the original model
         # as a implemented simplification
         # probability is proportional to the least number of items in stock
+        # like random.choices the drawn vendor is the first whose cumulative weight exceeds u times the total
         weight_list = []
         max_items = max([v.num_items for v in self.blocked_vendors])
         for vendor in self.blocked_vendors:
             weight_list.append(abs(vendor.num_items - max_items))
-        lo_stock_firm = random.choices(self.blocked_vendors, weight_list)[0]
+        cum_weights = list(accumulate(weight_list))
+        if cum_weights[-1] == 0:        # all blocked vendors have equal stock, choose any
+            lo_stock_firm = self.blocked_vendors[int(u[1] * len(self.blocked_vendors))]
+        else:
+            lo_stock_firm = self.blocked_vendors[bisect(cum_weights, u[1] * cum_weights[-1], 0, len(cum_weights) - 1)]
 
         # randomly choose among vendors the hh doesn't buy from
-        new_firm = random.choice(self.get_non_vendor_firms())
+        new_firm = self.choose_non_vendor(u[2])
 
         # replace low stock vendor and reset the low stock vendors        
         self.vendor_list.remove(lo_stock_firm)
@@ -108,35 +117,54 @@ class Household(object):
     # unemployed hhs are eager to find a job
     # employed hhs are less eager to find a job
     # since employed hhs have a job their wage expectations may grow
-    def do_jobsearch(self):
+    # u holds uniform random numbers in [0, 1), see Simulation.act_bom
+    def do_jobsearch(self, u: list):
         if self.employer == None:
-            self.search_any_employer()
+            self.search_any_employer(u)
         else:
-            self.res_wage *= self.sim.hh_param.get("rw_change_employed")
-            self.search_better_employer()
+            self.res_wage *= self.sim.hh_param.rw_change_employed
+            self.search_better_employer(u)
 
     # unemployed hh searches for an employer paying at least the hh's reservation wage
-    def search_any_employer(self):
+    # u holds one uniform random number in [0, 1) for each firm asked
+    def search_any_employer(self, u: list):
+        if self.sim.hh_param.job_search == 'index': return self.draw_any_employer(u)
+
         # unemployed hh randomly approaches a number of firms
-        for attempt in range(0, self.sim.hh_param.get("unemployed_ask_num")):
-            pot_firm = random.choice(self.sim.firm_list)
+        for attempt in range(0, self.sim.hh_param.unemployed_ask_num):
+            pot_firm = self.sim.firm_list[int(u[attempt] * len(self.sim.firm_list))]
             if pot_firm.hiring_status == 1 and pot_firm.wage >= self.res_wage:
                 self.employer = pot_firm
                 pot_firm.hire(self)
                 return
         
         # hh lowers its reservation wage when no employer was found
-        if self.employer is None: self.res_wage *= self.sim.hh_param.get("rw_change_unemployed")
+        if self.employer is None: self.res_wage *= self.sim.hh_param.rw_change_unemployed
+
+    # unemployed hh draws an employer from the hiring index
+    # when asking random firms, the first firm that hires and pays enough is any of those firms with equal probability
+    # such a firm is found unless all asked firms fail, so this is drawn instead
+    def draw_any_employer(self, u: list):
+        index = self.sim.hiring_index
+        num_fit = index.count_from(self.res_wage)
+        p_found = 1 - (1 - num_fit / len(self.sim.firm_list)) ** self.sim.hh_param.unemployed_ask_num
+        if u[0] < p_found:
+            self.employer = self.sim.firm_list[index.get(int(u[1] * num_fit))]
+            self.employer.hire(self)
+        else:
+            self.res_wage *= self.sim.hh_param.rw_change_unemployed
 
     # hhs paid less than reservation wage search a better employer
     # hhs paid reservation wage also sometimes look for better pay
-    def search_better_employer(self):
+    # u holds three uniform random numbers in [0, 1), the first decides on searching by chance
+    def search_better_employer(self, u: list):
         only_employee = len(self.employer.list_employees) <= 1
         bad_pay = self.employer.wage < self.res_wage
-        chance = random.uniform(0, 1) < self.sim.hh_param.get("repl_employer_prob")
+        chance = u[0] < self.sim.hh_param.repl_employer_prob
 
         if self.is_employed() and not only_employee and bad_pay or chance:
-            pot_firm = random.choice(self.get_non_employer_firms())
+            if self.sim.hh_param.job_search == 'index': return self.draw_better_employer(u[1:])
+            pot_firm = self.get_non_employer_firms()[int(u[1] * (len(self.sim.firm_list) - 1))]
 
             pays_enough = pot_firm.wage > self.res_wage
             pays_better = pot_firm.wage > self.employer.wage
@@ -144,7 +172,18 @@ class Household(object):
                 self.employer.grant_leave(self)
                 pot_firm.hire(self)
                 self.employer = pot_firm
-        
+
+    # employed hh draws a better paying employer from the hiring index
+    # a random firm other than the employer hires and pays better with probability of the share of such firms
+    def draw_better_employer(self, u: list):
+        index = self.sim.hiring_index
+        num_fit = index.count_above(max(self.res_wage, self.employer.wage))
+        if u[0] < num_fit / (len(self.sim.firm_list) - 1):
+            pot_firm = self.sim.firm_list[index.get(int(u[1] * num_fit))]
+            self.employer.grant_leave(self)
+            pot_firm.hire(self)
+            self.employer = pot_firm
+
     # determine quantity of items a hh consumes each day of the beginning month
     def plan_demand(self):
         def get_mean_item_price() -> float:
@@ -162,17 +201,17 @@ class Household(object):
         # if no_decay_demand is < 1 then the power function returns a value larger than no_decay_demand
         #   in this case, money < monthly_demand * mean_price, this scenario is solved by taking monthly_demand = no_decay_demand
         #   so that money == no_decay_demand * mean_price
-        monthly_demand = min(pow(no_decay_demand, self.sim.hh_param.get("cost_decay")), no_decay_demand)
+        monthly_demand = min(pow(no_decay_demand, self.sim.hh_param.cost_decay), no_decay_demand)
         self.daily_demand = monthly_demand // self.sim.days_in_month
 
     # hhs buy items from their preferred vendors to satisfy their daily demand
-    def buy_items(self):
+    # u holds one uniform random number in [0, 1) for each vendor choosing which one to visit next
+    def buy_items(self, u: list):
         remaining_demand: int = self.daily_demand
         
         unvisited_vendors = self.vendor_list.copy()
-        for vendor_count in self.vendor_list:
-            vendor = random.choice(unvisited_vendors)
-            unvisited_vendors.remove(vendor)
+        for vendor_count in range(len(self.vendor_list)):
+            vendor = unvisited_vendors.pop(int(u[vendor_count] * len(unvisited_vendors)))
 
             item_ask: int = min(remaining_demand, self.money // vendor.item_price)    # when hh has more demand than money, don't overspend
             items_sold: int = vendor.sell_items(item_ask)
@@ -187,9 +226,16 @@ class Household(object):
                 self.blocked_vendors.append(vendor)
 
             # stop method if hh has no money, demand is satisfied or all vendors have been visited
-            demand_satisfied: bool = remaining_demand <= self.sim.hh_param.get("demand_sat") * self.daily_demand
+            demand_satisfied: bool = remaining_demand <= self.sim.hh_param.demand_sat * self.daily_demand
             if self.money <= 0 or demand_satisfied: return
 
+    # return whether buying items can still change the hh or its vendors this month
+    # a hh without demand is idle, as is a hh that has blacklisted all vendors and can't afford an item from any of them
+    def can_buy(self) -> bool:
+        if self.daily_demand <= 0: return False
+        if len(self.blocked_vendors) < len(self.vendor_list): return True
+        return any(self.money // vendor.item_price > 0 for vendor in self.vendor_list)
+
     # hhs get used to their wage and expect this as their new reservation wage
     def update_res_wage(self):
         if self.employer is not None and self.employer.wage > self.res_wage:
@@ -210,8 +256,23 @@ class Household(object):
     def reset_income(self):
         self.income = 0
 
+    # return the state of the hh for a checkpoint, its employer and vendors are stored by id, see Simulation.__setstate__
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['employer'] = self.employer.id if self.employer is not None else None
+        state['vendor_list'] = [vendor.id for vendor in self.vendor_list]
+        state['blocked_vendors'] = [vendor.id for vendor in self.blocked_vendors]
+        return state
+
+    # replace the stored ids of the employer and vendors by the firms after a checkpoint was loaded
+    def link(self, firm_list: list):
+        self.employer = firm_list[self.employer] if self.employer is not None else None
+        self.vendor_list = [firm_list[f_id] for f_id in self.vendor_list]
+        self.blocked_vendors = [firm_list[f_id] for f_id in self.blocked_vendors]
+
 ######## ######## ######## IMPORTS ######## ######## ########
 
-import random
+from bisect import bisect
+from itertools import accumulate
 from simulation import Simulation
 from firm import Firm
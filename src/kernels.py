@@ -0,0 +1,376 @@
+
+
+'''
+Compiled loops of the compiled engine, see Engine_compiled.
+
+The loops act on integer indexed agent arrays and repeat the order of operations of the Firm and Household classes.
+Random numbers are drawn in blocks by the engine and passed in, each agent uses its row of a block
+the same way as the Firm and Household classes, so that a run matches the object engine exactly for a given seed.
+When Numba isn't installed the loops remain plain Python functions.
+'''
+
+import numpy as np
+
+try:
+    from numba import njit
+    from numba.typed import List
+    COMPILED = True
+except ImportError:
+    COMPILED = False
+    List = list
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+######## ######## ######## RANDOM ######## ######## ########
+
+# index drawn with probability proportional to the first n weights given a uniform random number u in [0, 1)
+# like random.choices this is the first index whose cumulative weight exceeds u times the total, see Household.find_stocked_vendor
+# weights are accumulated in place
+@njit(cache=True)
+def choices(u, weights, n):
+    for i in range(1, n):
+        weights[i] += weights[i - 1]
+    x = u * weights[n - 1]
+    lo, hi = 0, n - 1                       # bisect.bisect(weights, x, 0, n-1)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if x < weights[mid]: hi = mid
+        else: lo = mid + 1
+    return lo
+
+######## ######## ######## LISTS ######## ######## ########
+
+# return index of value in the first n entries of array, -1 if missing
+@njit(cache=True)
+def find(array, n, value):
+    for i in range(n):
+        if array[i] == value: return i
+    return -1
+
+# list.remove(value) on the first n entries of array, return new length
+@njit(cache=True)
+def remove(array, n, value):
+    i = find(array, n, value)
+    if i < 0: return n
+    for j in range(i, n - 1):
+        array[j] = array[j + 1]
+    return n - 1
+
+# return the idx-th firm that is not among the first n vendors, see Household.choose_non_vendor
+@njit(cache=True)
+def skip_vendors(idx, vendors, n):
+    for vendor in np.sort(vendors[:n]):
+        if vendor <= idx: idx += 1
+    return idx
+
+######## ######## ######## FENWICK ######## ######## ########
+
+# return a Fenwick tree over integer weights, see Fenwick
+@njit(cache=True)
+def fenwick_build(weights):
+    tree = np.zeros(len(weights) + 1, dtype=np.int64)
+    tree[1:] = weights
+    for i in range(1, len(tree)):
+        parent = i + (i & -i)
+        if parent < len(tree): tree[parent] += tree[i]
+    return tree
+
+# add delta to the weight of item i
+@njit(cache=True)
+def fenwick_add(tree, i, delta):
+    i += 1
+    while i < len(tree):
+        tree[i] += delta
+        i += i & -i
+
+# return the sum of all weights
+@njit(cache=True)
+def fenwick_total(tree):
+    total, i = 0, len(tree) - 1
+    while i > 0:
+        total += tree[i]
+        i -= i & -i
+    return total
+
+# return the first item whose weight summed with the weights of all items before it, minus offset, exceeds x
+@njit(cache=True)
+def fenwick_search(tree, x, offset):
+    n = len(tree) - 1
+    pos, prefix = 0, -offset
+    step = 1
+    while step * 2 <= n: step *= 2
+    while step > 0:
+        if pos + step <= n and prefix + tree[pos + step] <= x:
+            pos += step
+            prefix += tree[pos]
+        step >>= 1
+    return pos
+
+# return an item drawn with probability proportional to its weight, the first n items of exclude are never drawn
+# u is uniform in [0, 1), -1 is returned when all items not excluded have zero weight, see Fenwick.draw
+@njit(cache=True)
+def fenwick_draw(u, tree, weights, exclude, n):
+    exclude = np.sort(exclude[:n])
+    offset = 0
+    for i in exclude: offset += weights[i]
+    total = fenwick_total(tree) - offset
+    if total <= 0: return -1
+
+    x = u * total
+    offset = 0
+    item = fenwick_search(tree, x, offset)
+    for i in exclude:
+        if i > item: break
+        offset += weights[i]
+        item = fenwick_search(tree, x, offset)
+
+    if item >= len(weights):
+        item = len(weights) - 1
+        while find(exclude, n, item) >= 0: item -= 1
+    return item
+
+######## ######## ######## EMPLOYEES ######## ######## ########
+
+# return the list of employees of each firm, employees are listed in order of their ids
+def init_employees(hh_employer, num_f):
+    by_firm = np.argsort(hh_employer, kind='stable')
+    ends = np.cumsum(np.bincount(hh_employer, minlength=num_f))
+    return List([by_firm[end - n:end].copy() for end, n in zip(ends, np.diff(ends, prepend=0))])
+
+# append hh to the employees of firm f and remember its position, see Firm.add_employee
+# arrays of employees double in size when full
+@njit(cache=True)
+def add_employee(f_employees, f_num_employees, f_employee_tree, hh_employee_pos, f, h):
+    n = f_num_employees[f]
+    if n == len(f_employees[f]):
+        grown = np.empty(max(2 * n, 4), dtype=np.int64)
+        grown[:n] = f_employees[f]
+        f_employees[f] = grown
+    f_employees[f][n] = h
+    hh_employee_pos[h] = n
+    f_num_employees[f] = n + 1
+    fenwick_add(f_employee_tree, f, 1)
+
+# remove hh from the employees of firm f by moving the last employee into its position, see Firm.remove_employee
+@njit(cache=True)
+def remove_employee(f_employees, f_num_employees, f_employee_tree, hh_employee_pos, f, h):
+    n = f_num_employees[f] - 1
+    last = f_employees[f][n]
+    f_employees[f][hh_employee_pos[h]] = last
+    hh_employee_pos[last] = hh_employee_pos[h]
+    f_num_employees[f] = n
+    fenwick_add(f_employee_tree, f, -1)
+
+######## ######## ######## HOUSEHOLDS ######## ######## ########
+
+# return whether buying items can still change hh h or its vendors this month, see Household.can_buy
+@njit(cache=True)
+def can_buy(h, hh_money, hh_daily_demand, hh_vendors, hh_num_blocked, f_item_price):
+    if hh_daily_demand[h] <= 0: return False
+    if hh_num_blocked[h] < hh_vendors.shape[1]: return True
+    for vendor in hh_vendors[h]:
+        if hh_money[h] // f_item_price[vendor] > 0: return True
+    return False
+
+# choose employer and vendors of each hh, see Simulation.init_households and Household.__init__
+# row h of u holds the uniform random numbers of hh h
+@njit(cache=True)
+def init_households(u, hh_employer, hh_vendors, num_f):
+    num_v = hh_vendors.shape[1]
+    for h in range(len(hh_employer)):
+        hh_employer[h] = h if h < num_f else int(u[h, 0] * num_f)
+        for v in range(num_v):
+            hh_vendors[h, v] = skip_vendors(int(u[h, 1 + v] * (num_f - v)), hh_vendors[h], v)
+
+# actions of households at the beginning of a month, see Simulation.act_bom
+# households act in the order given, the i-th hh uses row i of u
+# households that can buy items are written to active in order, return their number
+@njit(cache=True)
+def act_bom_hh(order, u, active, hh_money, hh_income, hh_res_wage, hh_daily_demand, hh_employer, hh_employee_pos,
+               hh_vendors, hh_blocked, hh_num_blocked, f_item_price, f_num_items, f_wage, f_hiring_status,
+               f_employees, f_num_employees, f_employee_tree, f_hired, hiring, hiring_wage, job_search_index,
+               repl_vend_price_prob, lower_vendor_price, repl_vend_inv_prob, unemployed_ask_num,
+               rw_change_employed, rw_change_unemployed, repl_employer_prob, cost_decay, days_in_month):
+    num_v = hh_vendors.shape[1]
+    num_f = len(f_wage)
+    weights = np.empty(num_v)
+
+    num_active = 0
+    for i in range(len(order)):
+        h = order[i]
+        hh_u = u[i]
+        vendors = hh_vendors[h]
+        blocked = hh_blocked[h]
+
+        # reset_income
+        hh_income[h] = 0
+
+        # find_cheaper_vendor
+        if not hh_u[0] > repl_vend_price_prob:
+            old_firm = vendors[int(hh_u[1] * num_v)]
+            new_firm = fenwick_draw(hh_u[2], f_employee_tree, f_num_employees, vendors, num_v)
+            if new_firm >= 0 and f_item_price[new_firm] < f_item_price[old_firm] * (1 - lower_vendor_price):
+                hh_num_blocked[h] = remove(blocked, hh_num_blocked[h], old_firm)
+                hh_num_blocked[h] = remove(blocked, hh_num_blocked[h], new_firm)
+                remove(vendors, num_v, old_firm)
+                vendors[num_v - 1] = new_firm
+
+        # find_stocked_vendor
+        num_blocked = hh_num_blocked[h]
+        if num_blocked > 0 and not hh_u[3] > repl_vend_inv_prob:
+            max_items = f_num_items[blocked[0]]
+            for j in range(1, num_blocked):
+                max_items = max(max_items, f_num_items[blocked[j]])
+            uniform = True
+            for j in range(num_blocked):
+                weights[j] = abs(f_num_items[blocked[j]] - max_items)
+                if weights[j] != 0: uniform = False
+            if uniform: lo_stock_firm = blocked[int(hh_u[4] * num_blocked)]
+            else: lo_stock_firm = blocked[choices(hh_u[4], weights, num_blocked)]
+            new_firm = skip_vendors(int(hh_u[5] * (num_f - num_v)), vendors, num_v)
+            remove(vendors, num_v, lo_stock_firm)
+            vendors[num_v - 1] = new_firm
+            hh_num_blocked[h] = 0
+
+        # do_jobsearch
+        employer = hh_employer[h]
+        if employer < 0 and job_search_index:
+            # draw_any_employer
+            num_fit = len(hiring) - np.searchsorted(hiring_wage, hh_res_wage[h])
+            p_found = 1 - (1 - num_fit / num_f) ** float(unemployed_ask_num)
+            if hh_u[6] < p_found:
+                pot_firm = hiring[len(hiring) - 1 - int(hh_u[7] * num_fit)]
+                hh_employer[h] = pot_firm
+                add_employee(f_employees, f_num_employees, f_employee_tree, hh_employee_pos, pot_firm, h)
+                f_hired[pot_firm] = True
+            else:
+                hh_res_wage[h] *= rw_change_unemployed
+        elif employer < 0:
+            # search_any_employer
+            for attempt in range(unemployed_ask_num):
+                pot_firm = int(hh_u[6 + attempt] * num_f)
+                if f_hiring_status[pot_firm] == 1 and f_wage[pot_firm] >= hh_res_wage[h]:
+                    hh_employer[h] = pot_firm
+                    add_employee(f_employees, f_num_employees, f_employee_tree, hh_employee_pos, pot_firm, h)
+                    f_hired[pot_firm] = True
+                    break
+            if hh_employer[h] < 0: hh_res_wage[h] *= rw_change_unemployed
+        else:
+            hh_res_wage[h] *= rw_change_employed
+            # search_better_employer
+            only_employee = f_num_employees[employer] <= 1
+            bad_pay = f_wage[employer] < hh_res_wage[h]
+            chance = hh_u[6] < repl_employer_prob
+            if (not only_employee and bad_pay or chance) and job_search_index:
+                # draw_better_employer
+                num_fit = len(hiring) - np.searchsorted(hiring_wage, max(hh_res_wage[h], f_wage[employer]), side='right')
+                if hh_u[7] < num_fit / (num_f - 1):
+                    pot_firm = hiring[len(hiring) - 1 - int(hh_u[8] * num_fit)]
+                    remove_employee(f_employees, f_num_employees, f_employee_tree, hh_employee_pos, employer, h)
+                    add_employee(f_employees, f_num_employees, f_employee_tree, hh_employee_pos, pot_firm, h)
+                    f_hired[pot_firm] = True
+                    hh_employer[h] = pot_firm
+            elif not only_employee and bad_pay or chance:
+                pot_firm = int(hh_u[7] * (num_f - 1))
+                if pot_firm >= employer: pot_firm += 1
+                pays_enough = f_wage[pot_firm] > hh_res_wage[h]
+                pays_better = f_wage[pot_firm] > f_wage[employer]
+                if f_hiring_status[pot_firm] == 1 and pays_enough and pays_better:
+                    remove_employee(f_employees, f_num_employees, f_employee_tree, hh_employee_pos, employer, h)
+                    add_employee(f_employees, f_num_employees, f_employee_tree, hh_employee_pos, pot_firm, h)
+                    f_hired[pot_firm] = True
+                    hh_employer[h] = pot_firm
+
+        # plan_demand
+        sum_price = 0.0
+        for v in range(num_v):
+            sum_price += f_item_price[vendors[v]]
+        no_decay_demand = hh_money[h] // (sum_price / num_v)
+        monthly_demand = min(no_decay_demand ** cost_decay, no_decay_demand)
+        hh_daily_demand[h] = monthly_demand // days_in_month
+
+        if can_buy(h, hh_money, hh_daily_demand, hh_vendors, hh_num_blocked, f_item_price):
+            active[num_active] = h
+            num_active += 1
+    return num_active
+
+# active households buy items from their vendors, see Simulation.act_day and Household.buy_items
+# households buy in the order of active, the i-th hh uses row i of u
+# households that turned idle are removed from active, return the number of households left
+@njit(cache=True)
+def act_day_hh(active, u, hh_money, hh_daily_demand, hh_vendors, hh_blocked, hh_num_blocked,
+               f_money, f_item_price, f_num_items, f_demand, demand_sat):
+    num_v = hh_vendors.shape[1]
+    unvisited = np.empty(num_v, dtype=np.int64)
+
+    for i in range(len(active)):
+        h = active[i]
+        remaining_demand = hh_daily_demand[h]
+        unvisited[:] = hh_vendors[h]
+        for num_unvisited in range(num_v, 0, -1):
+            vendor = unvisited[int(u[i, num_v - num_unvisited] * num_unvisited)]
+            remove(unvisited, num_unvisited, vendor)
+
+            # sell_items
+            item_ask = min(remaining_demand, hh_money[h] // f_item_price[vendor])
+            items_sold = min(item_ask, f_num_items[vendor])
+            f_num_items[vendor] -= items_sold
+            f_money[vendor] += items_sold * f_item_price[vendor]
+            f_demand[vendor] += item_ask
+
+            remaining_demand -= items_sold
+            hh_money[h] -= items_sold * f_item_price[vendor]
+
+            if remaining_demand > 0 and find(hh_blocked[h], hh_num_blocked[h], vendor) < 0:
+                hh_blocked[h, hh_num_blocked[h]] = vendor
+                hh_num_blocked[h] += 1
+
+            if hh_money[h] <= 0 or remaining_demand <= demand_sat * hh_daily_demand[h]: break
+
+    num_active = 0
+    for h in active:
+        if can_buy(h, hh_money, hh_daily_demand, hh_vendors, hh_num_blocked, f_item_price):
+            active[num_active] = h
+            num_active += 1
+    return num_active
+
+######## ######## ######## FIRMS ######## ######## ########
+
+# pay profit to all households in order of the household list, richer households receive higher profits
+@njit(cache=True)
+def distribute_profit(order, hh_money, hh_income, profit):
+    if profit <= 0: return
+    sum_hh_money = 0.0
+    for h in order:
+        if hh_money[h] > 0: sum_hh_money += hh_money[h]
+    for h in order:
+        share = profit * (hh_money[h] / sum_hh_money)
+        hh_money[h] += share
+        hh_income[h] += share
+
+# firms set their reserve and pay profits to households, see Simulation.pay_profits and Firm.set_reserve
+# with batch the profits of all firms are distributed at once, otherwise firms pay one after another
+@njit(cache=True)
+def pay_profits(order, hh_money, hh_income, f_money, f_reserve, f_wage, f_num_employees, buffer_rate, batch):
+    profit_sum = 0.0
+    for f in range(len(f_money)):
+        frac_monthly_wages = buffer_rate * (f_wage[f] * f_num_employees[f])
+        f_reserve[f] = max(0, min(frac_monthly_wages, f_money[f]))
+        profit = max(0, f_money[f] - f_wage[f] * f_num_employees[f] - f_reserve[f])
+        if batch: profit_sum += profit
+        else: distribute_profit(order, hh_money, hh_income, profit)
+        f_money[f] -= profit
+    if batch: distribute_profit(order, hh_money, hh_income, profit_sum)
+
+######## ######## ######## GOVERNMENT ######## ######## ########
+
+# households pay a portion of their income but not more than they have, return the sum of taxes
+@njit(cache=True)
+def collect_tax(order, hh_money, hh_income, tax_rate):
+    tax_sum = 0.0
+    for h in order:
+        tax = hh_income[h] * tax_rate
+        if hh_money[h] - tax < 0: tax = hh_money[h]
+        hh_money[h] -= tax
+        tax_sum += tax
+    return tax_sum
@@ -4,9 +4,13 @@
 
 from simulation import Simulation
 from stat_runs import Stat_runs
+from run_pool import Run_pool
+from stop_rule import Stop_rule
+from adaptive_runs import Adaptive_runs
+import math
 import sys
 import argparse
-import random
+import numpy as np
 from pathlib import Path
 
 ######## ######## ######## MAIN ######## ######## ########
@@ -24,22 +28,69 @@ def main():
     See the README for further details.
     '''
 
-    # random seed for reproducibility
-    random.seed(15532)
-
     # command line control of initial parameters
     parser = argparse.ArgumentParser(description='Set initial running parameters for the simulated economy.')
     parser.add_argument("--months", type=int, nargs='?', default=100, help="set the number of months simulated per run")
     parser.add_argument("--runs", type=int, nargs='?', default=1, help="set number of runs to simulate")
-    parser.add_argument("--gov", type=str, nargs='?', choices=['none', 'rep', 'dir'], default='none', help="select government implementation")
+    parser.add_argument("--gov", type=str, nargs='?', choices=['none', 'rep', 'dir', 'all'], default='none', help="select government implementation, all forks each run into every government after a burn-in")
     parser.add_argument("--f", type=int, nargs='?', default=100, help="number of firms used in a simulation")
     parser.add_argument("--hh", type=int, nargs='?', default=1000, help="number of households used in a simulation")
+    parser.add_argument("--engine", type=str, nargs='?', choices=['object', 'vector', 'compiled', 'replica'], default='object', help="select agent objects, arrays acting at once (vector), arrays in compiled loops (compiled) or the vector engine advancing all runs of a worker at once (replica) to simulate the economy")
+    parser.add_argument("--workers", type=int, nargs='?', default=1, help="number of processes simulating runs in parallel")
+    parser.add_argument("--burn-in", type=int, nargs='?', default=Simulation.g_param['tax_adj_freq'], help="number of months simulated once without government before forking with --gov all, at most tax_adj_freq")
+    parser.add_argument("--stop", action='store_true', help="end runs before --months once the economy is stationary")
+    parser.add_argument("--stop-window", type=int, nargs='?', default=24, help="number of months of the windows compared by --stop")
+    parser.add_argument("--stop-tol", type=float, nargs='?', default=0.01, help="largest relative change between windows considered stationary")
+    parser.add_argument("--length-policy", type=str, nargs='?', choices=['carry', 'truncate'], default='carry', help="continue stopped runs with their last month (carry) or cut all runs to the shortest run (truncate)")
+    parser.add_argument("--stream", action='store_true', help="aggregate runs into a running mean and variance per month instead of keeping every run, memory doesn't grow with runs")
+    parser.add_argument("--sample", type=int, nargs='?', default=100, help="number of runs whose distributions are kept for the histograms with --stream")
+    parser.add_argument("--paired", action='store_true', help="with --gov all every hh draws the same random numbers under each government, report paired differences between governments")
+    parser.add_argument("--sem", type=str, nargs='*', default=[], help="keep adding runs until the standard error over runs of measures in the last month is met, for example gini_i=0.002 employment=0.005")
+    parser.add_argument("--max-runs", type=int, nargs='?', default=1000, help="largest number of runs simulated with --sem")
+    parser.add_argument("--max-time", type=float, nargs='?', default=None, help="wall time in seconds after which no further runs are started with --sem")
+    parser.add_argument("--profile", action='store_true', help="write the wall time and calls of each phase per month to img/profile_<gov>_run_<run>.json")
+    parser.add_argument("--profile-memory", action='store_true', help="with --profile also trace the peak memory of each phase, slows runs down")
+    parser.add_argument("--store", type=str, nargs='?', default=None, help="directory the statistics of each run are appended to every month as binary arrays, read them with results_store.load_run")
+    parser.add_argument("--checkpoint", type=str, nargs='?', default=None, help="directory runs are written to every --checkpoint-freq months")
+    parser.add_argument("--checkpoint-freq", type=int, nargs='?', default=10, help="number of months between checkpoints")
+    parser.add_argument("--resume", type=str, nargs='?', default=None, help="directory of checkpoints to continue runs from, runs that finished are extended to --months")
     args = parser.parse_args()
     num_months = args.months
     runs = args.runs
     gov_type = args.gov
     num_f = args.f
     num_hh = args.hh
+    engine = args.engine
+    workers = args.workers
+    checkpoint_dir = args.resume or args.checkpoint     # resumed runs keep writing checkpoints to the directory they continue from
+    if gov_type == 'all' and checkpoint_dir:
+        parser.error("checkpoints are not written for --gov all")
+
+    # with precision targets --runs is the number of runs of the first round, see Adaptive_runs
+    targets = {measure: float(target) for measure, _, target in (text.partition('=') for text in args.sem)}
+    if targets and checkpoint_dir:
+        parser.error("checkpoints are not written with --sem")
+
+    # with --gov all each run is forked into one branch per government after the burn-in
+    # governments don't tax during the first tax_adj_freq months, so with the default burn-in each branch equals a run of its own
+    gov_types = ['none', 'rep', 'dir'] if gov_type == 'all' else [gov_type]
+    branches = [(branch_gov, {}) for branch_gov in gov_types] if gov_type == 'all' else None
+    if gov_type == 'all' and args.burn_in > Simulation.g_param['tax_adj_freq']:
+        parser.error(f"--burn-in can't exceed tax_adj_freq ({Simulation.g_param['tax_adj_freq']} months), "
+                     "branches would run longer without government than runs with their government from the start")
+
+    # paired runs share the random numbers of each hh under every government, see Simulation.hh_param['common_draws']
+    if args.paired and gov_type != 'all':
+        parser.error("--paired compares governments with --gov all")
+    if args.paired:
+        branches = [(branch_gov, {'hh_param': {'common_draws': True}}) for branch_gov in gov_types]
+
+    # streamed runs are continued with their last month, see Stat_runs
+    if args.stream and args.length_policy == 'truncate':
+        parser.error("--stream continues stopped runs with their last month, --length-policy truncate isn't available")
+
+    # runs end early once the Gini indices, employment and average price are stationary
+    stop_rule = Stop_rule(args.stop_window, args.stop_tol) if args.stop else None
 
     # print initial conditions and write them to file
     print_hashes = "######## ######## ########"
@@ -49,7 +100,13 @@ def main():
 {print_hashes:<30} {'RUNS:':>15} {runs:>10}
 {print_hashes:<30} {'GOVERNMENT:':>15} {gov_type:>10}
 {print_hashes:<30} {'FIRMS:':>15} {num_f:>10}
-{print_hashes:<30} {'HOUSEHOLDS:':>15} {num_hh:>10}"""
+{print_hashes:<30} {'HOUSEHOLDS:':>15} {num_hh:>10}
+{print_hashes:<30} {'ENGINE:':>15} {engine:>10}
+{print_hashes:<30} {'WORKERS:':>15} {workers:>10}"""
+    if branches:
+        initial_conditions += f"\n{print_hashes:<30} {'BURN-IN:':>15} {args.burn_in:>10}"
+    if stop_rule:
+        initial_conditions += f"\n{print_hashes:<30} {'STOP WINDOW:':>15} {args.stop_window:>10}\n{print_hashes:<30} {'STOP TOL:':>15} {args.stop_tol:>10}"
     print(initial_conditions)
     Path("./img").mkdir(parents=True, exist_ok=True)     # ensure /img/ directory exists for writing plots and initial conditions
     with open("img/fig_" + gov_type + "_initial_conditions.txt", "w") as f: 
@@ -57,26 +114,60 @@ def main():
 
     # parameters for plotting
     plot_param = {
-        'plot_per_run': False if runs > 1 else True,    # show and save plots for a single run only when doing one run in total
+        'plot_per_run': runs == 1 and not targets,      # show and save plots for a single run only when doing one run in total
         'save_pgf': False,                               # save plots as Progressive Graphics File for LaTeX
         'save_pdf': True,                               # save plots as Portable Document Format
         'save_png': False,                               # save plots as Portable Network Graphics at 300 DPI
-        'save_csv': False,                              # save data as csv file
+        'save_data': False,                             # save data to a results store under dat/, see results_store
         'title': True,                                 # save plots with a title
     }
 
+    # random seed for reproducibility
+    # each run draws from its own stream spawned from the seed, so a run's results don't depend on other runs
+    seeds = np.random.SeedSequence(15532).spawn(runs)
+
     # run the simulation for a set number of runs then exit the program
-    stat_runs = Stat_runs(num_months, runs, gov_type, num_f, num_hh, plot_param)  
-    for run in range(runs):
-        sim = Simulation(num_months, runs, gov_type, num_f, num_hh, plot_param)
-        print(f"\n{print_hashes:<30} {'RUN:':>15} {run:>10} {print_hashes:>50}\n")
-        sim.start_sim()
-        if runs > 1:
-            stat_runs.set_sim(sim)
-            stat_runs.add_run(sim.stat)
+    # runs are added as they finish, in parallel they may finish in any order
+    stat_runs = {}
+    for branch_gov in gov_types:
+        stat_runs[branch_gov] = Stat_runs(num_months, runs, branch_gov, num_f, num_hh, plot_param, args.length_policy,
+                                         'stream' if args.stream else 'stack', args.sample)
+        stat_runs[branch_gov].set_sim(Simulation(num_months, runs, branch_gov, num_f, num_hh, plot_param))     # settings of the runs for plotting
+    run_pool = Run_pool(num_months, runs, gov_type, num_f, num_hh, plot_param, engine, workers, checkpoint_dir, args.checkpoint_freq,
+                        args.resume is not None, branches, args.burn_in, stop_rule, "img" if args.profile else None, args.profile_memory,
+                        args.store)
+
+    def add_runs(run_ids: list, stats: list, seconds: float):
+        label = str(run_ids[0]) if len(run_ids) == 1 else f"{run_ids[0]}-{run_ids[-1]}"
+        print(f"{print_hashes:<30} {'FINISHED RUN:':>15} {label:>10} {f'{seconds:.1f}s':>10}")
+        for branch_gov, branch_stats in zip(gov_types, stats if branches else [stats]):
+            for run_id, stat in zip(run_ids, branch_stats):
+                if stat.stop_month is not None:
+                    print(f"{print_hashes:<30} {'STOPPED RUN:':>15} {run_id:>10} {f'month {stat.stop_month}':>10} {branch_gov:>10}")
+            if runs > 1 or targets:
+                stat_runs[branch_gov].add_runs(branch_stats, run_ids)
+
+    if targets:
+        adaptive_runs = Adaptive_runs(run_pool, list(stat_runs.values()), targets, runs, args.max_runs, args.max_time or math.inf)
+        adaptive_runs.simulate(add_runs)
+        runs = adaptive_runs.num_runs
+        for branch_stat_runs in stat_runs.values():
+            branch_stat_runs.num_runs = branch_stat_runs.sim.num_runs = runs
+    else:
+        for run_ids, stats, seconds in run_pool.simulate(seeds):
+            add_runs(run_ids, stats, seconds)
+
+    # difference of each government to the next one in the last month, with paired and unpaired standard error
+    if args.paired and runs > 1:
+        print(f"\n{print_hashes:<30} {'PAIRED':>22} {'difference':>12} {'paired sem':>12} {'unpaired sem':>12}\n")
+        for gov_a, gov_b in [('rep', 'none'), ('dir', 'none'), ('dir', 'rep')]:
+            for measure in ['gini_i', 'gini_m', 'employment']:
+                difference, paired_sem, unpaired_sem = stat_runs[gov_a].paired_difference(stat_runs[gov_b], measure)
+                print(f"{print_hashes:<30} {f'{measure} {gov_a}-{gov_b}':>22} {difference:>12.5f} {paired_sem:>12.5f} {unpaired_sem:>12.5f}")
     if runs > 1:
         print(f"\n{print_hashes:<30} {'CREATING PLOTS':>15}")
-        stat_runs.invoke_plots()
+        for branch_gov in gov_types:
+            stat_runs[branch_gov].invoke_plots()
     print(f"\n{print_hashes:<30} {'EXITING PROGRAM':>15} {print_hashes:>61}")
 
 if __name__ == "__main__":
@@ -0,0 +1,148 @@
+
+
+import numpy as np
+
+
+class Market(object):
+    '''
+    The market clears one day of item sales between all households and their vendors at once.
+
+    Rationing rule: each day households are ranked by a random priority and
+    each household visits its vendors in its own random order, as in Household.buy_items.
+    The caller draws both and passes households in order of priority.
+    A household can buy at most the stock a firm has left after all households of higher priority bought there.
+    This is the outcome of households buying one after another in order of priority,
+    which is what Simulation.act_day does after shuffling the list of households.
+
+    Purchases are found by fixed point iteration.
+    First each household buys as if it were alone, then the stock left for each household is recomputed
+    from the purchases of higher ranked households and all households buy again, until purchases no longer change.
+    A household's purchases only depend on households of higher priority, so the iteration ends
+    with the sequential outcome after at most as many passes as the longest chain of households competing for stock.
+    Only firms whose stock doesn't cover all asks take part in the ranking.
+    '''
+
+    def __init__(self, max_iter: int = 100):
+        self.max_iter = max_iter            # number of passes before purchases are rationed in order of priority
+        self.num_iter = 0                   # number of passes needed by the last market day
+
+    ######## ######## ######## METHODS ######## ######## ########
+
+    # households visit vendors in order of visit_price[:, 0], visit_price[:, 1], ... and buy up to the stock available to them
+    # return whether a vendor was visited, items asked, items sold and remaining demand per visit as well as money left
+    def visit_vendors(self, visit_price: np.ndarray, available: np.ndarray, daily_demand: np.ndarray, money: np.ndarray, demand_sat: float):
+        n, num_v = visit_price.shape
+        visited = np.zeros((n, num_v), dtype=bool)
+        item_ask = np.zeros((n, num_v))
+        items_sold = np.zeros((n, num_v))
+        remaining_demand = np.zeros((n, num_v))
+        demand = daily_demand.copy()
+        money = money.copy()
+
+        rows = np.arange(n)
+        for k in range(num_v):
+            price = visit_price[rows, k]
+
+            # when hh has more demand than money, don't overspend
+            ask = np.minimum(demand[rows], money[rows] // price)
+            sold = np.minimum(ask, available[rows, k])
+            demand[rows] -= sold
+            money[rows] -= sold * price
+            visited[rows, k] = True
+            item_ask[rows, k] = ask
+            items_sold[rows, k] = sold
+            remaining_demand[rows, k] = demand[rows]
+
+            # stop if hh has no money or demand is satisfied
+            demand_satisfied = demand[rows] <= demand_sat * daily_demand[rows]
+            rows = rows[(money[rows] > 0) & ~demand_satisfied]
+            if len(rows) == 0: break
+
+        return visited, item_ask, items_sold, remaining_demand, money
+
+    # return for the visits of the given firms the number of items bought at the same firm by households of higher priority
+    # by_firm lists visits grouped by firm and within firms in order of priority
+    # starts and counts hold the position of each firm's first visit in by_firm and its number of visits
+    def sold_before(self, items_sold: np.ndarray, firms: np.ndarray, by_firm: np.ndarray, starts: np.ndarray, counts: np.ndarray):
+        counts = counts[firms]
+        offsets = np.cumsum(counts) - counts
+        visits = by_firm[np.arange(counts.sum()) + np.repeat(starts[firms] - offsets, counts)]
+        sold = items_sold.ravel()[visits]
+        before = np.cumsum(sold) - sold
+        before -= np.repeat(before[offsets[counts > 0]], counts[counts > 0])
+        return visits, before
+
+    # clear the market of a single day for the households in rows, which are served in the order given
+    # each hh visits its vendors in order of its row of uniform random numbers visit_u
+    # hh arrays money and blocked as well as firm arrays num_items, money and demand are updated in place
+    # blocked marks a vendor after whose visit demand remained unsatisfied
+    def clear(self, rows: np.ndarray, visit_u: np.ndarray, hh_vendors: np.ndarray, hh_daily_demand: np.ndarray, hh_money: np.ndarray, hh_blocked: np.ndarray,
+              f_num_items: np.ndarray, f_item_price: np.ndarray, f_money: np.ndarray, f_demand: np.ndarray, demand_sat: float):
+        n, num_v = len(rows), hh_vendors.shape[1]
+        num_f = len(f_num_items)
+        if n == 0: return
+
+        daily_demand = hh_daily_demand[rows]
+        money = hh_money[rows]
+        order = visit_u.argsort(axis=1)
+        visit = np.take_along_axis(hh_vendors[rows], order, axis=1)
+        visit_price = f_item_price[visit]
+
+        # group visits by firm, a stable sort keeps households in order of priority
+        visit_key = visit.ravel().astype(np.uint16) if num_f <= 2**16 else visit.ravel()
+        by_firm = np.argsort(visit_key, kind='stable')
+        counts = np.bincount(visit.ravel(), minlength=num_f)
+        starts = np.cumsum(counts) - counts
+
+        # first each hh buys as if it were the only customer
+        # afterwards only households whose available stock changed buy again
+        visit_flat = visit.ravel()
+        stock = f_num_items[visit]
+        available = stock.copy()
+        visited = np.zeros((n, num_v), dtype=bool)
+        item_ask = np.zeros((n, num_v))
+        items_sold = np.zeros((n, num_v))
+        remaining_demand = np.zeros((n, num_v))
+        money_left = money.copy()
+        sum_ask = np.zeros(num_f)
+        scarce = np.zeros(num_f, dtype=bool)
+        changed = np.arange(n)
+        for num_iter in range(1, self.max_iter + 1):
+            self.num_iter = num_iter
+            old_ask = item_ask[changed]
+            visited[changed], item_ask[changed], items_sold[changed], remaining_demand[changed], money_left[changed] = self.visit_vendors(
+                visit_price[changed], available[changed], daily_demand[changed], money[changed], demand_sat)
+            changed_visit = visit[changed].ravel()
+            sum_ask += np.bincount(changed_visit, (item_ask[changed] - old_ask).ravel(), minlength=num_f)
+
+            # only firms which can't serve all asks ration their stock
+            # stock available at a firm changes when its customers bought differently or it turned scarce or not
+            now_scarce = sum_ask > f_num_items
+            touched = np.zeros(num_f, dtype=bool)
+            touched[changed_visit] = True
+            firms = np.flatnonzero(touched & now_scarce | (now_scarce != scarce))
+            scarce = now_scarce
+
+            visits, before = self.sold_before(items_sold, firms, by_firm, starts, counts)
+            firm_stock = stock.ravel()[visits]
+            new_available = np.where(scarce[visit_flat[visits]], np.maximum(firm_stock - before, 0), firm_stock)
+            diff = new_available != available.ravel()[visits]
+            available.ravel()[visits[diff]] = new_available[diff]
+            changed = np.zeros(n, dtype=bool)
+            changed[visits[diff] // num_v] = True
+            changed = np.flatnonzero(changed)
+            if len(changed) == 0: break
+        else:
+            # purchases didn't settle, so sell the stock in order of priority to never sell more items than available
+            items_sold = np.minimum(items_sold, available)
+            money_left = money - (items_sold * visit_price).sum(axis=1)
+
+        # settle purchases between firms and households
+        f_num_items -= np.bincount(visit_flat, items_sold.ravel(), minlength=num_f)
+        f_money += np.bincount(visit_flat, (items_sold * visit_price).ravel(), minlength=num_f)
+        f_demand += sum_ask
+        hh_money[rows] = money_left
+
+        # when there is need to buy from another firm then the firm is blacklisted as vendor
+        row, k = np.nonzero(visited & (remaining_demand > 0))
+        hh_blocked[rows[row], order[row, k]] = True
@@ -0,0 +1,67 @@
+
+
+import numpy as np
+
+
+class Order_stats(object):
+    '''
+    Order statistics hold the sorted values, sorting order and cumulative sums of household and firm measures for the current month.
+    Measures are named by their group and field, such as hh_income or f_wage, and each is sorted at most once per month.
+    The Gini index, tax voting, the parliament and the Lorenz curves of a month all read their order statistics here.
+    The cache is emptied when the month advances, and for hh_money when taxes and ubi change the money of households.
+    '''
+
+    def __init__(self, sim: object):
+        self.sim = sim                      # simulation whose measures are sorted
+        self.month = None                   # month the cached order statistics belong to
+        self.cache = {}                     # measure -> {'values', 'sorted', 'order', 'cumsum'}, filled when first asked for
+
+    ######## ######## ######## METHODS ######## ######## ########
+
+    # checkpoints don't store the cache, a resumed simulation sorts its measures again
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['month'] = None
+        state['cache'] = {}
+        return state
+
+    # forget the order statistics of a measure whose values changed, or of all measures
+    def invalidate(self, measure: str = None):
+        if measure is None: self.cache = {}
+        else: self.cache.pop(measure, None)
+
+    # return the cached entry of a measure, the measure is read from the simulation unless its values are given
+    # the values must be those of the current month, such as a snapshot taken for the statistics, see Stat_run.up_stat
+    def entry(self, measure: str, values: np.ndarray = None) -> dict:
+        if self.month != self.sim.current_month:
+            self.cache = {}
+            self.month = self.sim.current_month
+        if measure not in self.cache:
+            if values is None:
+                group, _, field = measure.partition('_')
+                values = self.sim.hh_values(field) if group == 'hh' else self.sim.f_values(field)
+            self.cache[measure] = {'values': np.asarray(values, dtype=float)}
+        return self.cache[measure]
+
+    # return the values of a measure in ascending order
+    def sorted(self, measure: str, values: np.ndarray = None) -> np.ndarray:
+        entry = self.entry(measure, values)
+        if 'sorted' not in entry: entry['sorted'] = np.sort(entry['values'])
+        return entry['sorted']
+
+    # return the indices sorting the values of a measure, agents with equal values keep their order
+    def argsort(self, measure: str, values: np.ndarray = None) -> np.ndarray:
+        entry = self.entry(measure, values)
+        if 'order' not in entry: entry['order'] = np.argsort(entry['values'], kind='stable')
+        return entry['order']
+
+    # return the cumulative sums of the sorted values of a measure starting with 0, the integral of its Lorenz curve
+    def cumsum(self, measure: str, values: np.ndarray = None) -> np.ndarray:
+        entry = self.entry(measure, values)
+        if 'cumsum' not in entry: entry['cumsum'] = np.concatenate([[0.0], np.cumsum(self.sorted(measure, values))])
+        return entry['cumsum']
+
+    # return the Lorenz curve of a measure as the share of agents and the share of the sum of the measure they hold
+    def lorenz(self, measure: str, values: np.ndarray = None) -> tuple:
+        integral = self.cumsum(measure, values)
+        return np.arange(len(integral)) / (len(integral) - 1), integral / integral[-1]
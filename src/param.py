@@ -0,0 +1,61 @@
+
+
+class Param(object):
+    '''
+    A frozen set of named parameters, such as the firm parameters of one simulation.
+    Each parameter is an attribute, param.tech_lvl, so hot loops avoid dict lookups.
+    Parameters can also be read like a dict, param['tech_lvl'] or param.get('tech_lvl').
+    Parameters can't be changed after creation, replace returns a changed copy instead.
+    Parameters compare and hash by their values, so they can key a dict or cache.
+    '''
+
+    def __init__(self, values: dict, **changes):
+        values = {**values, **changes}
+        object.__setattr__(self, 'names', tuple(values))       # parameter names in order of definition
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    ######## ######## ######## METHODS ######## ######## ########
+
+    def __setattr__(self, name: str, value: object):
+        raise AttributeError(f"parameter '{name}' can't be changed, use replace to create changed parameters")
+
+    def __delattr__(self, name: str):
+        raise AttributeError(f"parameter '{name}' can't be deleted")
+
+    def __getitem__(self, name: str) -> object:
+        if name not in self.names: raise KeyError(name)
+        return getattr(self, name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.names
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Param) and self.to_dict() == other.to_dict()
+
+    # equal parameters hash equally whatever their order, so parameters can key a dict or cache
+    def __hash__(self) -> int:
+        return hash(tuple(sorted(self.to_dict().items())))
+
+    def __repr__(self) -> str:
+        return f"Param({self.to_dict()})"
+
+    # return the value of a parameter or default when there is no such parameter
+    def get(self, name: str, default: object = None) -> object:
+        return getattr(self, name) if name in self.names else default
+
+    # return parameters and their values as a new dict
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.names}
+
+    # return a copy with the given parameters changed
+    def replace(self, **changes) -> 'Param':
+        unknown = [name for name in changes if name not in self.names]
+        if unknown: raise KeyError(f"unknown parameters {unknown}")
+        return Param(self.to_dict(), **changes)
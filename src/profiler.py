@@ -0,0 +1,77 @@
+
+
+import json
+import time
+import contextlib
+import tracemalloc
+from pathlib import Path
+
+
+class Profiler(object):
+    '''
+    The profiler records the wall time and number of calls of each phase of the event loop per month.
+    Phases started within another phase are recorded under their path, such as act_eom/gov_action,
+    so the time of a phase includes the time of the phases within it.
+    With memory the peak of memory traced by tracemalloc is recorded as well, tracing slows the simulation down considerably.
+    The report is written as json, see write.
+    '''
+
+    def __init__(self, memory: bool = False):
+        self.memory = memory                # record the peak memory of each phase
+        self.names = []                     # names of the phases currently running, outermost first
+        self.peaks = []                     # peak memory so far of the phases currently running
+        self.months = {}                    # month -> path -> [seconds, calls, peak bytes]
+        if memory and not tracemalloc.is_tracing(): tracemalloc.start()
+
+    ######## ######## ######## METHODS ######## ######## ########
+
+    # time the phase within the context and add it to the given month
+    # the peak memory of tracemalloc is reset for each phase, the peak before the reset is kept for the phases around it
+    @contextlib.contextmanager
+    def phase(self, name: str, month: int):
+        self.names.append(name)
+        path = '/'.join(self.names)
+        if self.memory:
+            if self.peaks: self.peaks[-1] = max(self.peaks[-1], tracemalloc.get_traced_memory()[1])
+            self.peaks.append(0)
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.names.pop()
+            record = self.months.setdefault(month, {}).setdefault(path, [0.0, 0, 0])
+            record[0] += seconds
+            record[1] += 1
+            if self.memory:
+                peak = max(self.peaks.pop(), tracemalloc.get_traced_memory()[1])
+                record[2] = max(record[2], peak)
+                if self.peaks: self.peaks[-1] = max(self.peaks[-1], peak)
+
+    # return the seconds, calls and peak memory of each phase over all months and per month
+    def report(self) -> dict:
+        def entry(record: list) -> dict:
+            values = {'seconds': record[0], 'calls': record[1]}
+            if self.memory: values['peak_bytes'] = record[2]
+            return values
+
+        total = {}
+        for phases in self.months.values():
+            for path, record in phases.items():
+                sum = total.setdefault(path, [0.0, 0, 0])
+                sum[0] += record[0]
+                sum[1] += record[1]
+                sum[2] = max(sum[2], record[2])
+        return {
+            'phases': {path: entry(record) for path, record in total.items()},
+            'months': [{'month': month, 'phases': {path: entry(record) for path, record in phases.items()}}
+                       for month, phases in sorted(self.months.items())],
+        }
+
+    # write the report to a json file together with the settings of the run
+    def write(self, path: str, **settings):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'settings': settings, 'memory': self.memory, **self.report()}, f, indent=1)
@@ -0,0 +1,126 @@
+
+
+from simulation import Simulation
+from engine_vector import Engine_vector
+from engine_replica import Engine_replica
+from checkpoint import save_checkpoint, copy_sim
+
+
+class Replicas(object):
+    '''
+    Replicas simulate a number of independent runs of the same configuration at once.
+    Each replica is a simulation with its own random generator, government and statistics.
+    The agents of all replicas are stacked in the arrays of a single vector engine,
+    so each phase of a month advances all replicas by the same array operations.
+    A replica's results equal those of its simulation run on its own with the vector engine.
+    '''
+
+    def __init__(self, num_months: int, num_runs: int, gov_type: str, num_f: int, num_hh: int, plot_param: dict, seeds: list,
+                 changes: dict = None):
+        self.num_months = num_months            # number of months simulated
+        self.plot_param = plot_param            # control plotting behavior
+
+        # each replica is given the engine of its part of the stacked engine
+        self.sims = [Simulation(num_months, num_runs, gov_type, num_f, num_hh, plot_param, 'object', seed, changes)
+                     for seed in seeds]
+        self.engine = Engine_vector(self.sims[0], self.sims)
+        for replica, sim in enumerate(self.sims):
+            sim.engine = Engine_replica(self.engine, replica)
+
+        self.checkpoint_path = None             # file all replicas are written to, see Simulation.checkpoint
+        self.checkpoint_freq = 0                # number of months between checkpoints, 0 writes no checkpoints
+        self.stop_rule = None                   # ends all replicas once each of them is stationary, see Stop_rule
+
+        self.print_hashes = '######## ######## ########'        # pretty command line printing
+
+    ######## ######## ######## METHODS ######## ######## ########
+
+    # return the stat_run object of each replica
+    def get_stats(self) -> list:
+        return [sim.stat for sim in self.sims]
+
+    # start the simulation of all replicas
+    def start_sim(self):
+        self.init_sim()
+        self.event_loop()
+
+    # initialize the agents of all replicas, their statistics and governments
+    def init_sim(self):
+        self.sims[0].print_sim_step("INITIALIZE AGENTS")
+        self.engine.init_agents()
+        for sim in self.sims:
+            sim.init_stat_run()
+            sim.init_government()
+        self.sims[0].print_sim_step("INVOKING EVENT LOOP")
+
+    # continue all replicas under another government with changed parameters, see Simulation.set_branch
+    def set_branch(self, gov_type: str, changes: dict = None):
+        for sim in self.sims:
+            sim.set_branch(gov_type, changes)
+
+    # return an independent copy of all replicas with the same state
+    def fork(self) -> 'Replicas':
+        return copy_sim(self)
+
+    # end all replicas after the current month, see Simulation.stop
+    def stop(self):
+        for sim in self.sims:
+            sim.stop()
+        self.num_months = self.sims[0].current_month
+
+    # continue all replicas for more months than they were started with
+    def extend(self, num_months: int):
+        self.num_months = num_months
+        for sim in self.sims:
+            sim.extend(num_months)
+
+    # write a checkpoint of all replicas, see Simulation.checkpoint
+    def checkpoint(self):
+        if not self.checkpoint_freq: return
+        month = self.sims[0].current_month
+        if month % self.checkpoint_freq == 0 or month == self.num_months:
+            save_checkpoint(self, self.checkpoint_path)
+
+    # return a context timing a phase of the current month, all replicas share the profiler of the first, see Simulation.profile
+    def profile(self, name: str):
+        return self.sims[0].profile(name)
+
+    # run the main event loop for all replicas, see Simulation.event_loop
+    # the stacked engine acts first, then each replica records its data and its government acts
+    def event_loop(self):
+        self.run_until(self.num_months)
+
+        if self.plot_param['plot_per_run']:
+            print(f"\n{self.print_hashes:<30} {'CREATING PLOTS':>15}")
+            with self.profile('plots'):
+                for sim in self.sims:
+                    sim.stat.invoke_plots()
+
+    # simulate months of all replicas until the given month is reached or the replicas are stopped
+    def run_until(self, month: int):
+        while self.sims[0].current_month < min(month, self.num_months):
+            print(f"{self.print_hashes:<30} {'MONTH:':>15} {self.sims[0].current_month:>10}")
+
+            with self.profile('act_bom'):
+                self.engine.act_bom()
+                for sim in self.sims:
+                    sim.act_bom()
+            for day in range(Simulation.days_in_month):
+                with self.profile('act_day'):
+                    self.engine.act_day()
+                    for sim in self.sims:
+                        sim.act_day()
+            with self.profile('act_eom'):
+                self.engine.act_eom()
+                for sim in self.sims:
+                    sim.act_eom()
+            with self.profile('up_stat'):
+                for sim in self.sims:
+                    sim.stat.up_stat()
+            for sim in self.sims:
+                sim.current_month += 1
+            if self.stop_rule and self.sims[0].current_month < self.num_months and all(self.stop_rule.is_stationary(sim.stat) for sim in self.sims):
+                self.stop()
+            for sim in self.sims:
+                sim.store_month()
+            self.checkpoint()
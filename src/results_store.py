@@ -0,0 +1,144 @@
+
+
+import os
+import json
+import datetime
+import functools
+import subprocess
+import numpy as np
+from pathlib import Path
+
+# statistics stored, each series is named by statistics, kind and measure, such as hh_stat.metric.gini_i
+stat_names = ['f_stat', 'hh_stat', 'g_stat']
+
+# type of the stored values, files hold the raw values without header so that months can be appended
+dtype = np.dtype('<f8')
+
+
+######## ######## ######## WRITING ######## ######## ########
+
+# return the git commit of the code or None when the code isn't in a git repository
+@functools.lru_cache(maxsize=None)
+def code_version() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=Path(__file__).parent, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# return the description of a run stored with its results: parameters, seed, government, engine and code version
+# a run forked into a branch after a burn-in without government records the burn-in and the changes of its branch, see simulate_branches
+# both are None for runs simulated with their government from the start
+def run_meta(sim: object, run_id: object = None, changes: dict = None, burn_in: int = None, branch_changes: dict = None) -> dict:
+    seed_seq = sim.rng.bit_generator.seed_seq
+    return {
+        'run': run_id,
+        'gov_type': sim.gov_type,
+        'num_months': sim.num_months,
+        'engine': type(sim.engine).__name__ if sim.engine else 'object',
+        'seed': {'entropy': seed_seq.entropy, 'spawn_key': list(seed_seq.spawn_key)},
+        'changes': changes or {},
+        'burn_in': burn_in,
+        'branch_changes': branch_changes,
+        'f_param': sim.f_param.to_dict(),
+        'hh_param': sim.hh_param.to_dict(),
+        'g_param': sim.g_param.to_dict(),
+        'code_version': code_version(),
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+
+# write a json file under a temporary name and then rename it, so a reader never finds it half written
+def write_json(path: Path, data: dict):
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp_path, path)
+
+# return each series of a statistician by name, empty series such as parties without representative government are left out
+# running aggregates of streamed runs are stored as their mean and standard error, see Statistician.save_rows
+def series_items(statistician: object) -> list:
+    items = []
+    for stat_name in stat_names:
+        for kind, measures in getattr(statistician, stat_name).items():
+            for measure, values in measures.items():
+                values = np.asarray(statistician.save_rows(values), dtype=dtype)
+                if values.size > 0: items.append((f"{stat_name}.{kind}.{measure}", values))
+    return items
+
+# write all series of a statistician at once to a store directory, each series to a binary file with its shape in meta.json
+def save_stats(path: str, statistician: object, meta: dict):
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    shapes = {}
+    for name, values in series_items(statistician):
+        values.tofile(path / f"{name}.f8")
+        shapes[name] = list(values.shape)
+    write_json(path / 'meta.json', {**meta, 'shapes': shapes})
+
+
+class Run_writer(object):
+    '''
+    The run writer appends the statistics of a run to a store directory each month, so a run that crashes loses no recorded month.
+    Each series is a file of raw little endian float64 values that grows by the values of each month,
+    a meta.json file describes the run, see run_meta, and the stored series are read with load_run.
+    The writer remembers how many values of each series it wrote, so after resuming from a checkpoint,
+    values written after the checkpoint are overwritten, and a writer given a new directory, such as a branch, writes each series in full.
+    '''
+
+    def __init__(self, path: str, meta: dict):
+        self.path = Path(path)                  # directory of the run
+        self.written = {}                       # name -> number of values of the series written so far
+        self.path.mkdir(parents=True, exist_ok=True)
+        write_json(self.path / 'meta.json', meta)
+
+    ######## ######## ######## METHODS ######## ######## ########
+
+    # append the values of each series recorded since the last write
+    # a series emptied since, such as the distributions of a run extended beyond its months, is removed until it is recorded again
+    def write(self, stat: object):
+        items = series_items(stat)
+        for name in self.written.keys() - {name for name, _ in items}:
+            (self.path / f"{name}.f8").unlink(missing_ok=True)
+            del self.written[name]
+        for name, values in items:
+            values = values.ravel()
+            file_path = self.path / f"{name}.f8"
+            with open(file_path, 'r+b' if file_path.exists() else 'wb') as f:
+                start = min(self.written.get(name, 0), len(values), f.seek(0, os.SEEK_END) // dtype.itemsize)
+                f.seek(start * dtype.itemsize)
+                f.write(values[start:].tobytes())
+                f.truncate()
+            self.written[name] = len(values)
+
+######## ######## ######## READING ######## ######## ########
+
+# return the meta data of a stored run or of saved statistics
+def load_meta(path: str) -> dict:
+    with open(Path(path) / 'meta.json') as f:
+        return json.load(f)
+
+# return a series of a stored run as a read only array mapped from its file, values are read from disk only when accessed
+# series of saved statistics have the shape given in meta.json, series appended each month are flat
+def load_series(path: str, name: str, shape: tuple = None) -> np.ndarray:
+    file_path = Path(path) / f"{name}.f8"
+    if file_path.stat().st_size == 0: return np.empty(0 if shape is None else shape, dtype=dtype)
+    return np.memmap(file_path, dtype=dtype, mode='r', shape=None if shape is None else tuple(shape))
+
+# return the meta data and a dict of all mapped series of a stored run or of saved statistics
+def load_run(path: str) -> tuple:
+    meta = load_meta(path)
+    shapes = meta.get('shapes', {})
+    names = sorted(file_path.stem for file_path in Path(path).glob('*.f8'))
+    return meta, {name: load_series(path, name, shapes.get(name)) for name in names}
+
+# return the directories of the runs in a store, each holding a meta.json, in order of their path
+def list_runs(path: str) -> list:
+    return sorted(meta_path.parent for meta_path in Path(path).rglob('meta.json'))
+
+# return a series of all runs in a store as a (run, value) matrix, mapping one file per run at a time
+# runs of unequal length, such as runs ended by a stop rule, are cut to the shortest run
+def load_measure(path: str, name: str) -> np.ndarray:
+    series = [load_series(run_path, name) for run_path in list_runs(path) if (run_path / f"{name}.f8").exists()]
+    if not series: return np.empty((0, 0), dtype=dtype)
+    length = min(len(values) for values in series)
+    return np.stack([values[:length] for values in series])
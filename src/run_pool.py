@@ -0,0 +1,234 @@
+
+
+import os
+import time
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from simulation import Simulation
+from replicas import Replicas
+from checkpoint import load_checkpoint
+from profiler import Profiler
+from results_store import Run_writer, run_meta
+from pathlib import Path
+
+
+# simulate the given runs and return their indices, their statistics and the wall time in seconds
+# with the replica engine all runs are simulated at once as replicas, otherwise there is a single run
+# quiet runs don't print their progress, changes to the default parameters are given per parameter group, see Simulation
+# with a checkpoint directory the runs are written to a checkpoint file every checkpoint_freq months
+# resumed runs continue from their checkpoint file when there is one, runs that finished are extended to num_months
+# with a profile directory the wall time of each phase is written to a json file per batch of runs, see Profiler
+# with a store directory the statistics of each run are appended to <store_dir>/<gov_type>/run_<run> each month, see Run_writer
+def simulate_runs(runs: list, seeds: list, num_months: int, num_runs: int, gov_type: str, num_f: int, num_hh: int, plot_param: dict,
+                  engine: str, quiet: bool = False, changes: dict = None, checkpoint_dir: str = None, checkpoint_freq: int = 0,
+                  resume: bool = False, stop_rule: object = None, profile_dir: str = None, profile_memory: bool = False,
+                  store_dir: str = None) -> tuple:
+    start = time.perf_counter()
+    label = str(runs[0]) if len(runs) == 1 else f"{runs[0]}-{runs[-1]}"
+    checkpoint_path = Path(checkpoint_dir) / f"run_{label}.ckpt" if checkpoint_dir else None
+    if resume and checkpoint_path.exists():
+        sim = resume_runs(checkpoint_path, num_months, gov_type, num_f, num_hh, plot_param)
+        run_sim = sim.event_loop
+    else:
+        sim = new_runs(seeds, num_months, num_runs, gov_type, num_f, num_hh, plot_param, engine, changes)
+        run_sim = sim.start_sim
+    if checkpoint_path:
+        sim.checkpoint_path = checkpoint_path
+        sim.checkpoint_freq = max(1, checkpoint_freq)
+    sim.stop_rule = stop_rule
+    if store_dir: set_store(sim, store_dir, gov_type, runs, changes)    # a resumed store rewrites the months after its checkpoint
+    set_profiler(sim, Profiler(profile_memory) if profile_dir else None)     # a resumed profile starts with the resumed month
+    with silenced(quiet):
+        print(f"\n{sim.print_hashes:<30} {'RUN:':>15} {label:>10} {sim.print_hashes:>50}\n")
+        run_sim()
+    seconds = time.perf_counter() - start
+    if profile_dir: write_profile(sim, profile_dir, gov_type, label, engine, seconds)
+    return runs, detach(sim.get_stats()), seconds
+
+# simulate the given runs without government until the burn-in month, then fork them into one branch per (gov_type, changes)
+# each branch continues on its own copy of the economy until num_months, so the burn-in is simulated once for all branches
+# return the indices of the runs, a list of statistics for each branch and the wall time in seconds
+# governments don't tax before tax_adj_freq months, so branches forked until then equal runs with their government from the start
+# each branch copies the profile of the burn-in, so the profile of a branch covers all of its months
+# each branch stores all of its months including the burn-in under its government in the store directory
+def simulate_branches(runs: list, seeds: list, num_months: int, num_runs: int, branches: list, num_f: int, num_hh: int, plot_param: dict,
+                      engine: str, burn_in: int, quiet: bool = False, changes: dict = None, stop_rule: object = None,
+                      profile_dir: str = None, profile_memory: bool = False, store_dir: str = None) -> tuple:
+    start = time.perf_counter()
+    label = str(runs[0]) if len(runs) == 1 else f"{runs[0]}-{runs[-1]}"
+    sim = new_runs(seeds, num_months, num_runs, 'none', num_f, num_hh, plot_param, engine, changes)
+    if profile_dir: set_profiler(sim, Profiler(profile_memory))
+    branch_stats = []
+    with silenced(quiet):
+        print(f"\n{sim.print_hashes:<30} {'BURN-IN:':>15} {label:>10} {sim.print_hashes:>50}\n")
+        sim.init_sim()
+        sim.run_until(min(burn_in, num_months))
+        sim.stop_rule = stop_rule                                       # branches are stopped on their own after the burn-in
+        for i, (gov_type, branch_changes) in enumerate(branches):
+            branch = sim if i == len(branches) - 1 else sim.fork()      # the last branch continues the burn-in itself
+            branch.set_branch(gov_type, branch_changes)
+            if store_dir: set_store(branch, store_dir, gov_type, runs, changes, min(burn_in, num_months), branch_changes)
+            print(f"\n{sim.print_hashes:<30} {'BRANCH:':>15} {gov_type:>10} {sim.print_hashes:>50}\n")
+            branch.event_loop()
+            if profile_dir: write_profile(branch, profile_dir, gov_type, label, engine, time.perf_counter() - start)
+            branch_stats.append(detach(branch.get_stats()))
+    return runs, branch_stats, time.perf_counter() - start
+
+# return a simulation of a single run or, with the replica engine, replicas of all runs
+def new_runs(seeds: list, num_months: int, num_runs: int, gov_type: str, num_f: int, num_hh: int, plot_param: dict, engine: str,
+             changes: dict = None) -> object:
+    if engine == 'replica':
+        return Replicas(num_months, num_runs, gov_type, num_f, num_hh, plot_param, seeds, changes)
+    return Simulation(num_months, num_runs, gov_type, num_f, num_hh, plot_param, engine, seeds[0], changes)
+
+# record the phases of a simulation, or of all replicas in a single profile, with the profiler, None records nothing
+def set_profiler(sim: object, profiler: Profiler):
+    for replica in getattr(sim, 'sims', [sim]):
+        replica.profiler = profiler
+
+# append the statistics of a simulation, or of each replica, to the directory of its run in the store directory, see Run_writer
+# branches give their burn-in and changes, which are stored with the run, see run_meta
+def set_store(sim: object, store_dir: str, gov_type: str, runs: list, changes: dict = None, burn_in: int = None,
+              branch_changes: dict = None):
+    for run, replica in zip(runs, getattr(sim, 'sims', [sim])):
+        meta = run_meta(replica, run, changes, burn_in, branch_changes)
+        replica.store = Run_writer(Path(store_dir) / gov_type / f"run_{run}", meta)
+
+# write the profile of a simulation, or replicas, to profile_<gov_type>_run_<label>.json in the profile directory
+def write_profile(sim: object, profile_dir: str, gov_type: str, label: str, engine: str, seconds: float):
+    first = getattr(sim, 'sims', [sim])[0]
+    first.profiler.write(Path(profile_dir) / f"profile_{gov_type}_run_{label}.json", gov_type=gov_type, runs=label, engine=engine,
+                         num_f=first.f_param.num_firms, num_hh=first.hh_param.num_hh, num_months=first.current_month, seconds=seconds)
+
+# detach statistics from their simulations so that only the data is sent back from a worker process
+def detach(stats: list) -> list:
+    for stat in stats:
+        stat.set_sim(None)
+    return stats
+
+# print nothing within the context when quiet
+@contextlib.contextmanager
+def silenced(quiet: bool):
+    if not quiet:
+        yield
+        return
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+# return the runs of each checkpoint file in the checkpoint directory, run_<run>.ckpt holds a run and run_<first>-<last>.ckpt a batch
+# checkpoint files of runs that aren't simulated or of overlapping batches can't be resumed
+def checkpoint_batches(checkpoint_dir: str, runs: list) -> list:
+    batches = {}
+    for checkpoint_path in sorted(Path(checkpoint_dir).glob('run_*.ckpt')):
+        first, _, last = checkpoint_path.stem[len('run_'):].partition('-')
+        batches[checkpoint_path.name] = list(range(int(first), int(last or first) + 1))
+    for name, batch in batches.items():
+        if not set(batch) <= set(runs):
+            raise ValueError(f"checkpoint {Path(checkpoint_dir) / name} holds runs {batch[0]}-{batch[-1]}, not all of which are simulated")
+    resumed_runs = [run for batch in batches.values() for run in batch]
+    if len(resumed_runs) != len(set(resumed_runs)):
+        raise ValueError(f"checkpoints {', '.join(batches)} in {checkpoint_dir} hold overlapping runs, remove the stale files")
+    return sorted(batches.values())
+
+# return a simulation, or replicas, loaded from a checkpoint to continue until num_months
+# the checkpoint must have been written by runs of the same configuration
+def resume_runs(checkpoint_path: Path, num_months: int, gov_type: str, num_f: int, num_hh: int, plot_param: dict) -> object:
+    sim = load_checkpoint(checkpoint_path)
+    first = sim.sims[0] if isinstance(sim, Replicas) else sim
+    found = (first.gov_type, first.f_param.num_firms, first.hh_param.num_hh)
+    if found != (gov_type, num_f, num_hh):
+        raise ValueError(f"checkpoint {checkpoint_path} has government, firms and households {found}, not {(gov_type, num_f, num_hh)}")
+    if num_months < first.current_month:
+        raise ValueError(f"checkpoint {checkpoint_path} is past month {num_months}")
+    if num_months != sim.num_months:
+        sim.extend(num_months)
+    sim.plot_param = plot_param
+    for replica in getattr(sim, 'sims', [sim]):
+        replica.plot_param = plot_param
+        replica.stat.plot_param = plot_param
+    return sim
+
+
+class Run_pool(object):
+    '''
+    The run pool simulates independent runs of the same configuration, in worker processes when there is more than one worker.
+    Each run draws from the seed given for its index,
+    so the results of a run don't depend on the number of workers or the order in which runs finish.
+    Runs are passed on as soon as they finish together with their index and wall time.
+    Worker processes don't print the progress of their runs.
+    With the replica engine the runs are split into one batch per worker and each batch is simulated at once, see Replicas.
+    With a checkpoint directory each batch is written to its own checkpoint file, resumed batches continue from their file.
+    Resumed runs are batched as in their checkpoint files, so runs can be resumed with any number of workers.
+    With branches each batch is simulated once until the burn-in month and then forked into the branches, see simulate_branches.
+    With a profile directory each batch writes the wall time of the phases of its months to a json file, see Profiler.
+    With a store directory each run appends its statistics to a results store every month, see Run_writer.
+    '''
+
+    def __init__(self, num_months: int, num_runs: int, gov_type: str, num_f: int, num_hh: int, plot_param: dict, engine: str = 'object',
+                 workers: int = 1, checkpoint_dir: str = None, checkpoint_freq: int = 0, resume: bool = False, branches: list = None,
+                 burn_in: int = 0, stop_rule: object = None, profile_dir: str = None, profile_memory: bool = False,
+                 store_dir: str = None):
+        self.num_months = num_months            # number of months simulated per run
+        self.num_runs = num_runs                # number of runs simulated
+        self.gov_type = gov_type                # type of government
+        self.num_f = num_f                      # number of firms per run
+        self.num_hh = num_hh                    # number of households per run
+        self.plot_param = plot_param            # control plotting behavior
+        self.engine = engine                    # engine simulating the agents
+        self.workers = max(1, workers)          # number of worker processes, 1 simulates runs one after another in this process
+        self.checkpoint_dir = checkpoint_dir    # directory of the checkpoint files, None writes no checkpoints
+        self.checkpoint_freq = checkpoint_freq  # number of months between checkpoints
+        self.resume = resume                    # continue runs from their checkpoint files
+        self.branches = branches                # (gov_type, changes) of each branch forked after the burn-in, None simulates gov_type
+        self.burn_in = burn_in                  # number of months simulated without government before forking into the branches
+        self.stop_rule = stop_rule              # ends runs early once the economy is stationary, None simulates all months
+        self.profile_dir = profile_dir          # directory of the profiles of the batches, None profiles nothing
+        self.profile_memory = profile_memory    # profile the peak memory of each phase as well
+        self.store_dir = store_dir              # directory the statistics of each run are appended to, None stores nothing
+
+    ######## ######## ######## METHODS ######## ######## ########
+
+    # return the function simulating a batch of runs and its arguments
+    def run_args(self, runs: list, seeds: list) -> tuple:
+        if self.branches:
+            return (simulate_branches, runs, seeds, self.num_months, self.num_runs, self.branches, self.num_f, self.num_hh,
+                    self.plot_param, self.engine, self.burn_in)
+        return (simulate_runs, runs, seeds, self.num_months, self.num_runs, self.gov_type, self.num_f, self.num_hh, self.plot_param,
+                self.engine)
+
+    # return the keyword arguments of the function simulating a batch of runs
+    def run_kwargs(self) -> dict:
+        common = {'stop_rule': self.stop_rule, 'profile_dir': self.profile_dir, 'profile_memory': self.profile_memory,
+                  'store_dir': self.store_dir}
+        if self.branches: return common
+        return {'checkpoint_dir': self.checkpoint_dir, 'checkpoint_freq': self.checkpoint_freq, 'resume': self.resume, **common}
+
+    # return the indices of the runs of each batch, runs are numbered from first_run on
+    # resumed runs keep the batches of their checkpoint files whatever the number of workers, see checkpoint_batches
+    # runs without a checkpoint file are batched anew
+    def batches(self, num_runs: int, first_run: int = 0) -> list:
+        runs = list(range(first_run, first_run + num_runs))
+        resumed = checkpoint_batches(self.checkpoint_dir, runs) if self.resume else []
+        resumed_runs = {run for batch in resumed for run in batch}
+        runs = [run for run in runs if run not in resumed_runs]
+        if self.engine != 'replica': return resumed + [[run] for run in runs]
+        num_batches = min(self.workers, len(runs))
+        return resumed + [runs[b * len(runs) // num_batches:(b + 1) * len(runs) // num_batches] for b in range(num_batches)]
+
+    # simulate one run for each seed, yield the indices, statistics and wall time of each batch of runs once it finishes
+    # the runs of the seeds are numbered from first_run on, so further runs can be added to runs simulated before, see Adaptive_runs
+    # with branches the statistics of a batch are a list of statistics per branch
+    # with a single worker batches finish in order of their indices, otherwise in any order
+    def simulate(self, seeds: list, first_run: int = 0):
+        batches = self.batches(len(seeds), first_run)
+        if self.workers == 1:
+            for runs in batches:
+                function, *args = self.run_args(runs, [seeds[run - first_run] for run in runs])
+                yield function(*args, **self.run_kwargs())
+            return
+
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(batches))) as pool:
+            futures = [pool.submit(*self.run_args(runs, [seeds[run - first_run] for run in runs]), quiet=True, **self.run_kwargs())
+                       for runs in batches]
+            for future in as_completed(futures):
+                yield future.result()
@@ -0,0 +1,57 @@
+
+
+import numpy as np
+
+
+# return the random key of a run by which runs are sampled, the key depends on the index of the run only
+def run_key(run_id: int, seed: int = 0) -> float:
+    return np.random.default_rng([seed, run_id]).random()
+
+# return the positions of the sample_size smallest keys among the keys of a sample followed by new keys, in order of their keys
+# keeping the smallest keys samples runs uniformly and gives the same sample whatever the order in which runs are added
+def sample_keep(keys: np.ndarray, new_keys: list, sample_size: int) -> np.ndarray:
+    return np.argsort(np.concatenate((keys, new_keys)), kind='stable')[:sample_size]
+
+
+class Running(object):
+    '''
+    A running aggregate of rows of equal length added one at a time, such as the values of a measure per month of each run.
+    The mean and variance of each column are updated with Welford's algorithm, so the rows themselves aren't kept.
+    A sample of sample_size rows is kept for quantiles, runs are sampled by a key drawn from their index, see sample_keep.
+    '''
+
+    def __init__(self, length: int, sample_size: int = 0, seed: int = 0):
+        self.num_rows = 0                           # number of rows added
+        self.mean = np.zeros(length)                # mean of each column
+        self.m2 = np.zeros(length)                  # sum of squared differences from the mean of each column
+        self.sample_size = sample_size              # number of rows sampled
+        self.seed = seed                            # seed of the keys of the runs
+        self.sample_keys = np.empty(0)              # keys of the sampled rows
+        self.sample = np.empty((0, length))         # sampled rows in order of their keys
+
+    ######## ######## ######## METHODS ######## ######## ########
+
+    # add the row of a run
+    def add(self, row: np.ndarray, run_id: int):
+        self.num_rows += 1
+        delta = row - self.mean
+        self.mean += delta / self.num_rows
+        self.m2 += delta * (row - self.mean)
+        if self.sample_size:
+            key = run_key(run_id, self.seed)
+            keep = sample_keep(self.sample_keys, [key], self.sample_size)
+            self.sample_keys = np.append(self.sample_keys, key)[keep]
+            self.sample = np.concatenate((self.sample, [row]))[keep]
+
+    # return the sample variance of each column
+    def var(self) -> np.ndarray:
+        if self.num_rows < 2: return np.full(len(self.mean), np.nan)
+        return self.m2 / (self.num_rows - 1)
+
+    # return the standard error of the mean of each column, equal to scipy.stats.sem of the rows
+    def sem(self) -> np.ndarray:
+        return np.sqrt(self.var() / self.num_rows)
+
+    # return the q-th quantile of each column estimated from the sampled rows
+    def quantile(self, q: float) -> np.ndarray:
+        return np.quantile(self.sample, q, axis=0)
@@ -11,6 +11,7 @@ class Simulation(object):
 
     days_in_month = 21                  # number of working days in a month
 
+    # default parameters, each simulation holds a frozen copy with its own number of firms and households, see Param
     # TODO: Initialize all parameters with randomness.
     f_param = {
         'num_firms': None,              # total number of firms
@@ -26,6 +27,7 @@ class Simulation(object):
         'buffer_rate': 0.1,             # chi: rate at which a firm builds a money buffer
 
         'lo_wage_months': 1,            # duration (months) of full employment after which wages are decreased
+        'batch_profits': True,          # True: profits of all firms are paid at once, False: firms pay one after another
 
         'init_money': 0,                # firm's starting balance
         'init_reserve': 0,              # firm's starting savings
@@ -45,6 +47,9 @@ class Simulation(object):
         'lo_res_wage_unemployed': 0.1,      # hh's reservation wage decrease rate during month of unemployment
                                             # reservation wage is the minimum wage a hh is willing to work for
         'demand_sat': 0.05,                 # hh is satisfied with buying a little less percent of items it planned to buy
+        'job_search': 'index',              # 'index': draw employers from hiring firms, 'random': ask random firms one after another
+        'common_draws': False,              # True: each day every hh draws random numbers whether it buys or not, so that runs
+                                            # of the same seed under different governments share their random numbers per hh
 
         'init_money': 100,                  # hh's starting balance
         'num_vendors': 7,                   # number of firms a hh buys from
@@ -62,21 +67,51 @@ class Simulation(object):
 
     ######## ######## ######## CONSTRUCTOR ######## ######## ########
 
-    def __init__(self, num_months: int, num_runs: int, gov_type: str, num_f: int, num_hh: int, plot_param: dict):
+    def __init__(self, num_months: int, num_runs: int, gov_type: str, num_f: int, num_hh: int, plot_param: dict, engine: str = 'object',
+                 seed: object = None, changes: dict = None):
         self.num_runs = num_runs            # the number of runs simulated
         self.num_months = num_months        # number of months simulated
         self.current_month = 0              # currently simulated month by number
         self.gov_type = gov_type            # the type of government used
 
-        self.f_param['num_firms'] = num_f   # number of firms simulated
-        self.hh_param['num_hh'] = num_hh    # number of households simulated
+        # changes to the default parameters per group, for example {'g_param': {'tax_gamma': 2}}, see Sweep
+        changes = changes or {}
+        self.f_param = Param(Simulation.f_param, num_firms=num_f).replace(**changes.get('f_param', {}))     # firm parameters
+        self.hh_param = Param(Simulation.hh_param, num_hh=num_hh).replace(**changes.get('hh_param', {}))   # hh parameters
+        self.g_param = Param(Simulation.g_param).replace(**changes.get('g_param', {}))                      # government parameters
+
+        # each simulation draws from its own generator, seed is an int or a SeedSequence spawned for this run
+        # random numbers are drawn in blocks at the start of each phase, each agent uses its own row of a block
+        self.rng = np.random.default_rng(seed)
 
         self.firm_list = []                 # list of all firms in the model
         self.hh_list = []                   # list of all hh in the model
+        self.employee_index = None          # firms weighted by their number of employees for drawing vendors
+        self.hiring_index = Hiring_index()  # hiring firms in order of their wage for drawing employers
+        self.active_hh = []                 # hhs that can still buy items this month
+        self.active_per_day = []            # number of active hhs each day of the current month
 
         self.stat = None                    # tracking, plotting and analyzing data
+        self.order_stats = Order_stats(self)    # sorted household and firm measures of the current month
         self.gov = None                     # government responsible for tax and ubi
 
+        # 'object': each agent is a Firm or Household object
+        # 'vector': agents are stored in arrays and act all at once
+        # 'compiled': agents are stored in arrays and act one after another in compiled loops
+        # 'replica': the vector engine advancing a number of simulations at once, see Replicas, a single simulation uses the vector engine
+        if engine == 'compiled' and not kernels.COMPILED:
+            print("Numba is not installed, using the object engine instead of the compiled engine")
+            engine = 'object'
+        self.engine = None
+        if engine in ['vector', 'replica']: self.engine = Engine_vector(self)
+        if engine == 'compiled': self.engine = Engine_compiled(self)
+
+        self.checkpoint_path = None         # file the simulation is written to every checkpoint_freq months, see checkpoint
+        self.checkpoint_freq = 0            # number of months between checkpoints, 0 writes no checkpoints
+        self.stop_rule = None               # ends the run early once the economy is stationary, see Stop_rule
+        self.profiler = None                # records the wall time of each phase per month, None records nothing, see Profiler
+        self.store = None                   # appends the statistics of each month to a results store, None stores nothing, see Run_writer
+
         self.plot_param = plot_param        # control plotting behavior
         self.print_hashes = '######## ######## ########'        # pretty command line printing
 
@@ -88,25 +123,35 @@ class Simulation(object):
 
     # initialize a number of firms
     def init_firms(self):
-        for firm in range(self.f_param.get("num_firms")):
-            self.firm_list.append(Firm(self))
+        u = self.rng.random((self.f_param.num_firms, 2)).tolist()
+        for firm in range(self.f_param.num_firms):
+            self.firm_list.append(Firm(self, u[firm]))
+        self.employee_index = Fenwick([0] * len(self.firm_list))
 
     # initialize a number of hhs
     def init_households(self):
+        num_f = len(self.firm_list)
+        u = self.rng.random((self.hh_param.num_hh, 1 + self.hh_param.num_vendors)).tolist()
         employer_idx = 0
-        for hh in range(self.hh_param.get("num_hh")):
+        for hh in range(self.hh_param.num_hh):
             # first, hhs are distributed such that each firm has one employee
             # afterwards, hhs are randomly assigned to an employer
             # employers need to be informed who their employees are
-            employer = self.firm_list[employer_idx] if employer_idx < len(self.firm_list) else random.choice(self.firm_list)
-            new_household = Household(self, employer)
-            employer.list_employees.append(new_household)
+            employer = self.firm_list[employer_idx] if employer_idx < num_f else self.firm_list[int(u[hh][0] * num_f)]
+            new_household = Household(self, employer, u[hh][1:])
+            employer.add_employee(new_household)
             self.hh_list.append(new_household)
             employer_idx += 1
 
+    # initialize firms and households
+    def init_agents(self):
+        if self.engine: return self.engine.init_agents()
+        self.init_firms()
+        self.init_households()
+
     # initialize the stat_run object to track data produced by the simulation
     def init_stat_run(self):
-        self.stat = Stat_run(self.num_months, self.num_runs, self.gov_type, self.f_param['num_firms'], self.hh_param['num_hh'], self.plot_param)
+        self.stat = Stat_run(self.num_months, self.num_runs, self.gov_type, self.f_param.num_firms, self.hh_param.num_hh, self.plot_param)
         self.stat.set_sim(self)
 
     # initialize the government
@@ -115,99 +160,305 @@ class Simulation(object):
         if self.gov_type == 'rep': self.gov = Gov_rep(self)
         if self.gov_type == 'dir': self.gov = Gov_dir(self)
 
+    # return a context timing a phase of the current month, see Profiler.phase
+    # without a profiler the context does nothing
+    def profile(self, name: str):
+        if self.profiler is None: return no_profile
+        return self.profiler.phase(name, self.current_month)
+
+    # return the number of uniform random numbers each hh draws at the beginning of a month
+    # three to find a cheaper vendor, three to find a stocked vendor and the rest for the jobsearch
+    def num_bom_draws(self) -> int:
+        return 6 + max(3, self.hh_param.unemployed_ask_num)
+
     # actions at the beginning of a month
     def act_bom(self):
+        self.active_per_day = []
+        if self.engine: return self.engine.act_bom()
+
         def act_bom_f():
-            for f in self.firm_list:
-                f.update_wage(self.current_month)
+            u = self.rng.random((len(self.firm_list), 3)).tolist()
+            for f, f_u in zip(self.firm_list, u):
+                f.update_wage(self.current_month, f_u[0])
                 f.update_hiring_status(self.current_month)
-                f.update_price(self.current_month)
+                f.update_price(self.current_month, f_u[1:])
                 f.reset()
 
         def act_bom_hh():
-            random.shuffle(self.hh_list)
-            for hh in self.hh_list:
+            self.hh_list = [self.hh_list[i] for i in self.rng.permutation(len(self.hh_list))]
+            u = self.rng.random((len(self.hh_list), self.num_bom_draws())).tolist()
+            self.active_hh = []
+            for hh, hh_u in zip(self.hh_list, u):
                 hh.reset_income()
-                hh.find_cheaper_vendor()
-                hh.find_stocked_vendor()
-                hh.do_jobsearch()
+                hh.find_cheaper_vendor(hh_u[0:3])
+                hh.find_stocked_vendor(hh_u[3:6])
+                hh.do_jobsearch(hh_u[6:])
                 hh.plan_demand()
+                if hh.can_buy(): self.active_hh.append(hh)
 
-        act_bom_f()
-        act_bom_hh()
+        with self.profile('act_bom_f'):
+            act_bom_f()
+        with self.profile('act_bom_hh'):
+            act_bom_hh()
 
     # actions each day of the month
     # hhs buy goods before firms produce new ones since production is assumed to take a day
+    # only hhs that can still buy items go shopping, hhs leave once they are idle for the rest of the month
     def act_day(self):
+        if self.engine:
+            self.active_per_day.append(self.engine.act_day())
+            return
+
         def act_day_hh():
-            random.shuffle(self.hh_list)
-            for hh in self.hh_list:
-                hh.buy_items()
+            self.active_per_day.append(len(self.active_hh))
+            if self.hh_param.common_draws:
+                # the order of hhs and their rows of random numbers are drawn for all hhs and looked up by id
+                keys = self.rng.random(len(self.hh_list)).tolist()
+                u = self.rng.random((len(self.hh_list), self.hh_param.num_vendors)).tolist()
+                self.active_hh.sort(key=lambda hh: keys[hh.id])
+                for hh in self.active_hh:
+                    hh.buy_items(u[hh.id])
+            else:
+                self.active_hh = [self.active_hh[i] for i in self.rng.permutation(len(self.active_hh))]
+                u = self.rng.random((len(self.active_hh), self.hh_param.num_vendors)).tolist()
+                for hh, hh_u in zip(self.active_hh, u):
+                    hh.buy_items(hh_u)
+            self.active_hh = [hh for hh in self.active_hh if hh.can_buy()]
 
         def act_day_f():
             for f in self.firm_list:
                 f.produce_items()
         
-        act_day_hh()
-        act_day_f()
+        with self.profile('act_day_hh'):
+            act_day_hh()
+        with self.profile('act_day_f'):
+            act_day_f()
 
     # actions at the end of a month
     def act_eom(self):
-        for f in self.firm_list:
-            f.set_reserve()
-            f.pay_profits()
-        
-        for f in self.firm_list:
-            f.pay_wages()
+        if self.engine:
+            self.engine.act_eom()
+            self.gov_action()
+            return
 
-        for hh in self.hh_list:
-            hh.update_res_wage()
+        with self.profile('pay_profits'):
+            for f in self.firm_list:
+                f.set_reserve()
+            self.pay_profits()
 
-        for f in self.firm_list:
-            f.make_layoff_decision()
+        with self.profile('pay_wages'):
+            for f in self.firm_list:
+                f.pay_wages()
+            for hh in self.hh_list:
+                hh.update_res_wage()
+
+        with self.profile('layoffs'):
+            u = self.rng.random(len(self.firm_list)).tolist()
+            for f, f_u in zip(self.firm_list, u):
+                f.make_layoff_decision(f_u)
 
         self.gov_action()
 
     # start the simulation
     def start_sim(self):
+        self.init_sim()
+        self.event_loop()
+
+    # return the stat_run object of the simulation in a list, see Replicas.get_stats
+    def get_stats(self) -> list:
+        return [self.stat]
+
+    # initialize agents, statistics and the government
+    def init_sim(self):
         self.print_sim_step("INITIALIZE AGENTS")
-        self.init_firms()
-        self.init_households()
+        self.init_agents()
         self.init_stat_run()
         self.init_government()
         self.print_sim_step("INVOKING EVENT LOOP")
-        self.event_loop()
 
     # execute actions performed by a government
     def gov_action(self):
         if self.gov_type == 'none': return
-        self.gov.vote_tax()
-        self.gov.collect_tax()
-        self.gov.calc_ubi()
-        self.gov.pay_ubi()
+        with self.profile('gov_action'):
+            self.gov.vote_tax()
+            self.gov.collect_tax()
+            self.gov.calc_ubi()
+            self.gov.pay_ubi()
+
+    # firms pay their profits to households
+    # when batch_profits is set, all profits are gathered and each hh receives its share of the total once
+    # otherwise firms pay one after another and a hh's share grows with the profits of previous firms
+    def pay_profits(self):
+        if not self.f_param.batch_profits:
+            for f in self.firm_list:
+                f.pay_profits()
+            return
+
+        profit = 0
+        for f in self.firm_list:
+            f_profit = f.get_profit()
+            f.money -= f_profit
+            profit += f_profit
+        self.distribute_profit(profit)
+
+    # return the sum of money owned by all households in the simulation
+    def sum_hh_money(self) -> float:
+        sum = 0
+        for hh in self.hh_list:
+            sum += hh.money if hh.money > 0 else 0
+        return sum
+
+    # pay profit to all households, richer households receive higher profits
+    def distribute_profit(self, profit: float):
+        if profit <= 0: return
+        sum_hh_money = self.sum_hh_money()
+        for hh in self.hh_list:
+            hh.receive_profit(profit * (hh.money / sum_hh_money))
+
+    # collect taxes from all households, return the sum of taxes
+    # taxes change the money of households, so money is sorted again
+    def collect_tax(self, tax_rate: float) -> float:
+        self.order_stats.invalidate('hh_money')
+        if self.engine: return self.engine.collect_tax(tax_rate)
+        tax_sum = 0
+        for hh in self.hh_list:
+            tax_sum += hh.pay_tax(tax_rate)
+        return tax_sum
+
+    # pay equal ubi to all households
+    def pay_ubi(self, ubi: float):
+        self.order_stats.invalidate('hh_money')
+        if self.engine: return self.engine.pay_ubi(ubi)
+        for hh in self.hh_list:
+            hh.receive_ubi(ubi)
+
+    # return a household measure as array over all households
+    # 'employed' tells whether a hh has an employer, 'employer_id' gives the employer's id or -1 when unemployed
+    def hh_values(self, field: str):
+        if self.engine: return self.engine.hh_values(field)
+        if field == 'employed': return np.array([hh.employer is not None for hh in self.hh_list])
+        if field == 'employer_id': return np.array([hh.employer.id if hh.employer else -1 for hh in self.hh_list])
+        return np.array([getattr(hh, field) for hh in self.hh_list])
+
+    # return a firm measure as array over all firms
+    def f_values(self, field: str):
+        if self.engine: return self.engine.f_values(field)
+        if field == 'num_employees': return np.array([len(f.list_employees) for f in self.firm_list])
+        return np.array([getattr(f, field) for f in self.firm_list])
+
+    # return the household and firm measures used by the statistics as dicts of arrays, see Stat_run.up_stat
+    # agent objects are read in a single pass over the households and a single pass over the firms
+    def snapshot(self) -> tuple:
+        if self.engine:
+            return ({field: self.hh_values(field) for field in ['money', 'income', 'employed', 'res_wage']},
+                    {field: self.f_values(field) for field in ['money', 'wage', 'num_items', 'item_price', 'marginal_cost', 'demand',
+                                                               'num_employees', 'month_hiring', 'hiring_status']})
+        # records are read into a structured array, each measure is then copied to a contiguous array of its own
+        hh_dtype = np.dtype([(field, float) for field in ['money', 'income', 'employed', 'res_wage']])
+        f_dtype = np.dtype([(field, float) for field in ['money', 'wage', 'num_items', 'item_price', 'marginal_cost', 'demand',
+                                                         'num_employees', 'month_hiring', 'hiring_status']])
+        hh = np.fromiter(((hh.money, hh.income, hh.employer is not None, hh.res_wage) for hh in self.hh_list), hh_dtype, len(self.hh_list))
+        f = np.fromiter(((f.money, f.wage, f.num_items, f.item_price, f.marginal_cost, f.demand, len(f.list_employees), f.month_hiring,
+                          f.hiring_status) for f in self.firm_list), f_dtype, len(self.firm_list))
+        return ({field: np.ascontiguousarray(hh[field]) for field in hh_dtype.names},
+                {field: np.ascontiguousarray(f[field]) for field in f_dtype.names})
+
+    # continue the run from the current month under another government with changed parameters, see simulate_branches
+    # the months simulated so far must have been untaxed, they are recorded as months without tax and ubi
+    # the number of agents and vendors can't change since the engines have stored their agents
+    def set_branch(self, gov_type: str, changes: dict = None):
+        changes = changes or {}
+        fixed = {'num_firms', 'num_hh', 'num_vendors'} & {name for group in changes.values() for name in group}
+        if fixed: raise ValueError(f"parameters {sorted(fixed)} can't change during a run")
+        self.f_param = self.f_param.replace(**changes.get('f_param', {}))
+        self.hh_param = self.hh_param.replace(**changes.get('hh_param', {}))
+        self.g_param = self.g_param.replace(**changes.get('g_param', {}))
+        self.gov_type = gov_type
+        self.init_government()
+        self.stat.set_gov_type(gov_type)
+
+    # return an independent copy of the simulation with the same state, see checkpoint
+    def fork(self) -> 'Simulation':
+        return copy_sim(self)
+
+    # end the run after the current month, the distributions are measured in the last month simulated
+    def stop(self):
+        self.print_sim_step(f"STOPPED AT MONTH {self.current_month}")
+        if self.current_month < self.num_months: self.stat.calc_dist()
+        self.stat.stop_month = self.current_month
+        self.num_months = self.current_month
+
+    # continue a run for more months than it was started with
+    def extend(self, num_months: int):
+        self.num_months = num_months
+        self.stat.extend(num_months)
+
+    # write a checkpoint every checkpoint_freq months and after the last month
+    def checkpoint(self):
+        if not self.checkpoint_freq: return
+        if self.current_month % self.checkpoint_freq == 0 or self.current_month == self.num_months:
+            save_checkpoint(self, self.checkpoint_path)
+
+    # append the statistics recorded this month to the results store, so a run that crashes keeps the months it simulated
+    def store_month(self):
+        if self.store: self.store.write(self.stat)
+
+    # restore the simulation from a checkpoint, agents were written with links to other agents as ids
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        hh_by_id = {hh.id: hh for hh in self.hh_list}
+        for f in self.firm_list:
+            f.link(hh_by_id)
+        for hh in self.hh_list:
+            hh.link(self.firm_list)
 
     # run the main event loop
+    # a simulation loaded from a checkpoint continues with the month after the checkpoint
     def event_loop(self):
-        while(self.current_month < self.num_months):
+        self.run_until(self.num_months)
+
+        if self.plot_param['plot_per_run']:
+            print(f"\n{self.print_hashes:<30} {'CREATING PLOTS':>15}")
+            with self.profile('plots'):
+                self.stat.invoke_plots()
+
+    # simulate months until the given month is reached or the run is stopped
+    def run_until(self, month: int):
+        while(self.current_month < min(month, self.num_months)):
             print(f"{self.print_hashes:<30} {'MONTH:':>15} {self.current_month:>10}")
 
-            self.act_bom()
+            with self.profile('act_bom'):
+                self.act_bom()
             for day in range(self.days_in_month):
-                self.act_day()
-            self.act_eom()
-            self.stat.up_stat()
+                with self.profile('act_day'):
+                    self.act_day()
+            with self.profile('act_eom'):
+                self.act_eom()
+            with self.profile('up_stat'):
+                self.stat.up_stat()
 
             self.current_month += 1
-
-        if self.plot_param['plot_per_run']:
-            print(f"\n{self.print_hashes:<30} {'CREATING PLOTS':>15}")
-            self.stat.invoke_plots()
+            # a run that became stationary in its last month went on for all months and isn't stopped
+            if self.stop_rule and self.current_month < self.num_months and self.stop_rule.is_stationary(self.stat): self.stop()
+            self.store_month()
+            self.checkpoint()
 
 ######## ######## ######## IMPORTS ######## ######## ########
 
 from household import Household
 from firm import Firm
 from stat_run import Stat_run
+from order_stats import Order_stats
+from checkpoint import save_checkpoint, copy_sim
 from gov_rep import Gov_rep
 from gov_dir import Gov_dir
-import random
+from engine_vector import Engine_vector
+from fenwick import Fenwick
+from hiring_index import Hiring_index
+from param import Param
+from engine_compiled import Engine_compiled
+import kernels
+import numpy as np
+import contextlib
+
+no_profile = contextlib.nullcontext()       # context of phases that aren't profiled, see Simulation.profile
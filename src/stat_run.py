@@ -10,72 +10,110 @@ class Stat_run(Statistician):
     It inherits methods to visualize this data.
     '''
 
+    def __init__(self, num_months: int, num_runs: int, gov_type: str, num_f: int, num_hh: int, plot_param: dict):
+        super().__init__(num_months, num_runs, gov_type, num_f, num_hh, plot_param)
+        self.stop_month = None              # month a stop rule ended the run, None when the run went on for all months
+        self.buffers = {}                   # (stat, group, measure) -> buffer whose filled part is the series of the measure, see record
+        self.hh_snapshot = None             # household measures of the month recorded last, see Simulation.snapshot
+        self.f_snapshot = None              # firm measures of the month recorded last
+
     ######## ######## ######## METHODS ######## ######## ########
 
+    # write values after the last value of a monthly series, for example record('hh_stat', 'metric', 'gini_i', gini)
+    # each series is a view of the filled part of a buffer allocated once for all months, so recording a month doesn't copy the series
+    # a series that isn't a view of its buffer, after a checkpoint or set_gov_type, is copied into a new buffer
+    # a full buffer is replaced by one twice as long, so runs extended beyond their months keep growing in amortized constant time
+    def record(self, stat: str, group: str, measure: str, values: object):
+        values = np.ravel(values)
+        series = getattr(self, stat)[group]
+        num_filled = len(series[measure])
+        num_needed = num_filled + len(values)
+        buffer = self.buffers.get((stat, group, measure))
+        if buffer is None or series[measure].base is not buffer or len(buffer) < num_needed:
+            size = max(len(values) * len(self.x_months), num_needed)
+            if buffer is not None and len(buffer) < num_needed: size = max(size, 2 * len(buffer))
+            old = series[measure].ravel()
+            buffer = np.empty(size)
+            buffer[:num_filled] = old
+            self.buffers[(stat, group, measure)] = buffer
+        buffer[num_filled:num_needed] = values
+        series[measure] = buffer[:num_needed]
+
+    # checkpoints and results sent back by worker processes store the series without the unfilled part of their buffers
+    # the snapshot is gathered again each month, so it isn't stored either
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['buffers'] = {}
+        state['hh_snapshot'] = state['f_snapshot'] = None
+        return state
+
     # distribution measures
     def calc_dist(self):
-        self.f_stat['dist']['money'] = np.append(self.f_stat['dist']['money'], [f.money for f in self.sim.firm_list])
-        self.f_stat['dist']['wage'] = np.append(self.f_stat['dist']['wage'], [f.wage for f in self.sim.firm_list])
-        self.hh_stat['dist']['money'] = np.append(self.hh_stat['dist']['money'], [hh.money for hh in self.sim.hh_list])
-        self.hh_stat['dist']['income'] = np.append(self.hh_stat['dist']['income'], [hh.income for hh in self.sim.hh_list])
+        self.f_stat['dist']['money'] = np.append(self.f_stat['dist']['money'], self.f_snapshot['money'])
+        self.f_stat['dist']['wage'] = np.append(self.f_stat['dist']['wage'], self.f_snapshot['wage'])
+        self.hh_stat['dist']['money'] = np.append(self.hh_stat['dist']['money'], self.hh_snapshot['money'])
+        self.hh_stat['dist']['income'] = np.append(self.hh_stat['dist']['income'], self.hh_snapshot['income'])
 
     # sum measures
     def calc_sum(self):
-        hh_list = self.sim.hh_list
-        firm_list = self.sim.firm_list
-
-        self.hh_stat['sum']['money'] = np.append(self.hh_stat['sum']['money'], sum([hh.money for hh in hh_list]))
-        self.f_stat['sum']['money'] = np.append(self.f_stat['sum']['money'], sum([f.money for f in firm_list]))
+        self.record('hh_stat', 'sum', 'money', np.sum(self.hh_snapshot['money']))
+        self.record('f_stat', 'sum', 'money', np.sum(self.f_snapshot['money']))
 
     # calculate averages for a set of firm and household characteristics
     def calc_avg(self):
-        f_list = self.sim.firm_list
-        num_f = self.sim.f_param['num_firms']
-
-        self.f_stat['avg']['money'] = np.append(self.f_stat['avg']['money'], self.f_stat['sum']['money'][-1] / num_f)
-        self.f_stat['avg']['num_items'] = np.append(self.f_stat['avg']['num_items'], sum([f.num_items for f in f_list]) / num_f)
-        self.f_stat['avg']['item_price'] = np.append(self.f_stat['avg']['item_price'], sum([f.item_price for f in f_list]) / num_f)
-        self.f_stat['avg']['marginal_cost'] = np.append(self.f_stat['avg']['marginal_cost'], sum([f.marginal_cost for f in f_list]) / num_f)
-        self.f_stat['avg']['demand'] = np.append(self.f_stat['avg']['demand'], sum([f.demand for f in f_list]) / num_f)
-        self.f_stat['avg']['num_employees'] = np.append(self.f_stat['avg']['num_employees'], sum([len(f.list_employees) for f in f_list]) / num_f)
-        self.f_stat['avg']['wage'] = np.append(self.f_stat['avg']['wage'], sum([f.wage for f in f_list]) / num_f)
-        self.f_stat['avg']['months_hiring'] = np.append(self.f_stat['avg']['months_hiring'], sum([self.sim.current_month - f.month_hiring for f in f_list]) / num_f)
-
-        hh_list = self.sim.hh_list
-        num_hh = self.sim.hh_param['num_hh']
-
-        self.hh_stat['avg']['money'] = np.append(self.hh_stat['avg']['money'], self.hh_stat['sum']['money'][-1] / num_hh)
-        self.hh_stat['avg']['income'] = np.append(self.hh_stat['avg']['income'], sum([hh.income for hh in hh_list]) / num_hh)
-        self.hh_stat['avg']['employment'] = np.append(self.hh_stat['avg']['employment'], sum([1 if hh.employer else 0 for hh in hh_list]) / num_hh)
-        self.hh_stat['avg']['res_wage'] = np.append(self.hh_stat['avg']['res_wage'], sum([hh.res_wage for hh in hh_list]) / num_hh)
+        f_values = self.f_snapshot
+        num_f = self.sim.f_param.num_firms
+
+        self.record('f_stat', 'avg', 'money', self.f_stat['sum']['money'][-1] / num_f)
+        self.record('f_stat', 'avg', 'num_items', np.sum(f_values['num_items']) / num_f)
+        self.record('f_stat', 'avg', 'item_price', np.sum(f_values['item_price']) / num_f)
+        self.record('f_stat', 'avg', 'marginal_cost', np.sum(f_values['marginal_cost']) / num_f)
+        self.record('f_stat', 'avg', 'demand', np.sum(f_values['demand']) / num_f)
+        self.record('f_stat', 'avg', 'num_employees', np.sum(f_values['num_employees']) / num_f)
+        self.record('f_stat', 'avg', 'wage', np.sum(f_values['wage']) / num_f)
+        self.record('f_stat', 'avg', 'months_hiring', np.sum(self.sim.current_month - f_values['month_hiring']) / num_f)
+
+        hh_values = self.hh_snapshot
+        num_hh = self.sim.hh_param.num_hh
+
+        self.record('hh_stat', 'avg', 'money', self.hh_stat['sum']['money'][-1] / num_hh)
+        self.record('hh_stat', 'avg', 'income', np.sum(hh_values['income']) / num_hh)
+        self.record('hh_stat', 'avg', 'employment', np.sum(hh_values['employed']) / num_hh)
+        self.record('hh_stat', 'avg', 'res_wage', np.sum(hh_values['res_wage']) / num_hh)
+
+        # a hiring firm offers a vacancy to each hh whose reservation wage it pays
+        hiring_wage = np.sort(f_values['wage'][f_values['hiring_status'] == 1])
+        vacancies = len(hiring_wage) - np.searchsorted(hiring_wage, hh_values['res_wage'])
+        self.record('hh_stat', 'avg', 'vacancies', np.sum(vacancies) / num_hh)
     
     # calculate equality metrics
     def calc_metric(self):
-        self.hh_stat['metric']['gini_m'] = np.append(self.hh_stat['metric']['gini_m'], self.calc_gini('money'))
-        self.hh_stat['metric']['gini_i'] = np.append(self.hh_stat['metric']['gini_i'], self.calc_gini('income'))
+        self.record('hh_stat', 'metric', 'gini_m', self.calc_gini('money'))
+        self.record('hh_stat', 'metric', 'gini_i', self.calc_gini('income'))
+
+    # daily measures of the past month
+    def calc_daily(self):
+        self.record('hh_stat', 'daily', 'active', self.sim.active_per_day)
 
     # calculate government metrics
     def calc_gov(self):
-        self.g_stat['fix']['tax'] = np.append(self.g_stat['fix']['tax'], self.sim.gov.tax_rate)
-        self.g_stat['fix']['ubi'] = np.append(self.g_stat['fix']['ubi'], self.sim.gov.ubi)
+        self.record('g_stat', 'fix', 'tax', self.sim.gov.tax_rate)
+        self.record('g_stat', 'fix', 'ubi', self.sim.gov.ubi)
         if self.gov_type == 'rep':
-            self.g_stat['fix']['parties'] = np.append(self.g_stat['fix']['parties'], self.sim.gov.parties)
+            self.record('g_stat', 'fix', 'parties', self.sim.gov.parties)
 
     # calculate Gini index/coefficient
     # based on https://github.com/oliviaguest/gini
     # Guest, O., & Love, B. C. (2017). What the Success of Brain Imaging Implies about the Neural Code. eLife. doi: 10.7554/eLife.21397.
+    # the values are sorted once per month and shared with the government, see Order_stats
     def calc_gini(self, g_type):
-        if g_type == 'income': array = np.array([hh.income for hh in self.sim.hh_list])
-        if g_type == 'money': array = np.array([hh.money for hh in self.sim.hh_list])
-        # All values are treated equally, arrays must be 1d:
-        array = array.flatten()
-        if np.amin(array) < 0:
+        # Values must be sorted:
+        array = self.sim.order_stats.sorted('hh_' + g_type, self.hh_snapshot[g_type]).copy()
+        if array[0] < 0:
             # Values cannot be negative:
-            array -= np.amin(array)
+            array -= array[0]
         # Values cannot be 0:
         array += 0.0000001
-        # Values must be sorted:
-        array = np.sort(array)
         # Index per array element:
         index = np.arange(1,array.shape[0]+1)
         # Number of array elements:
@@ -83,12 +121,32 @@ class Stat_run(Statistician):
         # Gini coefficient:
         return ((np.sum((2 * index - n  - 1) * array)) / (n * np.sum(array)))
 
+    # record a government from the current month on, the months recorded so far had no tax and ubi
+    def set_gov_type(self, gov_type: str):
+        self.gov_type = gov_type
+        if gov_type == 'none': return
+        num_months = len(self.hh_stat['metric']['gini_i'])
+        self.g_stat['fix']['tax'] = np.zeros(num_months)
+        self.g_stat['fix']['ubi'] = np.zeros(num_months)
+        self.g_stat['fix']['parties'] = np.zeros(num_months * self.sim.g_param.rep_num_parties) if gov_type == 'rep' else np.empty(0)
+
+    # continue recording for more months, the distributions are measured again in the new last month
+    def extend(self, num_months: int):
+        self.x_months = [m for m in range(num_months)]
+        self.stop_month = None
+        for stat in [self.f_stat, self.hh_stat]:
+            for measure_key in stat['dist']:
+                stat['dist'][measure_key] = np.empty(0)
+
     # each month notify stat_run of occurrences in the simulation
+    # all measures are derived from a snapshot of the households and firms gathered once
     def up_stat(self):
+        self.hh_snapshot, self.f_snapshot = self.sim.snapshot()
         if self.sim.current_month == self.sim.num_months-1:     # in the last month of a run store income and money distribution for histograms
             self.calc_dist()
         self.calc_sum()
         self.calc_avg()
         self.calc_metric()
+        self.calc_daily()
         if self.gov_type != 'none':
             self.calc_gov()
@@ -2,28 +2,141 @@
 
 from simulation import Simulation
 from statistician import Statistician
+from running import Running, run_key, sample_keep
 import numpy as np
+from scipy import stats
 
 class Stat_runs(Statistician):
     '''
     The stat_runs object integrates data generated by stat_run objects over multiple runs.
     The data in the stat_run objects is analyzed and plotted.
+    Runs ended early by a stop rule are either continued with the values of their last month ('carry')
+    or all runs are cut to the length of the shortest run ('truncate'), see Stop_rule.
+    Runs are either stacked into (run, month) matrices ('stack') or streamed ('stream') into running aggregates of constant size.
+    Streamed measures keep their mean, variance and a sample of runs per month, see Running,
+    and the distributions of a sample of sample_size runs are kept for the histograms.
     '''
 
+    # measures whose value in the last month is compared over runs, given as statistics, kind and measure, see final_values
+    final_measures = {
+        'gini_i': ('hh_stat', 'metric', 'gini_i'),
+        'gini_m': ('hh_stat', 'metric', 'gini_m'),
+        'employment': ('hh_stat', 'avg', 'employment'),
+        'income': ('hh_stat', 'avg', 'income'),
+        'item_price': ('f_stat', 'avg', 'item_price'),
+        'wage': ('f_stat', 'avg', 'wage'),
+        'tax': ('g_stat', 'fix', 'tax'),
+        'ubi': ('g_stat', 'fix', 'ubi'),
+    }
+
+    def __init__(self, num_months: int, num_runs: int, gov_type: str, num_f: int, num_hh: int, plot_param: dict,
+                 length_policy: str = 'carry', aggregation: str = 'stack', sample_size: int = 100):
+        if aggregation == 'stream' and length_policy == 'truncate':
+            raise ValueError("streamed runs can't be truncated to later shorter runs, use the 'carry' length policy")
+        super().__init__(num_months, num_runs, gov_type, num_f, num_hh, plot_param)
+        self.run_ids = []                   # index of the run in each row of the data
+        self.stop_months = []               # month a stop rule ended each run, None when a run went on for all months
+        self.num_months = num_months        # number of months of runs that weren't stopped
+        self.length_policy = length_policy  # 'carry' or 'truncate' runs of unequal length
+        self.aggregation = aggregation      # 'stack' or 'stream' the runs' measures
+        self.sample_size = sample_size      # number of runs sampled when streaming
+        self.sample_keys = np.empty(0)      # keys of the runs whose distributions are sampled when streaming, see sample_keep
+        self.finals = {measure: [] for measure in self.final_measures}     # values in the last month of each run when streaming
+
     ######## ######## ######## METHODS ######## ######## ########
 
     # add the data of a single run stored in a stat_run object
-    def add_run(self, run: object):
-        for stat_key, stat_val in run.f_stat.items():
-            for measure_key, measure_val in stat_val.items():
-                self.f_stat[stat_key][measure_key] = np.vstack((self.f_stat[stat_key][measure_key], np.array(measure_val)))
+    # with the index of the run given, rows are kept in order of run index regardless of the order in which runs are added
+    def add_run(self, run: object, run_idx: int = None):
+        self.add_runs([run], [len(self.run_ids) if run_idx is None else run_idx])
+
+    # add the data of a number of runs stored in stat_run objects with the indices of the runs
+    # the runs' measures are stacked into (run, month) matrices at once and rows are kept in order of run index
+    # streamed runs are added to running aggregates instead, see stream_runs
+    def add_runs(self, runs: list, run_ids: list):
+        if self.aggregation == 'stream': return self.stream_runs(runs, run_ids)
+        run_ids = self.run_ids + list(run_ids)
+        order = np.argsort(run_ids, kind='stable')
+        self.run_ids = [run_ids[i] for i in order]
+        stop_months = self.stop_months + [run.stop_month for run in runs]
+        self.stop_months = [stop_months[i] for i in order]
 
-        for stat_key, stat_val in run.hh_stat.items():
-            for measure_key, measure_val in stat_val.items():
-                self.hh_stat[stat_key][measure_key] = np.vstack((self.hh_stat[stat_key][measure_key], np.array(measure_val)))
+        # runs are continued or cut to the same number of months
+        run_months = [len(run.hh_stat['metric']['gini_i']) for run in runs]
+        num_months = self.num_months if self.length_policy == 'carry' else min(run_months + [len(self.x_months)])
+        self.x_months = [m for m in range(num_months)]
+
+        # measures hold a block of values per month, such as 21 days or the share of each party
+        def fit(row: np.ndarray, run_month: int) -> np.ndarray:
+            block = len(row) // run_month
+            if run_month < num_months:
+                row = np.concatenate((row, np.tile(row[-block:], num_months - run_month)))
+            return row[:num_months * block]
+
+        def add_stat(stat: dict, run_stats: list):
+            for stat_key, stat_val in stat.items():
+                for measure_key, measure_val in stat_val.items():
+                    rows = [np.array(run_stat[stat_key][measure_key]) for run_stat in run_stats]
+                    if len(rows[0]) == 0: continue                  # only add party data for the representative government
+                    if stat_key != 'dist':                          # distributions are measured in the last month of each run
+                        rows = [fit(row, run_month) for row, run_month in zip(rows, run_months)]
+                        measure_val = measure_val[:, :len(rows[0])]
+                    stat_val[measure_key] = np.concatenate((measure_val, np.stack(rows)))[order]
 
+        add_stat(self.f_stat, [run.f_stat for run in runs])
+        add_stat(self.hh_stat, [run.hh_stat for run in runs])
         if self.gov_type != 'none':
-            for stat_key, stat_val in run.g_stat.items():
+            add_stat(self.g_stat, [run.g_stat for run in runs])
+
+    # add the data of a number of runs to the running aggregate of each measure, continuing stopped runs with their last month
+    # the distributions of the runs with the smallest keys are kept, the values in the last month are kept for final_values
+    def stream_runs(self, runs: list, run_ids: list):
+        run_ids = list(run_ids)
+        order = np.argsort(self.run_ids + run_ids, kind='stable')
+        self.run_ids = [(self.run_ids + run_ids)[i] for i in order]
+        self.stop_months = [(self.stop_months + [run.stop_month for run in runs])[i] for i in order]
+        for measure, (stat_name, kind, measure_key) in self.final_measures.items():
+            finals = self.finals[measure] + [getattr(run, stat_name)[kind][measure_key][-1:] for run in runs]
+            self.finals[measure] = [finals[i] for i in order]
+
+        # measures hold a block of values per month, such as 21 days or the share of each party
+        run_months = [len(run.hh_stat['metric']['gini_i']) for run in runs]
+        def fit(row: np.ndarray, run_month: int) -> np.ndarray:
+            block = len(row) // run_month
+            if run_month < self.num_months:
+                row = np.concatenate((row, np.tile(row[-block:], self.num_months - run_month)))
+            return row[:self.num_months * block]
+
+        keys = [run_key(run_id) for run_id in run_ids]
+        keep = sample_keep(self.sample_keys, keys, self.sample_size)
+        for stat_name in ['f_stat', 'hh_stat'] + (['g_stat'] if self.gov_type != 'none' else []):
+            for stat_key, stat_val in getattr(self, stat_name).items():
                 for measure_key, measure_val in stat_val.items():
-                    if len(measure_val) == 0: continue                  # only add party data for the representative government
-                    self.g_stat[stat_key][measure_key] = np.vstack((self.g_stat[stat_key][measure_key], np.array(measure_val)))
+                    rows = [np.array(getattr(run, stat_name)[stat_key][measure_key]) for run in runs]
+                    if len(rows[0]) == 0: continue                  # only add party data for the representative government
+                    if stat_key == 'dist':                          # distributions are measured in the last month of each run
+                        stat_val[measure_key] = np.concatenate((measure_val, np.stack(rows)))[keep]
+                        continue
+                    rows = [fit(row, run_month) for row, run_month in zip(rows, run_months)]
+                    if not isinstance(measure_val, Running):
+                        measure_val = stat_val[measure_key] = Running(len(rows[0]), self.sample_size)
+                    for row, run_id in zip(rows, run_ids):
+                        measure_val.add(row, run_id)
+        self.sample_keys = np.concatenate((self.sample_keys, keys))[keep]
+
+    # return the value of a measure in the last month of each run, empty when the measure isn't recorded such as tax without government
+    def final_values(self, measure: str) -> np.ndarray:
+        if self.aggregation == 'stream': return np.concatenate(self.finals[measure]) if self.finals[measure] else np.empty(0)
+        stat_name, kind, measure_key = self.final_measures[measure]
+        values = getattr(self, stat_name)[kind][measure_key]
+        if len(self.run_ids) == 0 or values.shape[0] == 0: return np.empty(0)
+        return values[:, -1]
+
+    # return the mean difference to other runs of a measure in the last month, its paired and its unpaired standard error
+    # run i of both objects must have been simulated from the same seed, the paired standard error uses the difference per run
+    def paired_difference(self, other: 'Stat_runs', measure: str) -> tuple:
+        if self.run_ids != other.run_ids: raise ValueError("paired runs must have the same run indices")
+        values, other_values = self.final_values(measure), other.final_values(measure)
+        difference = values - other_values
+        unpaired_sem = np.sqrt(stats.sem(values)**2 + stats.sem(other_values)**2)
+        return np.mean(difference), stats.sem(difference), unpaired_sem
@@ -6,6 +6,9 @@ from collections import deque
 import datetime
 from scipy.interpolate import interp1d
 from scipy import stats
+from running import Running
+from results_store import save_stats, code_version
+from pathlib import Path
 
 plt.rcParams['axes.grid'] = True
 plt.rcParams["errorbar.capsize"] = 3
@@ -67,12 +70,17 @@ class Statistician(object):
                 'employment': np.empty((0, num_months)),        # household employment rate
                 'res_wage': np.empty((0, num_months)),
                 'income': np.empty((0, num_months)),
+                'vacancies': np.empty((0, num_months)),         # number of hiring firms paying at least the reservation wage
             },
 
             'metric': {
                 'gini_i': np.empty((0, num_months)),            # gini on income
                 'gini_m': np.empty((0, num_months)),            # gini on money
             },
+
+            'daily': {
+                'active': np.empty((0, num_months*21)),         # number of hhs buying items each day (21 days a month)
+            },
         }
 
         # government statistics
@@ -91,6 +99,16 @@ class Statistician(object):
     def set_sim(self, sim: object):
         self.sim = sim
 
+    # return the mean over runs of a measure in each month, the measure is a (run, month) matrix or a running aggregate, see Running
+    def run_mean(self, values: object) -> np.ndarray:
+        if isinstance(values, Running): return values.mean
+        return np.mean(values, axis=0)
+
+    # return the standard error of the mean over runs of a measure in each month
+    def run_sem(self, values: object) -> np.ndarray:
+        if isinstance(values, Running): return values.sem()
+        return stats.sem(values)
+
     # invoke the appropriate plots given the configuration of the simulation
     def invoke_plots(self):
         self.plot_equality()
@@ -108,27 +126,25 @@ class Statistician(object):
         self.hist_income()
         self.hist_money()
         self.dist_income()
-        if self.plot_param['save_csv']:
+        if self.plot_param['save_data']:
             print_hashes = "######## ######## ########"
             print(f"\n{print_hashes:<30} {'SAVING DATA':>15}")
             self.save()
 
-    # save data to file
+    # return the rows of a measure written to file, a running aggregate is written as its mean and standard error in each month
+    def save_rows(self, values: object) -> np.ndarray:
+        if isinstance(values, Running): return np.vstack((values.mean, values.sem()))
+        return values
+
+    # save data to a results store under dat/, each series to a binary file that is read back mapped into memory, see load_run
     def save(self):
-        with open('dat/data '+str(datetime.datetime.now().strftime("%H:%M:%S"))+'.csv','a') as f:
-            for stat_key, stat_val in self.f_stat.items():
-                for measure_key, measure_val in stat_val.items():
-                    np.savetxt(f, self.f_stat[stat_key][measure_key], delimiter=',', header='firm '+str(stat_key)+' '+str(measure_key))
-
-            for stat_key, stat_val in self.hh_stat.items():
-                for measure_key, measure_val in stat_val.items():
-                    np.savetxt(f, self.hh_stat[stat_key][measure_key], delimiter=',', header='hh '+str(stat_key)+' '+str(measure_key))
-                    
-            if self.gov_type != 'none':
-                for stat_key, stat_val in self.g_stat.items():
-                    for measure_key, measure_val in stat_val.items():
-                        if len(measure_val) == 0: continue                  # only add party data for the representative government
-                        np.savetxt(f, self.g_stat[stat_key][measure_key], delimiter=',', header='gov '+str(stat_key)+' '+str(measure_key))
+        path = Path('dat') / f"{self.gov_type}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        meta = {'gov_type': self.gov_type, 'num_runs': self.num_runs, 'num_months': len(self.x_months), 'code_version': code_version(),
+                'created': datetime.datetime.now().isoformat(timespec='seconds')}
+        if self.sim:
+            meta.update(f_param=self.sim.f_param.to_dict(), hh_param=self.sim.hh_param.to_dict(), g_param=self.sim.g_param.to_dict())
+        save_stats(path, self, meta)
+        print(f"{'######## ######## ########':<30} {'SAVED TO:':>15} {str(path):>10}")
 
 ######## ######## ######## PLOTS ######## ######## ########
 
@@ -141,10 +157,10 @@ class Statistician(object):
     # plot the gini index based on income and money distribution
     def plot_equality(self):
         if self.sim.num_runs > 1:
-            y1_gini_m = np.mean(self.hh_stat['metric']['gini_m'], axis=0)
-            y2_gini_i = np.mean(self.hh_stat['metric']['gini_i'], axis=0)
-            e1 = stats.sem(self.hh_stat['metric']['gini_m'])
-            e2 = stats.sem(self.hh_stat['metric']['gini_i'])
+            y1_gini_m = self.run_mean(self.hh_stat['metric']['gini_m'])
+            y2_gini_i = self.run_mean(self.hh_stat['metric']['gini_i'])
+            e1 = self.run_sem(self.hh_stat['metric']['gini_m'])
+            e2 = self.run_sem(self.hh_stat['metric']['gini_i'])
         else:
             y1_gini_m = self.hh_stat['metric']['gini_m']
             y2_gini_i = self.hh_stat['metric']['gini_i']
@@ -162,10 +178,10 @@ class Statistician(object):
     # plot averages for firm money and household money against time
     def plot_money(self):
         if self.sim.num_runs > 1:
-            y1_f_money = np.mean(self.f_stat['avg']['money'], axis=0)
-            y2_hh_money = np.mean(self.hh_stat['avg']['money'], axis=0)
-            e1 = stats.sem(self.f_stat['avg']['money'])
-            e2 = stats.sem(self.hh_stat['avg']['money'])
+            y1_f_money = self.run_mean(self.f_stat['avg']['money'])
+            y2_hh_money = self.run_mean(self.hh_stat['avg']['money'])
+            e1 = self.run_sem(self.f_stat['avg']['money'])
+            e2 = self.run_sem(self.hh_stat['avg']['money'])
         else:
             y1_f_money = self.f_stat['avg']['money']
             y2_hh_money = self.hh_stat['avg']['money']
@@ -184,12 +200,12 @@ class Statistician(object):
     # plot averages for firm wage, household income and household reservation wage against time
     def plot_wage(self):
         if self.sim.num_runs > 1:
-            y1_f_wage = np.mean(self.f_stat['avg']['wage'], axis=0)
-            y2_hh_res_wage = np.mean(self.hh_stat['avg']['res_wage'], axis=0)
-            y3_hh_income = np.mean(self.hh_stat['avg']['income'], axis=0)
-            e1 = stats.sem(self.f_stat['avg']['wage'])
-            e2 = stats.sem(self.hh_stat['avg']['res_wage'])
-            e3 = stats.sem(self.hh_stat['avg']['income'])
+            y1_f_wage = self.run_mean(self.f_stat['avg']['wage'])
+            y2_hh_res_wage = self.run_mean(self.hh_stat['avg']['res_wage'])
+            y3_hh_income = self.run_mean(self.hh_stat['avg']['income'])
+            e1 = self.run_sem(self.f_stat['avg']['wage'])
+            e2 = self.run_sem(self.hh_stat['avg']['res_wage'])
+            e3 = self.run_sem(self.hh_stat['avg']['income'])
         else:
             y1_f_wage = self.f_stat['avg']['wage']
             y2_hh_res_wage = self.hh_stat['avg']['res_wage']
@@ -209,10 +225,10 @@ class Statistician(object):
     # plot averages for number of items a firm has in stock and demand 
     def plot_demand(self):
         if self.sim.num_runs > 1:
-            y1_f_num_items = np.mean(self.f_stat['avg']['num_items'], axis=0)
-            y2_f_demand = np.mean(self.f_stat['avg']['demand'], axis=0)
-            e1 = stats.sem(self.f_stat['avg']['num_items'])
-            e2 = stats.sem(self.f_stat['avg']['demand'])
+            y1_f_num_items = self.run_mean(self.f_stat['avg']['num_items'])
+            y2_f_demand = self.run_mean(self.f_stat['avg']['demand'])
+            e1 = self.run_sem(self.f_stat['avg']['num_items'])
+            e2 = self.run_sem(self.f_stat['avg']['demand'])
         else:
             y1_f_num_items = self.f_stat['avg']['num_items']
             y2_f_demand = self.f_stat['avg']['demand']
@@ -230,10 +246,10 @@ class Statistician(object):
     # plot firm's marginal cost and item price
     def plot_item_cost(self):
         if self.sim.num_runs > 1:
-            y1_f_marginal_cost = np.mean(self.f_stat['avg']['marginal_cost'], axis=0)
-            y2_f_item_price = np.mean(self.f_stat['avg']['item_price'], axis=0)
-            e1 = stats.sem(self.f_stat['avg']['marginal_cost'])
-            e2 = stats.sem(self.f_stat['avg']['item_price'])
+            y1_f_marginal_cost = self.run_mean(self.f_stat['avg']['marginal_cost'])
+            y2_f_item_price = self.run_mean(self.f_stat['avg']['item_price'])
+            e1 = self.run_sem(self.f_stat['avg']['marginal_cost'])
+            e2 = self.run_sem(self.f_stat['avg']['item_price'])
         else:
             y1_f_marginal_cost = self.f_stat['avg']['marginal_cost']
             y2_f_item_price = self.f_stat['avg']['item_price']
@@ -251,8 +267,8 @@ class Statistician(object):
     # plot household employment rate
     def plot_employment(self):
         if self.sim.num_runs > 1:
-            y1_hh_employment = np.mean(self.hh_stat['avg']['employment'], axis=0)
-            e1 = stats.sem(self.hh_stat['avg']['employment'])
+            y1_hh_employment = self.run_mean(self.hh_stat['avg']['employment'])
+            e1 = self.run_sem(self.hh_stat['avg']['employment'])
         else:
             y1_hh_employment = self.hh_stat['avg']['employment']
             e1, e2 = 0, 0
@@ -269,10 +285,10 @@ class Statistician(object):
         # the duration for which firms have been looking to hire
     def plot_connections(self):
         if self.sim.num_runs > 1:
-            y1_f_num_employees = np.mean(self.f_stat['avg']['num_employees'], axis=0)
-            y2_f_months_hiring = np.mean(self.f_stat['avg']['months_hiring'], axis=0)
-            e1 = stats.sem(self.f_stat['avg']['num_employees'])
-            e2 = stats.sem(self.f_stat['avg']['months_hiring'])
+            y1_f_num_employees = self.run_mean(self.f_stat['avg']['num_employees'])
+            y2_f_months_hiring = self.run_mean(self.f_stat['avg']['months_hiring'])
+            e1 = self.run_sem(self.f_stat['avg']['num_employees'])
+            e2 = self.run_sem(self.f_stat['avg']['months_hiring'])
         else:
             y1_f_num_employees = self.f_stat['avg']['num_employees']
             y2_f_months_hiring = self.f_stat['avg']['months_hiring']
@@ -290,8 +306,8 @@ class Statistician(object):
     # plot the tax rate set by government for each month
     def plot_tax(self):
         if self.sim.num_runs > 1:
-            y1_tax = np.mean(self.g_stat['fix']['tax'], axis=0)
-            e1 = stats.sem(self.g_stat['fix']['tax'])
+            y1_tax = self.run_mean(self.g_stat['fix']['tax'])
+            e1 = self.run_sem(self.g_stat['fix']['tax'])
         else:
             y1_tax = self.g_stat['fix']['tax']
             e1 = 0
@@ -306,8 +322,8 @@ class Statistician(object):
     # plot the universal basic income set by government for each month
     def plot_ubi(self):
         if self.sim.num_runs > 1:
-            y1_ubi = np.mean(self.g_stat['fix']['ubi'], axis=0)
-            e1 = stats.sem(self.g_stat['fix']['ubi'])
+            y1_ubi = self.run_mean(self.g_stat['fix']['ubi'])
+            e1 = self.run_sem(self.g_stat['fix']['ubi'])
         else:
             y1_ubi = self.g_stat['fix']['ubi']
             e1 = 0
@@ -321,20 +337,11 @@ class Statistician(object):
 
     # plot the party composition of the representative government for each month
     def plot_parties(self):
-        if self.sim.num_months > 1:
+        if self.sim.num_runs > 1:
+            # each month holds the share of the 5 parties, so the mean and error over runs are split into a row per party
             parties = self.g_stat['fix']['parties']
-            y1_party, y2_party, y3_party, y4_party, y5_party = (np.empty((0, self.sim.num_months)) for i in range(5))
-
-            for row in range(np.size(parties, 0)):
-                col = 0
-                y1_col, y2_col, y3_col, y4_col, y5_col = (np.empty(0) for i in range(5))
-                while col < np.size(parties, 1):
-                    y1_col, y2_col, y3_col, y4_col, y5_col = np.append(y1_col, parties[row][col]), np.append(y2_col, parties[row][col+1]), np.append(y3_col, parties[row][col+2]), np.append(y4_col, parties[row][col+3]), np.append(y5_col, parties[row][col+4])
-                    col += 5
-                y1_party, y2_party, y3_party, y4_party, y5_party = np.vstack((y1_party, y1_col)), np.vstack((y2_party, y2_col)), np.vstack((y3_party, y3_col)), np.vstack((y4_party, y4_col)), np.vstack((y5_party, y5_col))
-
-            e1, e2, e3, e4, e5 = stats.sem(y1_party), stats.sem(y2_party), stats.sem(y3_party), stats.sem(y4_party), stats.sem(y5_party)
-            y1_party, y2_party, y3_party, y4_party, y5_party = np.mean(y1_party, axis=0), np.mean(y2_party, axis=0), np.mean(y3_party, axis=0), np.mean(y4_party, axis=0), np.mean(y5_party, axis=0)
+            y1_party, y2_party, y3_party, y4_party, y5_party = self.run_mean(parties).reshape(-1, 5).T
+            e1, e2, e3, e4, e5 = self.run_sem(parties).reshape(-1, 5).T
         else:
             parties = deque(self.g_stat['fix']['parties'])
             y1_party, y2_party, y3_party, y4_party, y5_party = ([] for i in range(5))
@@ -369,8 +376,8 @@ class Statistician(object):
 
         fig, (ax1, ax2) = plt.subplots(1, 2)
         
-        ax1.hist(f_money_list, bins=int(self.sim.f_param['num_firms']/10))
-        ax2.hist(hh_money_list, bins=int(self.sim.hh_param['num_hh']/10))
+        ax1.hist(f_money_list, bins=int(self.sim.f_param.num_firms/10))
+        ax2.hist(hh_money_list, bins=int(self.sim.hh_param.num_hh/10))
 
         ax1.set(xlabel='Money', ylabel='Number of firms')
         ax2.set(xlabel='Money', ylabel='Number of households')
@@ -392,8 +399,8 @@ class Statistician(object):
 
         fig, (ax1, ax2) = plt.subplots(1, 2)
     
-        ax1.hist(f_wage_list, bins=int(self.sim.f_param['num_firms']/10))
-        ax2.hist(hh_income_list, bins=int(self.sim.hh_param['num_hh']/10))
+        ax1.hist(f_wage_list, bins=int(self.sim.f_param.num_firms/10))
+        ax2.hist(hh_income_list, bins=int(self.sim.hh_param.num_hh/10))
         
         ax1.set(xlabel='Wage', ylabel='Number of firms')
         ax2.set(xlabel='Income', ylabel='Number of households')
@@ -408,29 +415,11 @@ class Statistician(object):
     def dist_income(self):
         if self.sim.num_runs > 1: return
 
-        # income distribution at the end of the simulation as line graph
-        hh_dist_income = self.hh_stat['dist']['income']
-        hh_dist_income.sort()
-
-        hh_income_integral = [0]
-        for hh in hh_dist_income:
-            hh_income_integral.append(hh + hh_income_integral[-1])
-        hh_income_norm = [hh / hh_income_integral[-1] for hh in hh_income_integral]
-
-        hh_income_x = list(range(0, len(hh_income_norm)))       # x has num_hh entries
-        hh_income_x = [point / (len(hh_income_x)-1) for point in hh_income_x]
+        # income distribution at the end of the simulation as line graph, see Order_stats.lorenz
         # 0.2 on x-axis shows the percentage of the sum of incomes on the y-axis
-
-        f_dist_wage = self.f_stat['dist']['wage']
-        f_dist_wage.sort()
-
-        f_wage_integral = [0]
-        for f in f_dist_wage:
-            f_wage_integral.append(f + f_wage_integral[-1])
-
-        f_wage_norm = [f / f_wage_integral[-1] for f in f_wage_integral]
-        f_wage_x = list(range(0, len(f_wage_norm)))       # x has num_f entries
-        f_wage_x = [point / (len(f_wage_x)-1) for point in f_wage_x]
+        order_stats = self.sim.order_stats
+        hh_income_x, hh_income_norm = order_stats.lorenz('hh_income', self.hh_stat['dist']['income'])
+        f_wage_x, f_wage_norm = order_stats.lorenz('f_wage', self.f_stat['dist']['wage'])
 
         fig, (ax1, ax2) = plt.subplots(1, 2)
 
@@ -0,0 +1,38 @@
+
+
+import numpy as np
+
+
+class Stop_rule(object):
+    '''
+    The stop rule ends a run once the economy is stationary, so that months aren't spent simulating a settled economy.
+    A measure is stationary when its mean over the last window months differs from its mean over the window before
+    by less than tol relative to the earlier mean.
+    The economy is stationary when the Gini indices of income and money, the employment rate and the average item price are.
+    The rule is checked after the statistics of each month are recorded, not before min_months months.
+    '''
+
+    # measures checked for stationarity, given as statistics, kind and measure of a stat_run object
+    measures = {
+        'gini_i': ('hh_stat', 'metric', 'gini_i'),
+        'gini_m': ('hh_stat', 'metric', 'gini_m'),
+        'employment': ('hh_stat', 'avg', 'employment'),
+        'item_price': ('f_stat', 'avg', 'item_price'),
+    }
+
+    def __init__(self, window: int = 24, tol: float = 0.01, min_months: int = 0):
+        self.window = window                    # number of months averaged per window
+        self.tol = tol                          # largest change of the mean between windows, relative to the earlier window
+        self.min_months = max(min_months, 2 * window)       # number of months simulated at least
+
+    ######## ######## ######## METHODS ######## ######## ########
+
+    # return whether the measures recorded by a stat_run object are stationary
+    def is_stationary(self, stat: object) -> bool:
+        for stat_name, kind, measure in self.measures.values():
+            values = getattr(stat, stat_name)[kind][measure]
+            if len(values) < self.min_months: return False
+            earlier = np.mean(values[-2 * self.window:-self.window])
+            recent = np.mean(values[-self.window:])
+            if abs(recent - earlier) > self.tol * abs(earlier): return False
+        return True
@@ -0,0 +1,280 @@
+
+
+import ast
+import csv
+import json
+import hashlib
+import datetime
+import argparse
+import itertools
+import numpy as np
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from simulation import Simulation
+from run_pool import simulate_runs
+from results_store import save_stats, load_run, code_version
+
+# prefixes naming the parameter group of a parameter, for example hh.init_money
+param_groups = {'f': 'f_param', 'hh': 'hh_param', 'g': 'g_param'}
+
+# measures summarized per point, the value of the last month of each run
+summary_measures = {
+    'gini_i': 'hh_stat.metric.gini_i',
+    'gini_m': 'hh_stat.metric.gini_m',
+    'employment': 'hh_stat.avg.employment',
+    'tax': 'g_stat.fix.tax',
+}
+
+
+######## ######## ######## DESIGN ######## ######## ########
+
+# return the group and name of a parameter
+# a parameter is named with the prefix of its group, g.tax_gamma, or without when the name is used by one group only, tax_gamma
+def resolve_param(name: str) -> tuple:
+    prefix, _, short = name.rpartition('.')
+    if prefix:
+        if prefix not in param_groups or short not in getattr(Simulation, param_groups[prefix]):
+            raise KeyError(f"unknown parameter '{name}'")
+        return param_groups[prefix], short
+    groups = [group for group in param_groups.values() if name in getattr(Simulation, group)]
+    if not groups: raise KeyError(f"unknown parameter '{name}'")
+    if len(groups) > 1:
+        raise KeyError(f"parameter '{name}' is used by more than one group, name it with a prefix such as {', '.join(param_groups)}")
+    return groups[0], name
+
+# return the changes to the default parameters of a point per parameter group, see Simulation
+def point_changes(point: dict) -> dict:
+    changes = {}
+    for name, value in point.items():
+        if name == 'gov_type': continue
+        group, short = resolve_param(name)
+        changes.setdefault(group, {})[short] = value
+    return changes
+
+# return a point for each combination of government type and values of the parameters
+def grid_design(gov_types: list, values: dict) -> list:
+    names = list(values)
+    return [{'gov_type': gov_type, **dict(zip(names, combination))}
+            for gov_type in gov_types for combination in itertools.product(*[values[name] for name in names])]
+
+# return num_points points per government type with parameters drawn uniformly from their (low, high) ranges
+# parameters with integer bounds are drawn as integers including both bounds, the same design seed gives the same points
+def random_design(gov_types: list, ranges: dict, num_points: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    points = []
+    for _ in range(num_points):
+        point = {}
+        for name, (low, high) in ranges.items():
+            if isinstance(low, int) and isinstance(high, int):
+                point[name] = int(rng.integers(low, high + 1))
+            else:
+                point[name] = float(rng.uniform(low, high))
+        points.append(point)
+    return [{'gov_type': gov_type, **point} for gov_type in gov_types for point in points]
+
+# return a key identifying the parameter set of a point
+def point_key(point: dict) -> str:
+    return hashlib.sha1(json.dumps(point, sort_keys=True).encode()).hexdigest()[:12]
+
+
+class Sweep(object):
+    '''
+    A sweep simulates a number of runs for each point of a design over parameters and government types.
+    A point changes the default parameters of the Simulation class, for example {'gov_type': 'dir', 'tax_gamma': 2}.
+    Run i of each point draws from the i-th seed spawned from the sweep seed, so points are compared on the same seeds.
+
+    Each finished run is written to a results store in the sweep directory under the key of its point's parameter set, see save_stats.
+    The meta.json file of a run is written after its series, so a run is finished once its meta.json exists.
+    Starting a sweep again in the same directory only simulates runs that are missing, so an interrupted sweep resumes.
+    The summary table holds the mean and standard deviation over runs of the final Gini indices, employment and tax per point.
+    '''
+
+    def __init__(self, path: str, points: list, num_runs: int, num_months: int, num_f: int, num_hh: int, engine: str = 'object',
+                 workers: int = 1, seed: int = 15532):
+        self.path = Path(path)                  # directory storing the runs and summary of the sweep
+        self.points = points                    # points of the design, each with a government type and changed parameters
+        self.num_runs = num_runs                # number of runs per point
+        self.num_months = num_months            # number of months simulated per run
+        self.num_f = num_f                      # number of firms per run
+        self.num_hh = num_hh                    # number of households per run
+        self.engine = engine                    # engine simulating the agents
+        self.workers = max(1, workers)          # number of worker processes
+        self.seed = seed                        # seed the seeds of the runs are spawned from
+
+        # the settings must not change when a sweep is resumed
+        self.settings = {'num_months': num_months, 'num_f': num_f, 'num_hh': num_hh, 'engine': engine, 'seed': seed}
+        self.plot_param = {'plot_per_run': False}
+        self.print_hashes = '######## ######## ########'        # pretty command line printing
+
+        for point in points:
+            point_changes(point)                # fail on unknown parameters before simulating
+
+    ######## ######## ######## METHODS ######## ######## ########
+
+    # return the directory of the results of a run of a point
+    def run_path(self, point: dict, run: int) -> Path:
+        return self.path / point_key(point) / f"run_{run}"
+
+    # return whether a run of a point was written in full
+    def is_finished(self, point: dict, run: int) -> bool:
+        return (self.run_path(point, run) / 'meta.json').exists()
+
+    # return the description of a run of a point stored with its results, see run_meta
+    def run_meta(self, point: dict, run: int, seed: np.random.SeedSequence) -> dict:
+        return {'run': run, 'gov_type': point['gov_type'], 'point': point, **self.settings,
+                'seed': {'entropy': seed.entropy, 'spawn_key': list(seed.spawn_key)}, 'code_version': code_version(),
+                'created': datetime.datetime.now().isoformat(timespec='seconds')}
+
+    # write the sweep settings and the parameter set of each point, check that a resumed sweep has the same settings
+    def prepare(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        settings_path = self.path / 'sweep.json'
+        if settings_path.exists():
+            with open(settings_path) as f:
+                settings = json.load(f)
+            if settings != self.settings:
+                raise ValueError(f"sweep in {self.path} was started with settings {settings}, not {self.settings}")
+        else:
+            with open(settings_path, 'w') as f:
+                json.dump(self.settings, f, indent=4)
+        for point in self.points:
+            (self.path / point_key(point)).mkdir(exist_ok=True)
+            with open(self.path / point_key(point) / 'point.json', 'w') as f:
+                json.dump(point, f, indent=4, sort_keys=True)
+
+    # return a (point, runs) job for each batch of runs that isn't finished
+    # the replica engine simulates the missing runs of a point at once, other engines one run per job
+    def jobs(self) -> list:
+        jobs = []
+        for point in self.points:
+            runs = [run for run in range(self.num_runs) if not self.is_finished(point, run)]
+            if not runs: continue
+            if self.engine == 'replica':
+                jobs.append((point, runs))
+            else:
+                jobs.extend((point, [run]) for run in runs)
+        return jobs
+
+    # return the arguments of simulate_runs for a job
+    def run_args(self, point: dict, runs: list, seeds: list) -> tuple:
+        return (runs, [seeds[run] for run in runs], self.num_months, self.num_runs, point['gov_type'], self.num_f, self.num_hh,
+                self.plot_param, self.engine)
+
+    # simulate all missing runs and write each to file as soon as its job finishes
+    def run(self):
+        self.prepare()
+        seeds = np.random.SeedSequence(self.seed).spawn(self.num_runs)
+        jobs = self.jobs()
+        print(f"{self.print_hashes:<30} {'POINTS:':>15} {len(self.points):>10}")
+        print(f"{self.print_hashes:<30} {'JOBS:':>15} {len(jobs):>10}")
+
+        def store(point: dict, runs: list, stats: list, seconds: float):
+            for run, stat in zip(runs, stats):
+                save_stats(self.run_path(point, run), stat, self.run_meta(point, run, seeds[run]))
+            label = str(runs[0]) if len(runs) == 1 else f"{runs[0]}-{runs[-1]}"
+            print(f"{self.print_hashes:<30} {'FINISHED RUN:':>15} {label:>10} {f'{seconds:.1f}s':>10} {point_key(point):>15}")
+
+        if self.workers == 1:
+            for point, runs in jobs:
+                store(point, *simulate_runs(*self.run_args(point, runs, seeds), quiet=True, changes=point_changes(point)))
+            return
+
+        with ProcessPoolExecutor(max_workers=min(self.workers, max(1, len(jobs)))) as pool:
+            futures = {pool.submit(simulate_runs, *self.run_args(point, runs, seeds), quiet=True, changes=point_changes(point)): point
+                       for point, runs in jobs}
+            for future in as_completed(futures):
+                store(futures[future], *future.result())
+
+    # return a row per point with its parameters, the number of finished runs and the mean and standard deviation of each summary measure
+    def summary(self) -> list:
+        rows = []
+        for point in self.points:
+            finals = {measure: [] for measure in summary_measures}
+            runs = [run for run in range(self.num_runs) if self.is_finished(point, run)]
+            for run in runs:
+                _, series = load_run(self.run_path(point, run))
+                for measure, name in summary_measures.items():
+                    finals[measure].append(series[name][-1] if name in series else 0.0)     # no tax without government
+            row = {'key': point_key(point), **point, 'runs': len(runs)}
+            for measure, values in finals.items():
+                row[f"{measure}_mean"] = float(np.mean(values)) if values else float('nan')
+                row[f"{measure}_std"] = float(np.std(values, ddof=1)) if len(values) > 1 else float('nan')
+            rows.append(row)
+        return rows
+
+    # write the summary table to summary.csv in the sweep directory and print it
+    def write_summary(self) -> list:
+        rows = self.summary()
+        columns = list(dict.fromkeys(column for row in rows for column in row))
+        with open(self.path / 'summary.csv', 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+
+        print(f"\n{self.print_hashes:<30} {'SUMMARY':>15}\n")
+        print(" ".join(f"{column:>14}" for column in columns))
+        for row in rows:
+            print(" ".join(f"{row.get(column, ''):>14.4f}" if isinstance(row.get(column), float) else f"{str(row.get(column, '')):>14}"
+                           for column in columns))
+        return rows
+
+
+######## ######## ######## MAIN ######## ######## ########
+
+# parse a parameter value such as 2, 0.5, True or index
+def parse_value(text: str) -> object:
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+# parse name=value,value,... into the name and its list of values
+def parse_grid(text: str) -> tuple:
+    name, _, values = text.partition('=')
+    return name, [parse_value(value) for value in values.split(',')]
+
+# parse name=low:high into the name and its range
+def parse_range(text: str) -> tuple:
+    name, _, bounds = text.partition('=')
+    low, _, high = bounds.partition(':')
+    return name, (parse_value(low), parse_value(high))
+
+def main():
+    '''
+    Sweep parameters of the simulated economy and government types, for example
+
+        python3 src/sweep.py --out sweeps/gamma --gov dir rep --grid tax_gamma=2,4,6 tax_adj_freq=6,12 --runs 10 --workers 8
+        python3 src/sweep.py --out sweeps/random --gov rep --random tax_gamma=1.0:6.0 rep_num_parties=2:7 --points 20
+
+    Running the same command again resumes the sweep, only missing runs are simulated.
+    '''
+
+    parser = argparse.ArgumentParser(description='Sweep parameters and government types of the simulated economy.')
+    parser.add_argument("--out", type=str, required=True, help="directory storing the runs and summary of the sweep")
+    parser.add_argument("--gov", type=str, nargs='+', choices=['none', 'rep', 'dir'], default=['none'], help="government types swept")
+    parser.add_argument("--grid", type=str, nargs='*', default=[], help="parameter values swept as name=value,value,...")
+    parser.add_argument("--random", type=str, nargs='*', default=[], help="parameter ranges drawn from as name=low:high")
+    parser.add_argument("--points", type=int, default=10, help="number of random points per government type")
+    parser.add_argument("--design-seed", type=int, default=0, help="seed of the random design")
+    parser.add_argument("--runs", type=int, default=10, help="number of runs per point")
+    parser.add_argument("--months", type=int, default=100, help="number of months simulated per run")
+    parser.add_argument("--f", type=int, default=100, help="number of firms used in a simulation")
+    parser.add_argument("--hh", type=int, default=1000, help="number of households used in a simulation")
+    parser.add_argument("--engine", type=str, choices=['object', 'vector', 'compiled', 'replica'], default='object',
+                        help="select the engine simulating the economy, see main.py")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes simulating runs in parallel")
+    args = parser.parse_args()
+
+    if args.grid and args.random:
+        parser.error("use either --grid or --random")
+    if args.random:
+        points = random_design(args.gov, dict(parse_range(text) for text in args.random), args.points, args.design_seed)
+    else:
+        points = grid_design(args.gov, dict(parse_grid(text) for text in args.grid))
+
+    sweep = Sweep(args.out, points, args.runs, args.months, args.f, args.hh, args.engine, args.workers)
+    sweep.run()
+    sweep.write_summary()
+
+if __name__ == "__main__":
+    main()